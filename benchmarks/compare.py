@@ -0,0 +1,75 @@
+import argparse
+import json
+import sys
+from typing import List
+
+DEFAULT_THRESHOLD = 0.1
+
+
+def _key(result: dict):
+    return result['extractor'], result['config']
+
+
+def compare_reports(baseline: dict, current: dict, threshold: float = DEFAULT_THRESHOLD) -> List[dict]:
+    # One row per case present in both reports. A case regresses when its throughput falls by more than
+    # `threshold`, as a fraction of the baseline's.
+    baseline_results = {_key(result): result for result in baseline['results'] if 'error' not in result}
+    rows = []
+
+    for result in current['results']:
+        previous = baseline_results.get(_key(result))
+        if previous is None or 'error' in result:
+            continue
+
+        before = previous['sentences_per_sec']
+        after = result['sentences_per_sec']
+        change = (after - before) / before if before else 0.0
+
+        rows.append({
+            'extractor': result['extractor'],
+            'config': result['config'],
+            'baseline': before,
+            'current': after,
+            'change': change,
+            'regression': change < -threshold,
+            'peak_rss_change_mb': result['peak_rss_mb'] - previous['peak_rss_mb']
+            if result.get('peak_rss_mb') is not None and previous.get('peak_rss_mb') is not None else None,
+        })
+
+    return rows
+
+
+def print_comparison(baseline: dict, current: dict, rows: List[dict]):
+    if baseline['corpus'].get('sha1') != current['corpus'].get('sha1'):
+        print('warning: the reports were measured on different corpora')
+
+    print('baseline: %s, current: %s' % (baseline['meta'].get('commit'), current['meta'].get('commit')))
+    print('%-10s %-20s %12s %12s %8s %10s' % ('extractor', 'config', 'baseline/s', 'current/s', 'change', 'rss (MB)'))
+
+    for row in rows:
+        rss = '%+.1f' % row['peak_rss_change_mb'] if row['peak_rss_change_mb'] is not None else '-'
+        print('%-10s %-20s %12.1f %12.1f %+7.1f%% %10s%s' % (row['extractor'], row['config'], row['baseline'],
+                                                             row['current'], 100 * row['change'], rss,
+                                                             '  REGRESSION' if row['regression'] else ''))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='posextract benchmarks: compare two benchmark reports')
+    parser.add_argument('baseline', type=str, help='the report to compare against')
+    parser.add_argument('current', type=str, help='the report to compare')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help='largest drop in throughput, as a fraction, that is not a regression '
+                             '(default: %(default)s)')
+
+    args = parser.parse_args()
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.current) as f:
+        current = json.load(f)
+
+    rows = compare_reports(baseline, current, threshold=args.threshold)
+    print_comparison(baseline, current, rows)
+
+    # A non-zero exit status lets CI fail on a regression.
+    sys.exit(1 if any(row['regression'] for row in rows) else 0)
@@ -0,0 +1,406 @@
+import argparse
+import collections
+import datetime
+import hashlib
+import itertools
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, Iterable, Iterator, List, Optional
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(BENCHMARK_DIR)
+
+# Measure the checkout the script is in, not whichever copy of posextract happens to be installed.
+sys.path.insert(0, os.path.join(REPO_ROOT, 'src'))
+
+import synthetic
+from compare import DEFAULT_THRESHOLD, compare_reports, print_comparison
+
+REPORT_VERSION = 1
+
+FIXED_CORPUS = os.path.join(BENCHMARK_DIR, 'corpus', 'fixed.txt')
+DEFAULT_SYNTHETIC_SENTENCES = 5000
+
+EXTRACTORS = ('triples', 'adj_noun', 'subj_verb', 'unified')
+
+# Option combinations benchmarked for each extractor, by name.
+TRIPLE_CONFIGS = {
+    'default': {},
+    'post_processing': {'combine_adj': True, 'add_auxiliary': True, 'prep_phrase': True, 'lemmatize': True},
+    'noun_chunks': {'use_noun_chunks': True},
+    'max_expansions': {'max_expansions': 8},
+}
+PAIR_CONFIGS = {
+    'default': {},
+    'lemma': {'lemmatize': True},
+}
+CONFIGS = {
+    'triples': TRIPLE_CONFIGS,
+    'adj_noun': PAIR_CONFIGS,
+    'subj_verb': PAIR_CONFIGS,
+    'unified': {'default': {}},
+}
+
+OUTPUT_EXTENSIONS = {'csv': '.csv', 'parquet': '.parquet', 'arrow': '.arrow'}
+
+# Sentences extracted, and thrown away, before timing starts.
+WARMUP_SENTENCES = 50
+
+
+def load_corpus(spec: dict) -> List[str]:
+    if spec['name'] == 'synthetic':
+        return list(synthetic.generate(spec['sentences'], spec['seed']))
+
+    path = FIXED_CORPUS if spec['name'] == 'fixed' else spec['path']
+
+    if spec.get('data_column'):
+        from posextract.corpus import read_corpus
+
+        texts = [text for _, text in read_corpus(path, spec['data_column'], delimiter=spec.get('delimiter', ','))]
+    else:
+        with open(path, encoding='utf-8') as f:
+            texts = [line.strip() for line in f if line.strip()]
+
+    if spec.get('sentences'):
+        # A small corpus is cycled through to reach the requested size.
+        texts = list(itertools.islice(itertools.cycle(texts), spec['sentences']))
+
+    return texts
+
+
+def corpus_digest(texts: List[str]) -> str:
+    digest = hashlib.sha1()
+    for text in texts:
+        digest.update(text.encode('utf-8'))
+        digest.update(b'\n')
+    return digest.hexdigest()
+
+
+def peak_rss_mb() -> Optional[float]:
+    try:
+        import resource
+    except ImportError:
+        return None
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere.
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+class _Writers:
+    # The output files of one run, in a temporary directory.
+    def __init__(self, directory: str, output_format: str, streams: Dict[str, type]):
+        from posextract.writer import open_writer, record_fields
+
+        self.paths = {stream: os.path.join(directory, stream + OUTPUT_EXTENSIONS[output_format]) for stream in streams}
+        self.writers = {stream: open_writer(self.paths[stream], record_fields(record_type), id_column='sentence_id')
+                        for stream, record_type in streams.items()}
+
+    def __getitem__(self, stream: str):
+        return self.writers[stream]
+
+    def close(self) -> int:
+        for writer in self.writers.values():
+            writer.close()
+        return sum(os.path.getsize(path) for path in self.paths.values())
+
+
+def _write_all(results: Iterable, writers: _Writers, stream_of, seconds: Dict[str, float]) -> int:
+    # Writes each row's extractions as extract_iter yields them, timing only the writes.
+    count = 0
+    for i, extractions in results:
+        start = time.perf_counter()
+        for stream, records in stream_of(extractions):
+            writers[stream].write(records, i)
+            count += len(records)
+        seconds['write'] += time.perf_counter() - start
+    return count
+
+
+def _run_triples(texts: List[str], options: dict, filters, stats, seconds: Dict[str, float], writers: _Writers,
+                 batch_size: int) -> int:
+    from posextract.grammatical_triples import TripleExtractor
+    from posextract.util import TripleExtractorOptions
+
+    extractor = TripleExtractor(TripleExtractorOptions(**options), filters=filters, batch_size=batch_size)
+    return _write_all(extractor.extract_iter(texts, stats=stats), writers,
+                      lambda extractions: [('triples', extractions)], seconds)
+
+
+def _run_pairs(extractor: str, texts: List[str], options: dict, stats, seconds: Dict[str, float],
+               writers: _Writers, batch_size: int) -> int:
+    from posextract import adj_noun_pairs, subj_verb_pairs
+
+    module = {'adj_noun': adj_noun_pairs, 'subj_verb': subj_verb_pairs}[extractor]
+    results = module.extract_iter(texts, lemmatize=options.get('lemmatize', False), batch_size=batch_size,
+                                  stats=stats)
+    return _write_all(results, writers, lambda extractions: [(extractor, extractions)], seconds)
+
+
+def _by_stream(extractions) -> Iterator:
+    grouped = collections.defaultdict(list)
+    for extraction in extractions:
+        grouped[extraction.stream].append(extraction.extraction)
+    return grouped.items()
+
+
+def _run_unified(texts: List[str], filters, stats, seconds: Dict[str, float], writers: _Writers,
+                 batch_size: int) -> int:
+    from posextract import unified
+
+    results = unified.extract_iter(texts, filters=filters, batch_size=batch_size, stats=stats)
+    return _write_all(results, writers, _by_stream, seconds)
+
+
+def _run_once(case: dict, texts: List[str], filters, directory: str) -> dict:
+    from posextract.adj_noun_pairs import AdjNounExtraction
+    from posextract.instrumentation import ExtractionStats, STAGES
+    from posextract.subj_verb_pairs import SubjVerbExtraction
+    from posextract.triple_extraction import TripleExtractionFlattened
+
+    record_types = {'triples': TripleExtractionFlattened, 'adj_noun': AdjNounExtraction,
+                    'subj_verb': SubjVerbExtraction}
+    extractor = case['extractor']
+    streams = record_types if extractor == 'unified' else {extractor: record_types[extractor]}
+
+    stats = ExtractionStats()
+    seconds = {'write': 0.0}
+    writers = _Writers(directory, case['output_format'], streams)
+
+    start = time.perf_counter()
+    if extractor == 'triples':
+        count = _run_triples(texts, case['options'], filters, stats, seconds, writers, case['batch_size'])
+    elif extractor == 'unified':
+        count = _run_unified(texts, filters, stats, seconds, writers, case['batch_size'])
+    else:
+        count = _run_pairs(extractor, texts, case['options'], stats, seconds, writers, case['batch_size'])
+
+    write_start = time.perf_counter()
+    output_bytes = writers.close()
+    seconds['write'] += time.perf_counter() - write_start
+
+    # The extraction stages as ExtractionStats recorded them, then the writes.
+    stages = {stage: stats.seconds.get(stage, 0.0) for stage in STAGES}
+    stages['write'] = seconds['write']
+
+    return {'seconds': time.perf_counter() - start, 'stages': stages, 'counts': dict(stats.counts),
+            'extractions': count, 'output_bytes': output_bytes}
+
+
+def run_case(case: dict) -> dict:
+    # Runs one extractor and configuration over the corpus `repeat` times and reports the fastest run. Peak RSS
+    # covers the whole process, so each case is run in a fresh process unless --in-process is given.
+    from posextract.util import get_nlp
+
+    texts = load_corpus(case['corpus'])
+    meta = get_nlp().meta
+
+    filters = None
+    if case.get('filters') and case['extractor'] in ('triples', 'unified'):
+        from posextract.posrule.compiler import compile_filters
+        from posextract.posrule.parser import load_posrules
+
+        filters = compile_filters(load_posrules(case['filters']))
+
+    result = {
+        'extractor': case['extractor'],
+        'config': case['config'],
+        'options': case['options'],
+        'model': '%s_%s-%s' % (meta.get('lang'), meta.get('name'), meta.get('version')),
+        'sentences': len(texts),
+    }
+
+    directory = tempfile.mkdtemp(prefix='posextract-benchmark-')
+    try:
+        _run_once(case, texts[:WARMUP_SENTENCES], filters, directory)
+        result['baseline_rss_mb'] = peak_rss_mb()
+
+        runs = [_run_once(case, texts, filters, directory) for _ in range(case['repeat'])]
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    best = min(runs, key=lambda run: run['seconds'])
+
+    result.update({
+        'extractions': best['extractions'],
+        'seconds': best['seconds'],
+        'runs': [run['seconds'] for run in runs],
+        'sentences_per_sec': len(texts) / best['seconds'] if best['seconds'] else 0.0,
+        'stages': best['stages'],
+        'counts': best['counts'],
+        'output_bytes': best['output_bytes'],
+        'peak_rss_mb': peak_rss_mb(),
+    })
+
+    return result
+
+
+def _failed(case: dict, error: str) -> dict:
+    return {'extractor': case['extractor'], 'config': case['config'], 'options': case['options'], 'error': error}
+
+
+def _run_case_in_process(case: dict) -> dict:
+    try:
+        return run_case(case)
+    except Exception as e:
+        return _failed(case, '%s: %s' % (type(e).__name__, e))
+
+
+def _run_case_in_subprocess(case: dict) -> dict:
+    completed = subprocess.run([sys.executable, os.path.abspath(__file__), '--worker'], input=json.dumps(case),
+                               stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
+
+    if completed.returncode != 0:
+        lines = completed.stderr.strip().splitlines()
+        return _failed(case, lines[-1] if lines else 'exit status %d' % completed.returncode)
+
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def _git(*args) -> Optional[str]:
+    try:
+        completed = subprocess.run(['git'] + list(args), cwd=REPO_ROOT, stdout=subprocess.PIPE,
+                                   stderr=subprocess.DEVNULL, universal_newlines=True)
+    except OSError:
+        return None
+    return completed.stdout.strip() if completed.returncode == 0 else None
+
+
+def environment() -> dict:
+    import spacy
+
+    status = _git('status', '--porcelain', '--untracked-files=no')
+
+    return {
+        'commit': _git('rev-parse', 'HEAD'),
+        'dirty': bool(status) if status is not None else None,
+        'timestamp': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        'python': platform.python_version(),
+        'spacy': spacy.__version__,
+        'platform': platform.platform(),
+        'processor': platform.processor() or platform.machine(),
+        'cpu_count': os.cpu_count(),
+    }
+
+
+def print_results(results: List[dict]):
+    print('%-10s %-16s %9s %11s %9s  %s' % ('extractor', 'config', 'sent/s', 'extractions', 'rss (MB)',
+                                           'stage seconds'))
+    for result in results:
+        if 'error' in result:
+            print('%-10s %-16s failed: %s' % (result['extractor'], result['config'], result['error']))
+            continue
+
+        stages = ', '.join('%s %.3f' % (stage, seconds) for stage, seconds in result['stages'].items() if seconds)
+        rss = '%.1f' % result['peak_rss_mb'] if result['peak_rss_mb'] is not None else '-'
+        print('%-10s %-16s %9.1f %11d %9s  %s' % (result['extractor'], result['config'], result['sentences_per_sec'],
+                                                  result['extractions'], rss, stages))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='posextract benchmarks: throughput, per-stage time and peak RSS')
+    parser.add_argument('--corpus', default='fixed', choices=['fixed', 'synthetic'],
+                        help='the bundled corpus to run on, if no --input-file is given (default: %(default)s)')
+    parser.add_argument('--input-file', type=str, default=None,
+                        help='a text file with one sentence per line, or a csv file with --data-column')
+    parser.add_argument('--data-column', type=str, default=None,
+                        help='the column of --input-file to read sentences from')
+    parser.add_argument('--sentences', type=int, default=None,
+                        help='number of sentences; the fixed corpus and input files are cycled through to reach it '
+                             '(default: the whole file, or %d synthetic sentences)' % DEFAULT_SYNTHETIC_SENTENCES)
+    parser.add_argument('--seed', type=int, default=0,
+                        help='random seed of the synthetic corpus (default: %(default)s)')
+    parser.add_argument('--extractors', nargs='+', default=list(EXTRACTORS), choices=EXTRACTORS,
+                        help='extractors to benchmark (default: all)')
+    parser.add_argument('--configs', nargs='+', default=None,
+                        help='names of option combinations to benchmark (default: all of each extractor\'s)')
+    parser.add_argument('--input-filters', type=str, default=None,
+                        help='a posrule file or directory to filter triples with')
+    parser.add_argument('--output-format', default='csv', choices=sorted(OUTPUT_EXTENSIONS),
+                        help='the format extractions are written in (default: %(default)s)')
+    parser.add_argument('--batch-size', type=int, default=None,
+                        help='number of sentences parsed per nlp.pipe batch (default: posextract\'s default)')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='runs per case; the fastest is reported (default: %(default)s)')
+    parser.add_argument('--in-process', action='store_true',
+                        help='run every case in this process, e.g. under a profiler; peak RSS is then cumulative')
+    parser.add_argument('--output', type=str, default=None,
+                        help='a path to write the JSON report to')
+    parser.add_argument('--compare', type=str, default=None,
+                        help='a previous JSON report to compare throughput against')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help='largest drop in throughput, as a fraction, that is not a regression '
+                             '(default: %(default)s)')
+    parser.add_argument('--worker', action='store_true', help=argparse.SUPPRESS)
+
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(run_case(json.load(sys.stdin))))
+        return
+
+    from posextract.util import DEFAULT_BATCH_SIZE
+
+    if args.input_file:
+        corpus = {'name': os.path.basename(args.input_file), 'path': os.path.abspath(args.input_file),
+                  'data_column': args.data_column, 'sentences': args.sentences}
+    elif args.corpus == 'synthetic':
+        corpus = {'name': 'synthetic', 'sentences': args.sentences or DEFAULT_SYNTHETIC_SENTENCES, 'seed': args.seed}
+    else:
+        corpus = {'name': 'fixed', 'sentences': args.sentences}
+
+    texts = load_corpus(corpus)
+    if not texts:
+        exit('The corpus is empty')
+
+    cases = []
+    for extractor in args.extractors:
+        for config, options in CONFIGS[extractor].items():
+            if args.configs is None or config in args.configs:
+                cases.append({'extractor': extractor, 'config': config, 'options': options, 'corpus': corpus,
+                              'filters': os.path.abspath(args.input_filters) if args.input_filters else None,
+                              'output_format': args.output_format, 'repeat': args.repeat,
+                              'batch_size': args.batch_size or DEFAULT_BATCH_SIZE})
+
+    if not cases:
+        exit('No cases to run: none of the extractors have the configs %s' % ', '.join(args.configs))
+
+    results = []
+    for case in cases:
+        print('Running %s/%s on %d sentences...' % (case['extractor'], case['config'], len(texts)), file=sys.stderr)
+        results.append(_run_case_in_process(case) if args.in_process else _run_case_in_subprocess(case))
+
+    report = {
+        'version': REPORT_VERSION,
+        'meta': environment(),
+        'corpus': dict(corpus, sentences=len(texts), sha1=corpus_digest(texts)),
+        'settings': {'output_format': args.output_format, 'repeat': args.repeat,
+                     'batch_size': args.batch_size or DEFAULT_BATCH_SIZE, 'filters': args.input_filters,
+                     'in_process': args.in_process},
+        'results': results,
+    }
+
+    print_results(results)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        rows = compare_reports(baseline, report, threshold=args.threshold)
+        print()
+        print_comparison(baseline, report, rows)
+        if any(row['regression'] for row in rows):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+import argparse
+import random
+from typing import Iterator
+
+# Sentences built from templates that exercise the traversal and post-processing paths: coordinated subjects and
+# objects, relative clauses, negation, xcomp verb phrases, prepositional objects, adjectival complements and quotes.
+# The same seed always produces the same sentences.
+
+NOUNS = ('farmers', 'soldiers', 'landlords', 'tenants', 'workers', 'magistrates', 'ministers', 'members',
+         'merchants', 'weavers', 'miners', 'clergy', 'colonists', 'electors', 'guardians', 'inspectors')
+OBJECTS = ('rent', 'wages', 'land', 'petition', 'bill', 'report', 'tax', 'duty', 'treaty', 'grain', 'mills',
+           'school', 'harbour', 'railway', 'estate', 'returns', 'accounts', 'workhouse', 'loan', 'pension')
+VERBS = ('paid', 'refused', 'signed', 'opposed', 'examined', 'received', 'bought', 'sold', 'presented',
+         'rejected', 'supported', 'inspected', 'reduced', 'demanded', 'built', 'closed')
+BASE_VERBS = ('pay', 'sign', 'oppose', 'examine', 'receive', 'buy', 'sell', 'present', 'reject', 'support')
+XCOMP_VERBS = ('wanted', 'failed', 'refused', 'promised', 'hoped', 'intended')
+ADJECTIVES = ('ill', 'poor', 'unhappy', 'crowded', 'dirty', 'cold', 'angry', 'ruinous', 'unpopular', 'idle')
+ADVERBS = ('very', 'terminally', 'extremely', 'somewhat', 'badly')
+PREPOSITIONS = ('for', 'against', 'with', 'from', 'to', 'in', 'on')
+SPEECH_VERBS = ('said', 'declared', 'complained', 'reported')
+
+
+def _noun(rng: random.Random) -> str:
+    return 'the %s' % rng.choice(NOUNS)
+
+
+def _object(rng: random.Random) -> str:
+    return 'the %s' % rng.choice(OBJECTS)
+
+
+def _coordinated(rng: random.Random, words, max_items: int = 5) -> str:
+    items = ['the %s' % word for word in rng.sample(words, rng.randint(2, max_items))]
+    return '%s and %s' % (', '.join(items[:-1]), items[-1])
+
+
+def _simple(rng: random.Random) -> str:
+    return '%s %s %s' % (_noun(rng), rng.choice(VERBS), _object(rng))
+
+
+TEMPLATES = (
+    lambda rng: '%s.' % _simple(rng),
+    lambda rng: '%s %s %s.' % (_coordinated(rng, NOUNS), rng.choice(VERBS), _object(rng)),
+    lambda rng: '%s %s %s.' % (_noun(rng), rng.choice(VERBS), _coordinated(rng, OBJECTS)),
+    lambda rng: '%s did not %s %s.' % (_noun(rng), rng.choice(BASE_VERBS), _object(rng)),
+    lambda rng: '%s %s to %s %s.' % (_noun(rng), rng.choice(XCOMP_VERBS), rng.choice(BASE_VERBS), _object(rng)),
+    lambda rng: '%s, who %s %s, %s %s.' % (_noun(rng), rng.choice(VERBS), _object(rng), rng.choice(VERBS),
+                                           _object(rng)),
+    lambda rng: '%s %s %s which %s %s.' % (_noun(rng), rng.choice(VERBS), _object(rng), rng.choice(VERBS),
+                                           _object(rng)),
+    lambda rng: '%s were %s %s.' % (_noun(rng), rng.choice(ADVERBS), rng.choice(ADJECTIVES)),
+    lambda rng: '%s were %s, %s and %s.' % ((_noun(rng), ) + tuple(rng.sample(ADJECTIVES, 3))),
+    lambda rng: '%s %s %s %s %s.' % (_noun(rng), rng.choice(VERBS), _object(rng), rng.choice(PREPOSITIONS),
+                                     _noun(rng)),
+    lambda rng: 'No %s %s %s.' % (rng.choice(NOUNS), rng.choice(VERBS), _object(rng)),
+    lambda rng: '%s %s that %s.' % (_noun(rng), rng.choice(SPEECH_VERBS), _simple(rng)),
+    lambda rng: '%s %s "%s %s %s" and left.' % (_noun(rng), rng.choice(SPEECH_VERBS), _noun(rng),
+                                                rng.choice(VERBS), _coordinated(rng, OBJECTS, 3)),
+    lambda rng: '%s %s, and %s.' % (_simple(rng), rng.choice(PREPOSITIONS) + ' ' + _noun(rng), _simple(rng)),
+)
+
+
+def generate(count: int, seed: int = 0) -> Iterator[str]:
+    rng = random.Random(seed)
+    for _ in range(count):
+        sentence = rng.choice(TEMPLATES)(rng)
+        yield sentence[0].upper() + sentence[1:]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='posextract benchmarks: write a synthetic corpus, one sentence per line')
+    parser.add_argument('--sentences', type=int, default=10000,
+                        help='number of sentences to generate (default: %(default)s)')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='random seed (default: %(default)s)')
+    parser.add_argument('--output', type=str, default=None,
+                        help='an output path (default: standard output)')
+
+    args = parser.parse_args()
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            for sentence in generate(args.sentences, args.seed):
+                f.write(sentence + '\n')
+    else:
+        for sentence in generate(args.sentences, args.seed):
+            print(sentence)
@@ -1,5 +1,17 @@
-from . import grammatical_triples
-from . import adj_noun_pairs
-from . import subj_verb_pairs
-from . import rules
-from . import util
+import importlib
+
+# Submodules are imported on first attribute access so that `import posextract` does not pull in spaCy.
+_SUBMODULES = ('grammatical_triples', 'adj_noun_pairs', 'subj_verb_pairs', 'unified', 'components', 'rules', 'util')
+_ATTRIBUTES = {'TripleExtractor': 'grammatical_triples'}
+
+
+def __getattr__(name):
+    if name in _SUBMODULES:
+        return importlib.import_module('.' + name, __name__)
+    if name in _ATTRIBUTES:
+        return getattr(importlib.import_module('.' + _ATTRIBUTES[name], __name__), name)
+    raise AttributeError('module %r has no attribute %r' % (__name__, name))
+
+
+def __dir__():
+    return sorted(list(globals()) + list(_SUBMODULES) + list(_ATTRIBUTES))
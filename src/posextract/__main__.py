@@ -0,0 +1,21 @@
+import importlib
+import sys
+
+# python -m posextract <command> [options]
+COMMANDS = {
+    'serve': 'posextract.server',
+    'loadgen': 'posextract.loadgen',
+}
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else list(argv)
+
+    if not argv or argv[0] not in COMMANDS:
+        exit('usage: python -m posextract {%s} [options]' % ','.join(COMMANDS))
+
+    importlib.import_module(COMMANDS[argv[0]]).main(argv[1:])
+
+
+if __name__ == '__main__':
+    main()
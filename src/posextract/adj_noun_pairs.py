@@ -2,22 +2,32 @@ import argparse
 import os
 import warnings;
 
-from .util import get_subject_neg, get_verb_neg
+from .cache import ParseCache, pipe_docs
+from .checkpoint import checkpoint_from_args, DEFAULT_CHECKPOINT_INTERVAL
+from .corpus import read_corpus, DEFAULT_CHUNK_SIZE
+from .engine import extract_corpus
+from .instrumentation import ExtractionStats, timed, timed_iter
+from .util import get_subject_neg, get_verb_neg, get_nlp, get_pipeline, make_pipeline, DEFAULT_BATCH_SIZE
+from .writer import open_writer, record_fields, DEFAULT_FLUSH_SIZE, FSYNC_POLICIES, OUTPUT_HELP
 
 warnings.simplefilter('ignore')
-import pandas as pd
-import spacy
+from spacy.language import Language
 from spacy.symbols import *
-import collections
-from typing import List, Optional
+import collections.abc
+from typing import Iterator, List, Optional, Tuple
 
-nlp = spacy.load('en_core_web_sm', disable=['ner', ])
+def __getattr__(name):
+    # The language model is loaded on first use rather than at import time.
+    if name == 'nlp':
+        return get_nlp()
+    raise AttributeError('module %r has no attribute %r' % (__name__, name))
 
 
 from typing import NamedTuple
 
 
 def extract_old(hansard, col, **kwargs):
+    nlp = get_nlp()
     kw = kwargs.get('keep', None)
 
     if kw == 'keep':
@@ -88,25 +98,52 @@ def rule(doc, lemmatize=False, verbose=False, letter_case='default') -> List[Adj
     return pairs
 
 
-def extract(input_object, lemmatize: bool = False, want_dataframe: bool = False, verbose: bool = False,
-            letter_case: str = 'default'):
+def extract_iter(input_object, lemmatize: bool = False, verbose: bool = False, letter_case: str = 'default',
+                 batch_size: int = DEFAULT_BATCH_SIZE,
+                 parse_cache: Optional[ParseCache] = None,
+                 stats: Optional[ExtractionStats] = None,
+                 nlp: Optional[Language] = None) -> Iterator[Tuple[int, List[AdjNounExtraction]]]:
+    # `nlp` defaults to the shared en_core_web_sm pipeline.
     if type(input_object) == str:
         input_object = [input_object, ]
-    elif not isinstance(input_object, collections.Iterable):
+    elif not isinstance(input_object, collections.abc.Iterable):
         raise ValueError('extract_triples: input should be a string or a collection of strings')
 
-    docs = nlp.pipe(input_object)
+    # The pair rules only read lemmas when lemmatizing.
+    parser = get_pipeline(lemmas=lemmatize) if nlp is None else make_pipeline(nlp, lemmas=lemmatize)
+    docs = pipe_docs(parser, ((text, i) for i, text in enumerate(input_object)), batch_size=batch_size,
+                     parse_cache=parse_cache)
+
+    if stats is None:
+        return ((i, rule(doc, lemmatize=lemmatize, verbose=verbose, letter_case=letter_case)) for doc, i in docs)
+
+    def generate():
+        for doc, i in timed_iter(docs, stats, 'nlp'):
+            with timed(stats, 'pairs'):
+                pairs = rule(doc, lemmatize=lemmatize, verbose=verbose, letter_case=letter_case)
+            yield i, pairs
+
+    return generate()
+
+
+def extract(input_object, lemmatize: bool = False, want_dataframe: bool = False, verbose: bool = False,
+            letter_case: str = 'default', batch_size: int = DEFAULT_BATCH_SIZE,
+            parse_cache: Optional[ParseCache] = None):
     pairs = []
-    for doc in docs:
-        pairs.extend(rule(doc, lemmatize=lemmatize, verbose=verbose, letter_case=letter_case))
+    for i, doc_pairs in extract_iter(input_object, lemmatize=lemmatize, verbose=verbose, letter_case=letter_case,
+                                     batch_size=batch_size, parse_cache=parse_cache):
+        pairs.extend(doc_pairs)
 
     if want_dataframe:
+        import pandas as pd
         return pd.DataFrame(pairs)
 
     return pairs
 
 
 def extract_df(df, text_column, letter_case: str = 'default', lemmatize: bool = False):
+    import pandas as pd
+
     pair_df_list = []
 
     def extract_row(row):
@@ -126,7 +163,7 @@ if __name__ == "__main__":
     parser.add_argument('input', metavar='input', type=str,
                         help='a filepath to a csv file or an input string')
     parser.add_argument('output', metavar='output', type=str,
-                        help='an output path')
+                        help=OUTPUT_HELP)
     parser.add_argument('--data-column', type=str, default=None, metavar='data_col',
                         help='what column to use if a csv is given', dest='data_column')
     parser.add_argument('--file-delimiter', default='comma', const='comma', nargs='?',
@@ -134,9 +171,29 @@ if __name__ == "__main__":
                         help='delimiter character for data file (default: %(default)s)')
     parser.add_argument('--lemma', action='store_true')
     parser.add_argument('--verbose', action='store_true')
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+                        help='number of sentences parsed per nlp.pipe batch (default: %(default)s)')
+    parser.add_argument('--jobs', type=int, default=1,
+                        help='number of worker processes to extract with (default: %(default)s)')
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE,
+                        help='number of csv rows read into memory at a time (default: %(default)s)')
+    parser.add_argument('--flush-size', type=int, default=DEFAULT_FLUSH_SIZE,
+                        help='number of output rows buffered between writes (default: %(default)s)')
+    parser.add_argument('--fsync', default='none', choices=FSYNC_POLICIES,
+                        help='when to fsync the output file (default: %(default)s)')
+    parser.add_argument('--row-group-size', type=int, default=None,
+                        help='maximum rows per row group in Parquet or Arrow output (default: one per flush)')
+    parser.add_argument('--parse-cache', type=str, default=None,
+                        help='a directory in which to cache parsed sentences between runs')
     parser.add_argument('--letter-case', default='default', const='default', nargs='?',
                         choices=['default', 'upper', 'lower'],
                         help='letter casing to use in output (default: %(default)s)')
+    parser.add_argument('--checkpoint', type=str, default=None,
+                        help='a file in which to record how far the run has got, for --resume')
+    parser.add_argument('--checkpoint-interval', type=int, default=DEFAULT_CHECKPOINT_INTERVAL,
+                        help='number of input rows between checkpoints (default: %(default)s)')
+    parser.add_argument('--resume', action='store_true',
+                        help='continue from the --checkpoint file, if there is one, instead of starting over')
 
     args = parser.parse_args()
     is_file = os.path.isfile(args.input)
@@ -148,11 +205,7 @@ if __name__ == "__main__":
 
     args = parser.parse_args()
 
-    with open(args.output, 'w+') as f:
-        pass
-
-    input_values = None
-    df = None
+    rows = None
 
     if is_file:
         if args.verbose:
@@ -161,28 +214,44 @@ if __name__ == "__main__":
         if args.data_column is None:
             exit('Invalid arguments: Must specify column name for data using --data-column')
 
-        usecols = [args.data_column, ]
-        df = pd.read_csv(args.input, usecols=usecols, delimiter=delimiter)
-        input_values = df[args.data_column]
+        rows = read_corpus(args.input, args.data_column, delimiter=delimiter, chunksize=args.chunk_size)
     else:
-        input_values = [args.input, ]
+        rows = enumerate([args.input, ])
+
+    try:
+        checkpoint = checkpoint_from_args(args, [args.output])
+    except ValueError as e:
+        exit('Invalid arguments: %s' % e)
 
-    with open(args.output, 'w+') as f:
-        pass
+    if checkpoint is not None:
+        if args.verbose and checkpoint.offset:
+            print('Resuming after %d rows' % checkpoint.offset)
+        rows = checkpoint.track(rows)
 
     extraction_count = 0
-    header = True
-
-    for i, data_str in enumerate(input_values):
-        triples_df = extract(data_str, lemmatize=args.lemma,  verbose=args.verbose, want_dataframe=True,
-                             letter_case=args.letter_case)
-        extraction_count += len(triples_df)
-        if df is not None:
-            triples_df['index'] = df.index[i]
-        triples_df.to_csv(args.output, mode='a', sep=delimiter, header=header, index=False)
-
-        if header:
-            header = False
+    parse_cache = ParseCache(args.parse_cache) if args.parse_cache else None
+
+    results = extract_corpus('adj_noun', rows, jobs=args.jobs, lemmatize=args.lemma, verbose=args.verbose,
+                             letter_case=args.letter_case, batch_size=args.batch_size,
+                             parse_cache=parse_cache)
+
+    with open_writer(args.output, record_fields(AdjNounExtraction), delimiter=delimiter,
+                     id_column='index' if is_file else None,
+                     flush_size=args.flush_size, fsync=args.fsync,
+                     row_group_size=args.row_group_size,
+                     resume_at=checkpoint.resume_at(args.output) if checkpoint is not None else None) as writer:
+        if checkpoint is not None:
+            results = checkpoint.commit(results, [writer, ])
+
+        for index, pairs in results:
+            writer.write(pairs, index)
+            extraction_count += len(pairs)
+
+        if checkpoint is not None:
+            checkpoint.save([writer, ])
+
+    if parse_cache is not None:
+        parse_cache.close()
 
     if args.verbose:
         print('Number of extractions: %d' % extraction_count)
@@ -0,0 +1,237 @@
+import collections
+import hashlib
+import itertools
+import multiprocessing.util
+import os
+import sqlite3
+import threading
+import uuid
+from typing import Any, Iterable, Iterator, Optional, Tuple, Union
+
+from spacy.language import Language
+from spacy.tokens import Doc, DocBin
+
+from posextract.util import DEFAULT_BATCH_SIZE, PipelineVariant
+
+DEFAULT_SEGMENT_SIZE = 10000
+DEFAULT_MAX_LOADED_SEGMENTS = 4
+
+# Keep IN (...) lookups under SQLite's host parameter limit.
+_LOOKUP_CHUNK_SIZE = 500
+
+
+def pipeline_fingerprint(nlp: Union[Language, PipelineVariant]) -> str:
+    return '%s_%s-%s:%s' % (nlp.meta.get('lang', ''), nlp.meta.get('name', ''), nlp.meta.get('version', ''),
+                            ','.join(nlp.pipe_names))
+
+
+def cache_key(fingerprint: str, text: str) -> bytes:
+    return hashlib.blake2b(('%s\0%s' % (fingerprint, text)).encode('utf-8'), digest_size=16).digest()
+
+
+def _split_pipeline(nlp: Union[Language, PipelineVariant]):
+    # The pipeline whose Docs are cached, and what to apply to a copy of each one afterwards. A PipelineVariant's
+    # `after` functions (such as merge_noun_chunks) run after the cache, so variants that differ only in them share
+    # cached parses.
+    if isinstance(nlp, PipelineVariant) and nlp.after:
+        return nlp.parser, nlp.finish
+    return nlp, None
+
+
+def _copy(doc: Doc, finish) -> Doc:
+    # Callers always get a copy, so nothing they change on it reaches the cached Doc or its later hits.
+    doc = doc.copy()
+    return finish(doc) if finish is not None else doc
+
+
+# Parsed Docs are keyed by a hash of their text plus the model name, version and active components. They are stored
+# in DocBin segment files of up to `segment_size` Docs, and a SQLite index maps each key to its segment and position.
+# Segments are written in parse order, so a repeated run over the same corpus reads them back sequentially. One cache
+# can be shared by threads: its state is locked, but parsing is not.
+class ParseCache:
+    def __init__(self, directory: str, segment_size: int = DEFAULT_SEGMENT_SIZE,
+                 max_loaded_segments: int = DEFAULT_MAX_LOADED_SEGMENTS):
+        self.directory = directory
+        self.segment_size = segment_size
+        self.max_loaded_segments = max_loaded_segments
+        self.hits = 0
+        self.misses = 0
+        self._setup()
+
+    def _setup(self):
+        self._lock = threading.RLock()
+        self._connection = None
+        self._pending = collections.OrderedDict()
+        self._segments = collections.OrderedDict()
+        os.makedirs(os.path.join(self.directory, 'segments'), exist_ok=True)
+        # Flush on exit, including in worker processes that are never explicitly closed.
+        multiprocessing.util.Finalize(self, self.close, exitpriority=10)
+        multiprocessing.util.register_after_fork(self, ParseCache._after_fork)
+
+    def _after_fork(self):
+        # A forked worker must not reuse the parent's SQLite connection, and does not inherit its exit handlers.
+        self._lock = threading.RLock()
+        self._connection = None
+        self._pending = collections.OrderedDict()
+        self._segments = collections.OrderedDict()
+        multiprocessing.util.Finalize(self, self.close, exitpriority=10)
+
+    def __getstate__(self):
+        return {'directory': self.directory, 'segment_size': self.segment_size,
+                'max_loaded_segments': self.max_loaded_segments, 'hits': 0, 'misses': 0}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._setup()
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        if self._connection is None:
+            # Used from whichever thread holds the lock.
+            self._connection = sqlite3.connect(os.path.join(self.directory, 'index.sqlite'), timeout=60,
+                                               check_same_thread=False)
+            self._connection.execute('PRAGMA journal_mode=WAL')
+            self._connection.execute('CREATE TABLE IF NOT EXISTS docs '
+                                     '(key BLOB PRIMARY KEY, segment TEXT NOT NULL, position INTEGER NOT NULL)')
+            self._connection.commit()
+        return self._connection
+
+    def _lookup(self, keys: Iterable[bytes]) -> dict:
+        keys = list(set(keys))
+        locations = {}
+
+        for start in range(0, len(keys), _LOOKUP_CHUNK_SIZE):
+            chunk = keys[start:start + _LOOKUP_CHUNK_SIZE]
+            query = 'SELECT key, segment, position FROM docs WHERE key IN (%s)' % ','.join('?' * len(chunk))
+            for key, segment, position in self.connection.execute(query, chunk):
+                locations[key] = (segment, position)
+
+        return locations
+
+    def _load_segment(self, segment: str, nlp: Union[Language, PipelineVariant]) -> list:
+        cache_id = (segment, id(nlp.vocab))
+
+        if cache_id in self._segments:
+            self._segments.move_to_end(cache_id)
+            return self._segments[cache_id]
+
+        doc_bin = DocBin().from_disk(os.path.join(self.directory, 'segments', segment))
+        docs = list(doc_bin.get_docs(nlp.vocab))
+        self._segments[cache_id] = docs
+
+        while len(self._segments) > self.max_loaded_segments:
+            self._segments.popitem(last=False)
+
+        return docs
+
+    def get(self, nlp: Union[Language, PipelineVariant], text: str) -> Optional[Doc]:
+        nlp, finish = _split_pipeline(nlp)
+        key = cache_key(pipeline_fingerprint(nlp), text)
+
+        with self._lock:
+            doc = self._pending.get(key)
+            if doc is None:
+                location = self._lookup([key]).get(key)
+                if location is None:
+                    return None
+                segment, position = location
+                doc = self._load_segment(segment, nlp)[position]
+
+        return _copy(doc, finish)
+
+    def add(self, key: bytes, doc: Doc):
+        with self._lock:
+            self._pending[key] = doc
+            if len(self._pending) >= self.segment_size:
+                self.flush()
+
+    def flush(self):
+        with self._lock:
+            self._flush()
+
+    def _flush(self):
+        if not self._pending:
+            return
+
+        segment = '%s.spacy' % uuid.uuid4().hex
+        path = os.path.join(self.directory, 'segments', segment)
+
+        doc_bin = DocBin()
+        for doc in self._pending.values():
+            doc_bin.add(doc)
+
+        # Write the segment before indexing it, so the index never points at a partially written file.
+        tmp_path = path + '.tmp'
+        doc_bin.to_disk(tmp_path)
+        os.replace(tmp_path, path)
+
+        rows = ((key, segment, position) for position, key in enumerate(self._pending))
+        with self.connection:
+            self.connection.executemany('INSERT OR IGNORE INTO docs (key, segment, position) VALUES (?, ?, ?)', rows)
+
+        self._pending.clear()
+
+    def pipe(self, nlp: Union[Language, PipelineVariant], texts_with_context: Iterable[Tuple[str, Any]],
+             batch_size: int = DEFAULT_BATCH_SIZE) -> Iterator[Tuple[Doc, Any]]:
+        nlp, finish = _split_pipeline(nlp)
+        fingerprint = pipeline_fingerprint(nlp)
+        texts_with_context = iter(texts_with_context)
+
+        while True:
+            batch = list(itertools.islice(texts_with_context, batch_size))
+            if not batch:
+                return
+
+            keys = [cache_key(fingerprint, text) for text, _ in batch]
+            docs = [None] * len(batch)
+            # The positions of each text to parse, which is parsed once however often it repeats in the batch.
+            missing = collections.OrderedDict()
+
+            with self._lock:
+                locations = self._lookup(key for key in keys if key not in self._pending)
+
+                for i, key in enumerate(keys):
+                    if key in self._pending:
+                        docs[i] = self._pending[key]
+                    elif key in locations:
+                        segment, position = locations[key]
+                        docs[i] = self._load_segment(segment, nlp)[position]
+                    else:
+                        missing.setdefault(key, []).append(i)
+
+                self.hits += len(batch) - len(missing)
+                self.misses += len(missing)
+
+            parsed = nlp.pipe((batch[positions[0]][0] for positions in missing.values()), batch_size=batch_size)
+            for (key, positions), doc in zip(missing.items(), parsed):
+                for i in positions:
+                    docs[i] = doc
+                self.add(key, doc)
+
+            for doc, (_, context) in zip(docs, batch):
+                yield _copy(doc, finish), context
+
+    def close(self):
+        with self._lock:
+            self._flush()
+            self._segments.clear()
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+def pipe_docs(nlp: Union[Language, PipelineVariant], texts_with_context: Iterable[Tuple[str, Any]],
+              batch_size: int = DEFAULT_BATCH_SIZE,
+              parse_cache: Optional[ParseCache] = None) -> Iterator[Tuple[Doc, Any]]:
+    if parse_cache is None:
+        return nlp.pipe(texts_with_context, as_tuples=True, batch_size=batch_size)
+    return parse_cache.pipe(nlp, texts_with_context, batch_size=batch_size)
+
+
+__all__ = ['ParseCache', 'pipe_docs', 'pipeline_fingerprint', 'cache_key']
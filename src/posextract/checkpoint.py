@@ -0,0 +1,146 @@
+import itertools
+import json
+import os
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from posextract.writer import RecordWriter, is_resumable
+
+DEFAULT_CHECKPOINT_INTERVAL = 10000
+
+CHECKPOINT_VERSION = 1
+
+# CLI arguments that may change between a run and its resumption without changing its output.
+RESUMABLE_ARGUMENTS = ('resume', 'checkpoint_interval', 'jobs', 'batch_size', 'chunk_size', 'flush_size', 'fsync',
+                       'parse_cache', 'filter_cache', 'verbose', 'stats')
+
+
+def run_settings(args) -> Dict[str, Any]:
+    # The arguments a checkpoint can only be resumed with unchanged.
+    return {name: value for name, value in sorted(vars(args).items()) if name not in RESUMABLE_ARGUMENTS}
+
+
+class CorpusCheckpoint:
+    # Records how far a corpus run has durably got: the number of input rows whose extractions are all written, and
+    # the size of each output file at that point. Every `interval` rows the outputs are flushed and fsynced, then the
+    # checkpoint file is replaced atomically, so it never refers to output that could be lost. Resuming cuts each
+    # output back to its checkpointed size, which drops any partly written batch, and skips the rows already done.
+    def __init__(self, path: str, settings: Optional[Dict[str, Any]] = None,
+                 interval: int = DEFAULT_CHECKPOINT_INTERVAL):
+        self.path = path
+        self.settings = settings or {}
+        self.interval = interval
+        self.offset = 0
+        self.sizes: Optional[Dict[str, int]] = None
+        self._saved_offset = 0
+
+    def load(self) -> bool:
+        # Returns whether there was a checkpoint to resume from.
+        if not os.path.exists(self.path):
+            return False
+
+        with open(self.path) as f:
+            state = json.load(f)
+
+        if state.get('version') != CHECKPOINT_VERSION:
+            raise ValueError('%s: unsupported checkpoint version %r' % (self.path, state.get('version')))
+        if state['settings'] != json.loads(json.dumps(self.settings)):
+            raise ValueError('%s: the checkpointed run used different arguments' % self.path)
+
+        self.offset = self._saved_offset = state['offset']
+        self.sizes = state['sizes']
+        return True
+
+    def resume_at(self, path: str) -> Optional[int]:
+        # The size to reopen an output at, or None to write it from the start.
+        if self.sizes is None:
+            return None
+        if path not in self.sizes:
+            raise ValueError('%s: %s was not an output of the checkpointed run' % (self.path, path))
+        return self.sizes[path]
+
+    def track(self, rows: Iterable[Tuple[Any, str]]) -> Iterator[Tuple[Tuple[int, Any], str]]:
+        # Skips the rows already done and tags each row id with its input offset, for commit to read back.
+        rows = itertools.islice(rows, self.offset, None)
+        return (((offset, row_id), text) for offset, (row_id, text) in enumerate(rows, self.offset))
+
+    def commit(self, results: Iterable[Tuple[Tuple[int, Any], List]],
+               writers: Iterable[RecordWriter]) -> Iterator[Tuple[Any, List]]:
+        # Yields the results with their original row ids. A row counts as done once the caller asks for the next
+        # one, having written it. Rows dropped before extraction are covered by the next row that is not.
+        writers = list(writers)
+
+        # Replaces any older checkpoint before the outputs are written to.
+        self.save(writers)
+
+        for (offset, row_id), extractions in results:
+            yield row_id, extractions
+
+            self.offset = offset + 1
+            if self.offset - self._saved_offset >= self.interval:
+                self.save(writers)
+
+    def save(self, writers: Iterable[RecordWriter]):
+        state = {
+            'version': CHECKPOINT_VERSION,
+            'settings': self.settings,
+            'offset': self.offset,
+            'sizes': {writer.path: writer.sync() for writer in writers},
+        }
+
+        temp_path = '%s.tmp' % self.path
+        with open(temp_path, 'w') as f:
+            json.dump(state, f)
+            f.flush()
+            os.fsync(f.fileno())
+
+        os.replace(temp_path, self.path)
+        _fsync_directory(os.path.dirname(os.path.abspath(self.path)))
+
+        self.sizes = state['sizes']
+        self._saved_offset = self.offset
+
+
+def checkpoint_from_args(args, output_paths: List[str]) -> Optional[CorpusCheckpoint]:
+    # The checkpoint for a CLI run with --checkpoint, --resume and --checkpoint-interval, loaded if resuming.
+    # Raises ValueError if the arguments or the checkpointed outputs do not allow it.
+    if args.checkpoint is None:
+        if args.resume:
+            raise ValueError('--resume needs --checkpoint')
+        return None
+
+    for path in output_paths:
+        if not is_resumable(path):
+            raise ValueError('--checkpoint needs delimited text output, Parquet and Arrow files can not be resumed')
+
+    checkpoint = CorpusCheckpoint(args.checkpoint, run_settings(args), interval=args.checkpoint_interval)
+
+    if not args.resume:
+        if os.path.exists(checkpoint.path):
+            os.remove(checkpoint.path)
+        return checkpoint
+
+    if checkpoint.load():
+        for path in output_paths:
+            size = checkpoint.resume_at(path)
+            if not os.path.exists(path) or os.path.getsize(path) < size:
+                raise ValueError('%s is missing or shorter than when it was checkpointed' % path)
+
+    return checkpoint
+
+
+def _fsync_directory(directory: str):
+    # Makes the rename itself durable. Not every platform can open a directory.
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+__all__ = ['CorpusCheckpoint', 'checkpoint_from_args', 'run_settings', 'DEFAULT_CHECKPOINT_INTERVAL']
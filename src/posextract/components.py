@@ -0,0 +1,76 @@
+import dataclasses
+from typing import Optional
+
+from spacy.language import Language
+from spacy.tokens import Doc
+
+from posextract import adj_noun_pairs, subj_verb_pairs
+from posextract.grammatical_triples import extract_one
+from posextract.util import TripleExtractorOptions, get_dep_matcher
+
+# Extractions are stored as tuples of plain dicts so the Doc can still be serialised with its user data, e.g. in a
+# DocBin, which gives them back unchanged (it would turn lists into tuples).
+for _extension in ('triples', 'adj_noun_pairs', 'subj_verb_pairs'):
+    if not Doc.has_extension(_extension):
+        Doc.set_extension(_extension, default=None)
+
+
+class TriplesComponent:
+    def __init__(self, nlp: Language, name: str, extractor_options: TripleExtractorOptions):
+        self.name = name
+        self.extractor_options = extractor_options
+        # The matcher has to share the pipeline's vocab, which may not be the default model's. Components and
+        # extractors over the same vocab share one matcher.
+        self.dep_matcher = get_dep_matcher(nlp)
+
+    def __call__(self, doc: Doc) -> Doc:
+        extractions = extract_one(doc, self.extractor_options, flatten=True, dep_matcher=self.dep_matcher)
+        doc._.triples = tuple(dataclasses.asdict(extraction) for extraction in extractions)
+        return doc
+
+
+class PairsComponent:
+    def __init__(self, name: str, rule, extension: str, lemmatize: bool, letter_case: str):
+        self.name = name
+        self.rule = rule
+        self.extension = extension
+        self.lemmatize = lemmatize
+        self.letter_case = letter_case
+
+    def __call__(self, doc: Doc) -> Doc:
+        pairs = self.rule(doc, lemmatize=self.lemmatize, letter_case=self.letter_case)
+        doc._.set(self.extension, tuple(pair._asdict() for pair in pairs))
+        return doc
+
+
+@Language.factory('posextract_triples', default_config={
+    'compound_subject': True,
+    'compound_object': True,
+    'combine_adj': False,
+    'add_auxiliary': False,
+    'prep_phrase': False,
+    'lemmatize': False,
+    'max_expansions': None,
+})
+def make_triples_component(nlp: Language, name: str, compound_subject: bool, compound_object: bool,
+                           combine_adj: bool, add_auxiliary: bool, prep_phrase: bool, lemmatize: bool,
+                           max_expansions: Optional[int]):
+    extractor_options = TripleExtractorOptions(compound_subject=compound_subject, compound_object=compound_object,
+                                               combine_adj=combine_adj, add_auxiliary=add_auxiliary,
+                                               prep_phrase=prep_phrase, lemmatize=lemmatize,
+                                               max_expansions=max_expansions)
+    return TriplesComponent(nlp, name, extractor_options)
+
+
+@Language.factory('posextract_adj_noun', default_config={'lemmatize': False, 'letter_case': 'default'})
+def make_adj_noun_component(nlp: Language, name: str, lemmatize: bool, letter_case: str):
+    return PairsComponent(name, adj_noun_pairs.rule, 'adj_noun_pairs', lemmatize, letter_case)
+
+
+@Language.factory('posextract_subj_verb', default_config={'lemmatize': False, 'letter_case': 'default'})
+def make_subj_verb_component(nlp: Language, name: str, lemmatize: bool, letter_case: str):
+    return PairsComponent(name, subj_verb_pairs.rule, 'subj_verb_pairs', lemmatize, letter_case)
+
+
+__all__ = ['TriplesComponent', 'PairsComponent', 'make_triples_component', 'make_adj_noun_component',
+           'make_subj_verb_component']
@@ -0,0 +1,23 @@
+from typing import Any, Iterator, Optional, Tuple
+
+DEFAULT_CHUNK_SIZE = 10000
+
+
+def read_corpus(filepath: str, data_column: str, id_column: Optional[str] = None, delimiter: str = ',',
+                chunksize: int = DEFAULT_CHUNK_SIZE) -> Iterator[Tuple[Any, str]]:
+    import pandas as pd
+
+    # Only the projected columns of one chunk are ever held in memory.
+    usecols = [data_column, ]
+
+    if id_column is not None:
+        usecols.append(id_column)
+
+    with pd.read_csv(filepath, index_col=id_column, usecols=usecols, delimiter=delimiter,
+                     chunksize=chunksize) as reader:
+        for chunk in reader:
+            # An empty cell is read as NaN, which the extractors cannot parse; it is yielded as an empty text instead.
+            yield from zip(chunk.index, chunk[data_column].fillna(''))
+
+
+__all__ = ['DEFAULT_CHUNK_SIZE', 'read_corpus']
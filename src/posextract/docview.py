@@ -0,0 +1,249 @@
+from typing import List, Optional, Tuple
+
+import numpy
+from spacy.attrs import HEAD, DEP, POS, LOWER
+from spacy.strings import get_string_id
+from spacy.symbols import *
+from spacy.tokens import Doc
+
+from posextract.verb_phrase import VerbPhrase, CCompVerbPhrase
+
+# Labels that are not spaCy symbols are compared by their string hash.
+ROOT_DEP = get_string_id('ROOT')
+DATIVE_DEP = get_string_id('dative')
+
+LOWER_FAILED = get_string_id('failed')
+LOWER_NOT = get_string_id('not')
+NEGATING_DETERMINERS = {get_string_id('no'), get_string_id('not'), get_string_id('never')}
+
+VERB_DEP_TAGS = {ccomp, relcl, xcomp, acl, advcl, pcomp, csubj, csubjpass, conj}
+OBJ_DEP_TAGS = {dobj, pobj, acomp}
+
+
+class ViewVerb:
+    # A verb or verb phrase during traversal. `first` and `second` are the same token for a single verb, and compare
+    # equal to the verb the way a VerbPhrase compares equal to either of its tokens.
+    __slots__ = ('i', 'first', 'second', 'phrase', 'dep', 'head')
+
+    def __init__(self, view: 'DocView', first: int, second: Optional[int] = None,
+                 phrase: Optional[VerbPhrase] = None):
+        self.i = first if phrase is None else None
+        self.first = first
+        self.second = first if second is None else second
+        self.phrase = phrase
+        self.dep = view.dep[first]
+        self.head = view.head[first]
+
+    def __eq__(self, other):
+        if isinstance(other, ViewVerb):
+            return self.first == other.first and self.second == other.second
+        return other == self.first or other == self.second
+
+    def token(self, doc: Doc):
+        return doc[self.i] if self.phrase is None else self.phrase
+
+
+class DocView:
+    # Integer arrays over a parsed Doc, built once so traversal works on token indices instead of Token objects.
+    # Children are stored as a CSR table: the children of token i are child_index[child_start[i]:child_start[i + 1]],
+    # in document order like Token.children.
+    def __init__(self, doc: Doc):
+        self.doc = doc
+
+        array = doc.to_array([HEAD, DEP, POS, LOWER])
+        n = len(doc)
+        indices = numpy.arange(n, dtype=numpy.int64)
+        heads = indices + array[:, 0].astype(numpy.int64)
+
+        non_roots = numpy.flatnonzero(heads != indices)
+        order = non_roots[numpy.argsort(heads[non_roots], kind='stable')]
+        counts = numpy.bincount(heads[non_roots], minlength=n)
+
+        self.head: List[int] = heads.tolist()
+        self.dep: List[int] = array[:, 1].tolist()
+        self.pos: List[int] = array[:, 2].tolist()
+        self.lower: List[int] = array[:, 3].tolist()
+        self.child_start: List[int] = [0] + numpy.cumsum(counts).tolist()
+        self.child_index: List[int] = order.tolist()
+
+        self._noun_conjuncts = {}
+        self._adjective_conjuncts = {}
+
+    def __len__(self):
+        return len(self.head)
+
+    def children(self, i: int) -> List[int]:
+        return self.child_index[self.child_start[i]:self.child_start[i + 1]]
+
+    def verb_children(self, verb: ViewVerb) -> List[int]:
+        if verb.phrase is None:
+            return self.children(verb.first)
+        return self.children(verb.first) + self.children(verb.second)
+
+    def conjuncts(self, i: int) -> List[int]:
+        # Mirrors Token.conjuncts.
+        start = i
+        while start != self.head[start] and self.dep[start] == conj:
+            start = self.head[start]
+
+        output = [start, ]
+        for word in output:
+            output.extend(child for child in self.children(word) if child > word and self.dep[child] == conj)
+
+        return [word for word in output if word != i]
+
+    def noun_conjuncts(self, i: int) -> List[int]:
+        # Nouns coordinated below token i through chains of conj, in the order post-processing has always used.
+        if i in self._noun_conjuncts:
+            return self._noun_conjuncts[i]
+
+        pos, dep = self.pos, self.dep
+        conjuncts = []
+        visited = set()
+        considering = self.children(i)
+
+        while considering:
+            token = considering.pop(-1)
+            if token in visited:
+                continue
+            visited.add(token)
+            if pos[token] == NOUN and dep[token] == conj:
+                conjuncts.append(token)
+                considering.extend(self.children(token))
+
+        self._noun_conjuncts[i] = conjuncts
+        return conjuncts
+
+    def adjective_conjuncts(self, i: int) -> List[int]:
+        # Adjectives coordinated with an adjectival complement, reached through adjectives only.
+        if i in self._adjective_conjuncts:
+            return self._adjective_conjuncts[i]
+
+        pos, dep = self.pos, self.dep
+        conjuncts = []
+
+        if pos[i] == ADJ and dep[i] == acomp:
+            visited = set()
+            considering = self.children(i)
+
+            while considering:
+                candidate = considering.pop(-1)
+                if candidate in visited:
+                    continue
+                visited.add(candidate)
+                if pos[candidate] == ADJ and dep[candidate] == conj:
+                    conjuncts.append(candidate)
+                for child in self.children(candidate):
+                    if child not in visited and pos[child] == ADJ:
+                        considering.append(child)
+
+        self._adjective_conjuncts[i] = conjuncts
+        return conjuncts
+
+    def find_root(self) -> Optional[int]:
+        dep = self.dep
+        for i in range(len(dep)):
+            if dep[i] == ROOT_DEP:
+                return i
+        return None
+
+    def is_verb(self, i: int) -> bool:
+        dep = self.dep[i]
+
+        if dep == ROOT_DEP:
+            return True
+
+        if self.pos[i] == PROPN and dep == conj:
+            return False
+
+        return dep in VERB_DEP_TAGS
+
+    def is_object(self, i: int) -> bool:
+        pos, dep = self.pos[i], self.dep[i]
+
+        if pos == NOUN and (dep == amod or dep == attr):
+            return True
+
+        if pos == PROPN and dep == attr:
+            return True
+
+        if pos == ADV and dep == advmod:
+            return True
+
+        if pos == PRON and dep == DATIVE_DEP:
+            return True
+
+        return dep in OBJ_DEP_TAGS
+
+    def is_noun_attribute(self, i: int) -> bool:
+        return (self.pos[i] == NOUN or self.pos[i] == PROPN) and self.dep[i] == attr
+
+    def is_poa(self, i: int) -> bool:
+        dep = self.dep[i]
+        return dep == prep or dep == agent or dep == det or dep == nmod
+
+    def subject_neg(self, i: int) -> Optional[int]:
+        for child in self.children(i):
+            if self.dep[child] == det and self.lower[child] in NEGATING_DETERMINERS:
+                return child
+            if self.dep[child] == neg:
+                return child
+
+        return None
+
+    def poa_neg(self, i: int) -> Optional[int]:
+        for child in self.children(i):
+            if self.dep[child] == neg:
+                return child
+
+        return None
+
+    def object_neg(self, i: int) -> Optional[int]:
+        negation = self.subject_neg(i)
+
+        if negation is not None:
+            return negation
+
+        head = self.head[i]
+        if self.pos[head] == PART and self.lower[head] == LOWER_NOT:
+            return head
+
+        return None
+
+    def verb_neg(self, verb: ViewVerb) -> Tuple[Optional[int], Optional[int]]:
+        # Mirrors util.get_verb_neg.
+        if isinstance(verb.phrase, CCompVerbPhrase):
+            token = verb.first
+        elif verb.phrase is not None:
+            token = verb.second
+        else:
+            token = verb.i
+
+        for child in self.children(token):
+            if self.dep[child] == neg:
+                return child, None
+
+        verb_parent = self.head[token]
+
+        if self.pos[verb_parent] == VERB and self.lower[verb_parent] == LOWER_FAILED and verb.dep == xcomp:
+            # get_verb_neg looks for "to" on a children iterator it has already exhausted, so this never matches.
+            return None, None
+        elif self.pos[verb_parent] == VERB and (verb.dep == ccomp or verb.dep == xcomp):
+            for child in self.children(verb_parent):
+                if self.dep[child] == neg:
+                    return child, None
+
+        return None, None
+
+    def should_consider_verb_phrase(self, verb: ViewVerb) -> bool:
+        if isinstance(verb.phrase, CCompVerbPhrase):
+            return True
+
+        for child in self.children(verb.second):
+            if self.dep[child] == nsubj or self.dep[child] == nsubjpass:
+                return False
+
+        return True
+
+
+__all__ = ['DocView', 'ViewVerb', 'ROOT_DEP', 'DATIVE_DEP']
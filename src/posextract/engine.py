@@ -0,0 +1,96 @@
+import collections
+import importlib
+import itertools
+import multiprocessing
+from typing import Any, Iterable, Iterator, List, Tuple
+
+from posextract.util import get_nlp, get_dep_matcher
+
+EXTRACTORS = {
+    'triples': 'posextract.grammatical_triples',
+    'adj_noun': 'posextract.adj_noun_pairs',
+    'subj_verb': 'posextract.subj_verb_pairs',
+    'unified': 'posextract.unified',
+}
+
+DEFAULT_SHARD_SIZE = 256
+
+# Set once per worker process by _init_worker.
+_WORKER_EXTRACTOR = None
+_WORKER_KWARGS = None
+
+
+def _load_extractor(kind: str, nlp=None):
+    # `nlp` is the pipeline passed on to the extractor, if any; otherwise the default model is loaded.
+    if kind not in EXTRACTORS:
+        raise ValueError('unknown extractor: %s (expected one of %s)' % (kind, ', '.join(EXTRACTORS)))
+
+    module = importlib.import_module(EXTRACTORS[kind])
+    if nlp is None:
+        nlp = get_nlp()
+
+    if kind in ('triples', 'unified'):
+        get_dep_matcher(nlp)
+
+    return module
+
+
+def _init_worker(kind: str, kwargs: dict):
+    global _WORKER_EXTRACTOR, _WORKER_KWARGS
+    _WORKER_EXTRACTOR = _load_extractor(kind, kwargs.get('nlp'))
+    _WORKER_KWARGS = kwargs
+
+
+def _extract_shard(shard: List[Tuple[Any, str]]) -> List[Tuple[Any, List]]:
+    results = [[] for _ in shard]
+
+    for i, extractions in _WORKER_EXTRACTOR.extract_iter([text for _, text in shard], **_WORKER_KWARGS):
+        results[i].extend(extractions)
+
+    return [(row_id, extractions) for (row_id, _), extractions in zip(shard, results)]
+
+
+def _iter_shards(rows: Iterable[Tuple[Any, str]], shard_size: int) -> Iterator[List[Tuple[Any, str]]]:
+    rows = iter(rows)
+    while True:
+        shard = list(itertools.islice(rows, shard_size))
+        if not shard:
+            return
+        yield shard
+
+
+def extract_corpus(kind: str, rows: Iterable[Tuple[Any, str]], jobs: int = 1,
+                   shard_size: int = DEFAULT_SHARD_SIZE, **kwargs) -> Iterator[Tuple[Any, List]]:
+    shards = _iter_shards(rows, shard_size)
+
+    if jobs <= 1:
+        _init_worker(kind, kwargs)
+        for shard in shards:
+            yield from _extract_shard(shard)
+        return
+
+    context = multiprocessing.get_context()
+
+    if context.get_start_method() == 'fork':
+        # Load the model before forking so the workers share its memory copy-on-write.
+        _load_extractor(kind, kwargs.get('nlp'))
+
+    # Keep a bounded number of shards in flight so a streamed corpus is never read ahead in full.
+    max_pending = jobs * 2
+    pending = collections.deque()
+
+    with context.Pool(jobs, initializer=_init_worker, initargs=(kind, kwargs)) as pool:
+        for shard in shards:
+            pending.append(pool.apply_async(_extract_shard, (shard,)))
+            if len(pending) >= max_pending:
+                yield from pending.popleft().get()
+
+        while pending:
+            yield from pending.popleft().get()
+
+        # Let the workers exit normally so their exit handlers (such as parse cache flushes) run.
+        pool.close()
+        pool.join()
+
+
+__all__ = ['EXTRACTORS', 'extract_corpus']
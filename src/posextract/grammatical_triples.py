@@ -1,17 +1,26 @@
 import collections
 import copy
-from typing import List, Union, Iterable, Optional
-
-import pandas
+import threading
+from typing import Hashable, List, Union, Iterable, Optional, Iterator, Tuple, TYPE_CHECKING
 
 import argparse
-import os
 
-from posextract.posrule.parser import parse_posrule
+from spacy.language import Language
+
+from posextract.cache import ParseCache, pipe_docs
+from posextract.checkpoint import checkpoint_from_args, DEFAULT_CHECKPOINT_INTERVAL
+from posextract.corpus import read_corpus, DEFAULT_CHUNK_SIZE
+from posextract.docview import DocView
+from posextract.instrumentation import ExtractionStats, timed, timed_iter
+from posextract.engine import extract_corpus
+from posextract.posrule.compiler import CompiledFilter, compile_filters
 from posextract.traversal import graph_tokens
 from posextract.triple_extraction import TripleExtraction, TripleExtractionFlattened
 from posextract.util import *
-import pandas as pd
+from posextract.writer import open_writer, record_fields, DEFAULT_FLUSH_SIZE, FSYNC_POLICIES, OUTPUT_HELP
+
+if TYPE_CHECKING:
+    import pandas
 
 
 try:
@@ -20,16 +29,21 @@ except AttributeError:
     collectionsAbc = collections
 
 
-nlp = get_nlp()
+def __getattr__(name):
+    # The language model is loaded on first use rather than at import time.
+    if name == 'nlp':
+        return get_nlp()
+    raise AttributeError('module %r has no attribute %r' % (__name__, name))
 
 
-def post_process_combine_adj(extractions: List[TripleExtraction]):
+def post_process_combine_adj(extractions: List[TripleExtraction], view: DocView):
     possible_dupes = {}
+    dep = view.dep
 
     for extraction in extractions:
-        if isinstance(extraction.verb, VerbPhrase):
+        if extraction.verb_phrase is not None:
             continue
-        key = (extraction.subject.i, extraction.verb.i)
+        key = (extraction.subject, extraction.verb)
         possible_dupes.setdefault(key, []).append(extraction)
 
     new_extractions = []
@@ -43,18 +57,18 @@ def post_process_combine_adj(extractions: List[TripleExtraction]):
         # Find the extraction with a pobj or dobj
         try:
             ext_main = next(
-                ext for ext in dupe_list if ext.object.dep == pobj or ext.object.dep == dobj or ext.object.dep == acomp)
+                ext for ext in dupe_list if dep[ext.object] == pobj or dep[ext.object] == dobj or dep[ext.object] == acomp)
             adjectives = []
 
             for ext in dupe_list:
-                if ext.object.i == ext_main.object.i:
+                if ext.object == ext_main.object:
                     continue
-                if ext.object.dep == advmod and not ext.poa:
+                if dep[ext.object] == advmod and ext.poa is None:
                     adjectives.append(ext.object)
                 else:
                     new_extractions.append(ext)
 
-            ext_main.object_adjectives = adjectives
+            ext_main.object_adjectives = tuple(adjectives)
             new_extractions.append(ext_main)
 
         except StopIteration:
@@ -65,210 +79,364 @@ def post_process_combine_adj(extractions: List[TripleExtraction]):
     return new_extractions
 
 
-def post_process_prep_phrase(extraction: TripleExtraction):
+def post_process_prep_phrase(extraction: TripleExtraction, doc: Doc):
     # Rule 1: check if the prep "of" or "to" is the child of the object, and if it is, check to see if a noun is the child of the preposition.
     # Rule 2: check if the prep "with" is the child of the verb, and it if is, see if the pobj is the child of the preposition.
 
-    for child in extraction.object.children:
+    poa = extraction.get_token(doc, 'poa')
+
+    for child in doc[extraction.object].children:
         if child.text in ('of', 'to'):
             nouns = [childchild for childchild in child.children if childchild.pos == NOUN or childchild.dep == pobj]
 
             if len(nouns) != 1:
                 continue
 
-            extraction.object_prep = child
-            extraction.object_prep_noun = nouns[0]
+            extraction.object_prep = child.i
+            extraction.object_prep_noun = nouns[0].i
 
             return extraction
         
     # Experimenting with adding this back (may result in double counted "with" statements
-     for child in extraction.verb.children:
-         if child == extraction.poa:
-             continue
-         if child.text == 'with':
-             pobjs = [childchild for childchild in child.children if childchild.dep == pobj]
-    
-             if len(pobjs) != 1:
-                 continue
-    
-             extraction.object_prep = child
-             extraction.object_prep_noun = pobjs[0]
-             return extraction
+    for child in extraction.get_verb(doc).children:
+        if child == poa:
+            continue
+        if child.text == 'with':
+            pobjs = [childchild for childchild in child.children if childchild.dep == pobj]
 
-    return extraction
+            if len(pobjs) != 1:
+                continue
 
+            extraction.object_prep = child.i
+            extraction.object_prep_noun = pobjs[0].i
+            return extraction
 
-def post_process_conj_triples(triple: TripleExtraction):
-    new_extractions = []
+    return extraction
 
-    # Look for additional triples due to conj dependency
 
-    visited = set()
-    considering = list(triple.subject.children)
+def post_process_conj_triples(extractions: List[TripleExtraction], view: DocView,
+                              max_expansions: Optional[int] = None) -> List[TripleExtraction]:
+    # Adds a copy of each triple for every noun coordinated with its subject or object, and every adjective
+    # coordinated with an adjectival complement object. Copies are expanded in turn, breadth first. A copy only
+    # differs from the triple it was expanded from by its subject and object, so each (triple, subject, object) state
+    # is expanded once. `max_expansions` caps the number of copies added for the Doc.
+    extractions = list(extractions)
+    original_count = len(extractions)
+    worklist = collections.deque(enumerate(extractions))
+    seen = {(origin, triple.subject, triple.object) for origin, triple in enumerate(extractions)}
+
+    while worklist:
+        origin, triple = worklist.popleft()
+        subject, obj = triple.subject, triple.object
+
+        candidates = [(conjunct, obj) for conjunct in view.noun_conjuncts(subject)]
+        candidates.extend((subject, conjunct) for conjunct in view.noun_conjuncts(obj))
+        candidates.extend((subject, conjunct) for conjunct in view.adjective_conjuncts(obj))
+
+        for new_subject, new_object in candidates:
+            key = (origin, new_subject, new_object)
+            if key in seen:
+                continue
 
-    while considering:
-        token = considering.pop(-1)
-        if token in visited:
-            continue
-        visited.add(token)
-        if token.pos == NOUN and token.dep == conj:
+            if max_expansions is not None and len(extractions) - original_count >= max_expansions:
+                return extractions
+
+            seen.add(key)
             new_triple = copy.copy(triple)
-            new_triple.subject = token
-            new_extractions.append(new_triple)
-            considering.extend(token.children)
+            new_triple.subject = new_subject
+            new_triple.object = new_object
+            extractions.append(new_triple)
+            worklist.append((origin, new_triple))
 
-    visited = set()
-    considering = list(triple.object.children)
+    return extractions
 
-    while considering:
-        token = considering.pop(-1)
-        if token in visited:
-            continue
-        visited.add(token)
-        if token.pos == NOUN and token.dep == conj:
-            new_triple = copy.copy(triple)
-            new_triple.object = token
-            new_extractions.append(new_triple)
-            considering.extend(token.children)
 
-    return new_extractions
+def resolve_coreferences(triple: TripleExtraction, doc: Doc):
+    subject = doc[triple.subject]
+
+    if subject.text.lower() == 'which':
+        if subject.head.pos == NOUN:
+            subject = subject.head
+            triple.subject = subject.i
 
+    if subject.text.lower() == 'who' and subject.pos == PRON:
+        verb = triple.get_verb(doc)
+        if verb == subject.head:
+            noun = verb.head
+            if noun.pos in (NOUN, PROPN) and verb.dep == relcl:
+                triple.subject = noun.i
 
-def post_process_adj_acomp(triple: TripleExtraction):
-    if triple.object.pos != ADJ or triple.object.dep != acomp:
-        return []
 
-    new_triples = []
-    visited = set()
-    considering = list(triple.object.children)
+def add_auxiliary_verb(triple: TripleExtraction, doc: Doc):
+    for child in triple.get_verb(doc).children:
+        if child.dep == aux:
+            triple.aux_verb = child.i
+            break
 
-    while considering:
-        candidate = considering.pop(-1)
 
-        if candidate in visited:
-            continue
+def yield_non_duplicate_triples(extractions: List[TripleExtraction], doc: Doc) -> List[TripleExtraction]:
+    hashes = set()
+    for triple in extractions:
+        h = triple.get_triple_hash(doc)
+        if h not in hashes:
+            yield triple
+            hashes.add(h)
 
-        visited.add(candidate)
 
-        if candidate.pos == ADJ and candidate.dep == conj:
-            new_triple = copy.copy(triple)
-            new_triple.object = candidate
-            new_triples.append(new_triple)
+def find_triples(doc: Doc, view: DocView, extractor_options: TripleExtractorOptions,
+                 filters: Optional[CompiledFilter] = None, dep_matcher: Optional[DependencyMatcher] = None,
+                 verbose: bool = False, doc_id: Optional[Hashable] = None,
+                 stats: Optional[ExtractionStats] = None) -> List[TripleExtraction]:
+    # Pruning changes which triples use up a capped expansion budget, so it is only done without a cap.
+    extractions = graph_tokens(doc, verbose=verbose, dep_matcher=dep_matcher, view=view, doc_id=doc_id,
+                               filters=filters if extractor_options.max_expansions is None else None, stats=stats)
+    if stats is not None: stats.count('extractions_found', len(extractions))
+    return extractions
 
-        for child in candidate.children:
-            if child not in visited:
-                if child.pos != ADJ:
-                    continue
-                considering.append(child)
 
-    return new_triples
+def post_process_triples(extractions: List[TripleExtraction], view: DocView,
+                         extractor_options: TripleExtractorOptions,
+                         filters: Optional[CompiledFilter] = None,
+                         stats: Optional[ExtractionStats] = None) -> List[TripleExtraction]:
+    doc = view.doc
 
+    with timed(stats, 'dedup'):
+        extractions = list(yield_non_duplicate_triples(extractions, doc))
+    if stats is not None: stats.count('extractions_deduplicated', len(extractions))
 
-def resolve_coreferences(triple: TripleExtraction):
-    if triple.subject.text.lower() == 'which':
-        if triple.subject.head.pos == NOUN:
-            triple.subject = triple.subject.head
+    with timed(stats, 'conj_expansion'):
+        extractions = post_process_conj_triples(extractions, view, max_expansions=extractor_options.max_expansions)
+    if stats is not None: stats.count('extractions_expanded', len(extractions))
 
-    if triple.subject.text.lower() == 'who' and triple.subject.pos == PRON:
-        if triple.verb == triple.subject.head:
-            noun = triple.verb.head
-            if noun.pos in (NOUN, PROPN) and triple.verb.dep == relcl:
-                triple.subject = noun
+    if extractor_options.combine_adj:
+        with timed(stats, 'combine_adj'):
+            extractions = post_process_combine_adj(extractions, view)
 
+    with timed(stats, 'dedup'):
+        extractions = list(yield_non_duplicate_triples(extractions, doc))
+    if stats is not None: stats.count('extractions_after_dedup', len(extractions))
 
-def add_auxiliary_verb(triple: TripleExtraction):
-    for child in triple.verb.children:
-        if child.dep == aux:
-            triple.aux_verb = child
-            break
+    with timed(stats, 'post_process'):
+        for triple in extractions:
+            resolve_coreferences(triple, doc)
 
+            if extractor_options.add_auxiliary:
+                add_auxiliary_verb(triple, doc)
 
-def yield_non_duplicate_triples(extractions: List[TripleExtraction]) -> List[TripleExtraction]:
-    hashes = set()
-    for triple in extractions:
-        h = triple.get_triple_hash()
-        if h not in hashes:
-            yield triple
-            hashes.add(h)
+            if extractor_options.prep_phrase:
+                post_process_prep_phrase(triple, doc)
+
+    if filters is not None:
+        with timed(stats, 'filters'):
+            matched = [triple for triple in extractions if filters.matches(triple, doc)]
+        if stats is not None: stats.count('extractions_filtered_out', len(extractions) - len(matched))
+        extractions = matched
+
+    return extractions
+
+
+def flatten_triples(extractions: List[TripleExtraction], doc: Doc,
+                    extractor_options: TripleExtractorOptions) -> List[TripleExtractionFlattened]:
+    return [
+        triple.flatten(doc, lemmatize=extractor_options.lemmatize,
+                       compound_subject=extractor_options.compound_subject,
+                       compound_object=extractor_options.compound_object)
+        for triple in extractions]
+
+
+# Filter lists extract_one has compiled, by identity, so a list passed with every sentence is compiled once. Each
+# entry holds the list, which keeps its id from being reused, and the rules it held, so a list changed since is
+# compiled again.
+_COMPILED_FILTERS = collections.OrderedDict()
+_COMPILED_FILTERS_SIZE = 16
+_COMPILED_FILTERS_LOCK = threading.Lock()
+
+
+def _compile_filters_once(filters):
+    if not isinstance(filters, (list, tuple)):
+        return compile_filters(filters)
+
+    rules = tuple(filters)
+    with _COMPILED_FILTERS_LOCK:
+        entry = _COMPILED_FILTERS.get(id(filters))
+        if entry is not None and entry[0] is filters and len(entry[1]) == len(rules) and \
+                all(cached is rule for cached, rule in zip(entry[1], rules)):
+            _COMPILED_FILTERS.move_to_end(id(filters))
+            return entry[2]
+
+    compiled = compile_filters(rules)
+
+    with _COMPILED_FILTERS_LOCK:
+        _COMPILED_FILTERS[id(filters)] = (filters, rules, compiled)
+        _COMPILED_FILTERS.move_to_end(id(filters))
+        while len(_COMPILED_FILTERS) > _COMPILED_FILTERS_SIZE:
+            _COMPILED_FILTERS.popitem(last=False)
+
+    return compiled
 
 
 def extract_one(doc: Doc, extractor_options: TripleExtractorOptions = None,
                 verbose: bool = False, flatten: bool = False,
-                filters: Optional[List] = None):
+                filters: Optional[List] = None, dep_matcher: Optional[DependencyMatcher] = None,
+                doc_id: Optional[Hashable] = None, stats: Optional[ExtractionStats] = None):
+    # find_triples, post_process_triples and flatten_triples are the stages of extraction, which can also be called
+    # separately, for example to time them. `stats`, if given, records the time and work of each stage. `filters` can
+    # be a CompiledFilter or a list of rules, which is compiled on the first call it is passed to.
     if extractor_options is None:
         extractor_options = TripleExtractorOptions()
 
-    extractions = graph_tokens(doc, verbose=verbose)
-    extractions = list(yield_non_duplicate_triples(extractions))
+    filters = _compile_filters_once(filters)
+    doc_stats = stats.for_doc() if stats is not None else None
 
-    for triple in extractions:
-        extractions.extend(post_process_conj_triples(triple))
-        extractions.extend(post_process_adj_acomp(triple))
+    with timed(doc_stats, 'graph_tokens'):
+        view = DocView(doc)
+        extractions = find_triples(doc, view, extractor_options, filters=filters, dep_matcher=dep_matcher,
+                                   verbose=verbose, doc_id=doc_id, stats=doc_stats)
 
-    if extractor_options.combine_adj:
-        extractions = post_process_combine_adj(extractions)
+    extractions = post_process_triples(extractions, view, extractor_options, filters=filters, stats=doc_stats)
 
-    extractions = list(yield_non_duplicate_triples(extractions))
+    if flatten:
+        with timed(doc_stats, 'flatten'):
+            extractions = flatten_triples(extractions, doc, extractor_options)
 
-    for triple in extractions:
-        resolve_coreferences(triple)
+    if stats is not None:
+        doc_stats.count('docs')
+        doc_stats.count('extractions', len(extractions))
+        stats.finish_doc(doc_stats, doc)
 
-        if extractor_options.add_auxiliary:
-            add_auxiliary_verb(triple)
+    return extractions
 
-        if extractor_options.prep_phrase:
-            post_process_prep_phrase(triple)
 
-    def filter_func(ext):
-        for ext_filter in filters:
-            if ext_filter.eval(ext):
-                return True
-        return False
+def get_triples_pipeline(extractor_options: TripleExtractorOptions) -> PipelineVariant:
+    # Lemmas are needed even without extractor_options.lemmatize: flatten uses them for verbs that come before
+    # their subject and for xcomp verb phrases.
+    return get_pipeline(lemmas=True, noun_chunks=extractor_options.use_noun_chunks)
 
-    if filters:
-        extractions = list(filter(filter_func, extractions))
 
-    if flatten:
-        extractions = [
-            triple.flatten(lemmatize=extractor_options.lemmatize,
-                           compound_subject=extractor_options.compound_subject,
-                           compound_object=extractor_options.compound_object)
-            for triple in extractions]
+def _iter_fragments(input_object: Iterable[str]):
+    # Each fragment with its document's index and its own index within the document.
+    for i, document in enumerate(input_object):
+        for j, sent in enumerate(split_quotes(document)):
+            yield sent, (i, j)
 
-    return extractions
 
+def _prefiltered(fragments, prefilter, stats: Optional[ExtractionStats]):
+    for sent, i in fragments:
+        if prefilter(sent):
+            yield sent, i
+        elif stats is not None:
+            stats.count('sentences_skipped')
 
-def extract(input_object: Union[str, Iterable[str]], extractor_options: TripleExtractorOptions = None,
-            verbose: bool = False,
-            want_dataframe: bool = False,
-            filters: Optional[List] = None) -> Union[List[TripleExtractionFlattened], pandas.DataFrame]:
-    if extractor_options is None:
-        extractor_options = TripleExtractorOptions()
 
-    if extractor_options.use_noun_chunks:
-        get_nlp().add_pipe('merge_noun_chunks')
+class TripleExtractor:
+    # One extraction configuration: its pipeline, dependency matcher, options and compiled filters. Extracting only
+    # reads them (the prefilter's counts aside), so an extractor can be shared by a thread pool, and extractors with
+    # different configurations can be used side by side. `nlp` defaults to the shared en_core_web_sm pipeline.
+    # `stats` is passed per call rather than kept on the extractor, so that each thread can record into its own.
+    def __init__(self, extractor_options: TripleExtractorOptions = None, filters: Optional[List] = None,
+                 nlp: Optional[Language] = None, verbose: bool = False, batch_size: int = DEFAULT_BATCH_SIZE):
+        if extractor_options is None:
+            extractor_options = TripleExtractorOptions()
+
+        self.extractor_options = extractor_options
+        self.filters = compile_filters(filters)
+        self.verbose = verbose
+        self.batch_size = batch_size
+
+        if nlp is None:
+            self.nlp = get_triples_pipeline(extractor_options)
+        else:
+            self.nlp = make_pipeline(nlp, lemmas=True, noun_chunks=extractor_options.use_noun_chunks)
+
+        self.dep_matcher = get_dep_matcher(self.nlp)
+
+    def extract_doc(self, doc: Doc, doc_id: Optional[Hashable] = None, flatten: bool = True,
+                    stats: Optional[ExtractionStats] = None, finish: bool = False):
+        # With `finish`, `doc` comes from self.nlp.parser, as when a parse is shared with the pair extractors, and
+        # the pipeline's finishing steps (merging noun chunks) are applied to a copy of it first.
+        if finish and self.nlp.after:
+            doc = self.nlp.finish(doc.copy())
+
+        return extract_one(doc, self.extractor_options, verbose=self.verbose, flatten=flatten, filters=self.filters,
+                           dep_matcher=self.dep_matcher, doc_id=doc_id, stats=stats)
+
+    def extract_iter(self, input_object: Union[str, Iterable[str]], parse_cache: Optional[ParseCache] = None,
+                     stats: Optional[ExtractionStats] = None, flatten: bool = True) \
+            -> Iterator[Tuple[int, List[Union[TripleExtractionFlattened, TripleExtraction]]]]:
+        # Yields the triples of each quote-split fragment with its document's index. Unflattened triples carry the
+        # doc_id (document index, fragment index) of the fragment they came from.
+        if type(input_object) == str:
+            input_object = [input_object, ]
+        elif not isinstance(input_object, collectionsAbc.Iterable):
+            raise ValueError('extract_triples: input should be a string or a collection of strings')
+
+        fragments = _iter_fragments(input_object)
+
+        # Sentences the filters rule out from their text alone are never parsed.
+        if self.filters is not None and self.filters.prefilter is not None:
+            fragments = _prefiltered(fragments, self.filters.prefilter, stats)
+
+        def generate():
+            docs = pipe_docs(self.nlp, fragments, batch_size=self.batch_size, parse_cache=parse_cache)
+            for doc, (i, j) in timed_iter(docs, stats, 'nlp'):
+                yield i, self.extract_doc(doc, doc_id=(i, j), flatten=flatten, stats=stats)
 
-    output_extractions = []
+        return generate()
 
-    if type(input_object) == str:
-        input_object = [input_object, ]
-    elif not isinstance(input_object, collectionsAbc.Iterable):
-        raise ValueError('extract_triples: input should be a string or a collection of strings')
+    def extract_batch(self, texts: Iterable[str], parse_cache: Optional[ParseCache] = None,
+                      stats: Optional[ExtractionStats] = None) -> List[List[TripleExtractionFlattened]]:
+        # The triples of each text, in input order. The texts are parsed together, in batches of batch_size.
+        texts = [texts, ] if type(texts) == str else list(texts)
+        results = [[] for _ in texts]
 
-    for i, doc in enumerate(input_object):
-        for sent in split_quotes(doc):
-            sent = nlp(sent)
-            output_extractions.extend(
-                extract_one(sent,extractor_options, flatten=True, verbose=verbose,
-                            filters=filters))
+        for i, extractions in self.extract_iter(texts, parse_cache=parse_cache, stats=stats):
+            results[i].extend(extractions)
+
+        return results
+
+    def extract(self, input_object: Union[str, Iterable[str]], parse_cache: Optional[ParseCache] = None,
+                stats: Optional[ExtractionStats] = None) -> List[TripleExtractionFlattened]:
+        output_extractions = []
+
+        for i, extractions in self.extract_iter(input_object, parse_cache=parse_cache, stats=stats):
+            output_extractions.extend(extractions)
+
+        return output_extractions
+
+    def __call__(self, input_object: Union[str, Iterable[str]]) -> List[TripleExtractionFlattened]:
+        return self.extract(input_object)
+
+
+def extract_iter(input_object: Union[str, Iterable[str]], extractor_options: TripleExtractorOptions = None,
+                 verbose: bool = False,
+                 filters: Optional[List] = None,
+                 batch_size: int = DEFAULT_BATCH_SIZE,
+                 parse_cache: Optional[ParseCache] = None,
+                 stats: Optional[ExtractionStats] = None,
+                 nlp: Optional[Language] = None) -> Iterator[Tuple[int, List[TripleExtractionFlattened]]]:
+    extractor = TripleExtractor(extractor_options, filters=filters, nlp=nlp, verbose=verbose, batch_size=batch_size)
+    return extractor.extract_iter(input_object, parse_cache=parse_cache, stats=stats)
+
+
+def extract(input_object: Union[str, Iterable[str]], extractor_options: TripleExtractorOptions = None,
+            verbose: bool = False,
+            want_dataframe: bool = False,
+            filters: Optional[List] = None,
+            batch_size: int = DEFAULT_BATCH_SIZE,
+            parse_cache: Optional[ParseCache] = None,
+            stats: Optional[ExtractionStats] = None) -> Union[List[TripleExtractionFlattened], 'pandas.DataFrame']:
+    extractor = TripleExtractor(extractor_options, filters=filters, verbose=verbose, batch_size=batch_size)
+    output_extractions = extractor.extract(input_object, parse_cache=parse_cache, stats=stats)
+    prefilter = extractor.filters.prefilter if extractor.filters is not None else None
+
+    if verbose and prefilter is not None:
+        print('Skipped %d of %d sentences that cannot match the filters' % (prefilter.skipped, prefilter.checked))
 
     if want_dataframe:
+        import pandas as pd
         extractions_df = pd.DataFrame([t.__dict__ for t in output_extractions])
         return extractions_df
 
-    if extractor_options.use_noun_chunks:
-        get_nlp().remove_pipe('merge_noun_chunks')
-
     return output_extractions
 
 
@@ -281,7 +449,7 @@ if __name__ == '__main__':
     parser.add_argument('--input-filters', type=str,
                         help='An input file or directory containing posextract filter rules.')
     parser.add_argument('--output', metavar='output', type=str,
-                        help='an output path', required=True)
+                        help=OUTPUT_HELP, required=True)
     parser.add_argument('--data-column', type=str, default=None, metavar='data_col',
                         help='what column to use if a csv is given', dest='data_column')
     parser.add_argument('--id-column', type=str, default=None, metavar='id_col',
@@ -297,6 +465,33 @@ if __name__ == '__main__':
     parser.add_argument('--no-compound-subject', action='store_true')
     parser.add_argument('--no-compound-object', action='store_true')
     parser.add_argument('--use-noun-chunks', action='store_true')
+    parser.add_argument('--max-expansions', type=int, default=None,
+                        help='maximum number of conjunct triples added per sentence (default: no limit)')
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+                        help='number of sentences parsed per nlp.pipe batch (default: %(default)s)')
+    parser.add_argument('--jobs', type=int, default=1,
+                        help='number of worker processes to extract with (default: %(default)s)')
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE,
+                        help='number of csv rows read into memory at a time (default: %(default)s)')
+    parser.add_argument('--flush-size', type=int, default=DEFAULT_FLUSH_SIZE,
+                        help='number of output rows buffered between writes (default: %(default)s)')
+    parser.add_argument('--fsync', default='none', choices=FSYNC_POLICIES,
+                        help='when to fsync the output file (default: %(default)s)')
+    parser.add_argument('--row-group-size', type=int, default=None,
+                        help='maximum rows per row group in Parquet or Arrow output (default: one per flush)')
+    parser.add_argument('--parse-cache', type=str, default=None,
+                        help='a directory in which to cache parsed sentences between runs')
+    parser.add_argument('--filter-cache', type=str, default=None,
+                        help='a directory in which to cache parsed filter rule files between runs')
+    parser.add_argument('--stats', action='store_true',
+                        help='print the time spent in each extraction stage and counts of the work done '
+                             '(only with --jobs 1)')
+    parser.add_argument('--checkpoint', type=str, default=None,
+                        help='a file in which to record how far the run has got, for --resume')
+    parser.add_argument('--checkpoint-interval', type=int, default=DEFAULT_CHECKPOINT_INTERVAL,
+                        help='number of input rows between checkpoints (default: %(default)s)')
+    parser.add_argument('--resume', action='store_true',
+                        help='continue from the --checkpoint file, if there is one, instead of starting over')
 
     args = parser.parse_args()
     is_file = args.input_file is not None
@@ -309,6 +504,7 @@ if __name__ == '__main__':
         prep_phrase=args.prep_phrase,
         lemmatize=args.lemma,
         use_noun_chunks=args.use_noun_chunks,
+        max_expansions=args.max_expansions,
     )
 
     inputs = []
@@ -317,12 +513,15 @@ if __name__ == '__main__':
 
     delimiter = {'comma': ',', 'pipe': '|', 'tab': '\t'}[args.file_delimiter]
 
-    input_values = None
-    df = None
+    rows = None
 
     if not args.input and not args.input_file:
         exit('Please provide either an input string or an input file')
 
+    # Worker processes would each record into their own copy.
+    if args.stats and args.jobs > 1:
+        exit('Invalid arguments: --stats can only be used with --jobs 1')
+
     if is_file:
         if args.verbose:
             print('Loading input (%s) as a CSV file...' % args.input_file)
@@ -330,47 +529,68 @@ if __name__ == '__main__':
         if args.data_column is None:
             exit('Invalid arguments: Must specify column name for data using --data-column')
 
-        usecols = [args.data_column, ]
+        rows = read_corpus(args.input_file, args.data_column, id_column=args.id_column, delimiter=delimiter,
+                           chunksize=args.chunk_size)
+    else:
+        rows = enumerate([args.input, ])
 
-        if args.id_column is not None:
-            usecols.append(args.id_column)
+    try:
+        checkpoint = checkpoint_from_args(args, [args.output])
+    except ValueError as e:
+        exit('Invalid arguments: %s' % e)
 
-        df = pd.read_csv(args.input_file, index_col=args.id_column, usecols=usecols, delimiter=delimiter)
-        input_values = df[args.data_column]
-    else:
-        input_values = [args.input, ]
+    if checkpoint is not None:
+        if args.verbose and checkpoint.offset:
+            print('Resuming after %d rows' % checkpoint.offset)
+        rows = checkpoint.track(rows)
 
     if args.input_filters:
-        input_filters = args.input_filters
-        if os.path.isfile(input_filters):
-            filters.append(parse_posrule(input_filters))
-        elif os.path.isdir(input_filters):
-            for dirpath, dirnames, filenames in os.walk(input_filters):
-                filenames = [fn for fn in filenames if fn.endswith('.posrule')]
-                for fn in filenames:
-                    fn = f'{dirpath}{"/" if not fn.startswith("/") else ""}{fn}'
-                    filters.append(parse_posrule(fn))
-        else:
-            raise FileNotFoundError(args.input_filters)
+        from posextract.posrule.parser import load_posrules
 
-    with open(args.output, 'w+') as f:
-        pass
+        filters = load_posrules(args.input_filters, verbose=args.verbose, cache_dir=args.filter_cache)
+
+    # Compiled once here; worker processes compile their own copy when it is unpickled.
+    filters = compile_filters(filters)
+    prefilter = None
+
+    # Rows whose text rules out every filter are not sent to the extractor at all. They are counted on a copy of the
+    # prefilter, apart from the fragments the extractor skips itself.
+    if filters is not None and filters.prefilter is not None:
+        prefilter = filters.prefilter.copy()
+        rows = ((row_id, text) for row_id, text in rows if prefilter(text))
 
     extraction_count = 0
-    header = True
+    parse_cache = ParseCache(args.parse_cache) if args.parse_cache else None
+    stats = ExtractionStats() if args.stats else None
+
+    results = extract_corpus('triples', rows, jobs=args.jobs, extractor_options=extractor_options,
+                             verbose=args.verbose, filters=filters, batch_size=args.batch_size,
+                             parse_cache=parse_cache, stats=stats)
+
+    with open_writer(args.output, record_fields(TripleExtractionFlattened), delimiter=delimiter,
+                     id_column='sentence_id' if is_file else None,
+                     flush_size=args.flush_size, fsync=args.fsync,
+                     row_group_size=args.row_group_size,
+                     resume_at=checkpoint.resume_at(args.output) if checkpoint is not None else None) as writer:
+        if checkpoint is not None:
+            results = checkpoint.commit(results, [writer, ])
+
+        for sentence_id, extractions in results:
+            writer.write(extractions, sentence_id)
+            extraction_count += len(extractions)
+
+        if checkpoint is not None:
+            checkpoint.save([writer, ])
 
-    for i, data_str in enumerate(input_values):
-        triples_df = extract(data_str, extractor_options=extractor_options, verbose=args.verbose, want_dataframe=True,
-                             filters=filters)
-        extraction_count += len(triples_df)
-        if df is not None:
-            triples_df['sentence_id'] = df.index[i]
-        triples_df.to_csv(args.output, mode='a', sep=delimiter, header=header, index=False)
+    if parse_cache is not None:
+        parse_cache.close()
 
-        if header:
-            header = False
+    if stats is not None:
+        print(stats.summary())
 
     if args.verbose:
         print('Number of extractions: %d' % extraction_count)
+        if prefilter is not None:
+            print('Skipped %d of %d sentences that cannot match the filters' % (prefilter.skipped, prefilter.checked))
 
-__all__ = ['extract', 'extract_one']
+__all__ = ['extract', 'extract_iter', 'extract_one', 'TripleExtractor']
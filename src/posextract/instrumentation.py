@@ -0,0 +1,140 @@
+import collections
+import contextlib
+import time
+from typing import Callable, Dict, Iterable, Iterator, Optional, Sequence
+
+from spacy.tokens import Doc
+
+# Stages timed during extraction, in the order they run. graph_tokens includes dep_matcher and rules; pairs is the
+# adjective-noun and subject-verb rules.
+STAGES = ('nlp', 'graph_tokens', 'dep_matcher', 'rules', 'dedup', 'conj_expansion', 'combine_adj', 'post_process',
+          'filters', 'flatten', 'pairs')
+
+# Counters, in the order they are reported.
+COUNTERS = (
+    'docs',
+    'sentences_skipped',  # ruled out by the filters' prefilter before parsing
+    'verbs',
+    'verbs_pruned',  # verbs the filters rule out, not searched
+    'subjects_pruned',
+    'verb_phrases',
+    'candidates',  # (subject, object) pairs considered for a verb
+    'rules_tried',
+    'rule_matches',
+    'extractions_found',  # as found by graph_tokens
+    'extractions_deduplicated',  # after the first deduplication
+    'extractions_expanded',  # after conjunct expansion
+    'extractions_after_dedup',  # after the second deduplication
+    'extractions_filtered_out',
+    'extractions',
+)
+
+StatsCallback = Callable[['ExtractionStats', Doc], None]
+
+
+class ExtractionStats:
+    # Seconds spent in each stage of extraction, and counts of the work done, summed over every Doc extracted with it.
+    # Extraction functions take it as an optional `stats` argument and skip all of this when it is None. Callbacks are
+    # called after each Doc with a separate ExtractionStats holding only that Doc's numbers. Updates are not locked,
+    # so threads extracting at the same time should each use their own and merge them afterwards.
+    def __init__(self, callbacks: Sequence[StatsCallback] = ()):
+        self.seconds: Dict[str, float] = collections.defaultdict(float)
+        self.counts: Dict[str, int] = collections.Counter()
+        self.callbacks = list(callbacks)
+
+    def add_callback(self, callback: StatsCallback):
+        self.callbacks.append(callback)
+
+    def add_time(self, stage: str, seconds: float):
+        self.seconds[stage] += seconds
+
+    def count(self, name: str, n: int = 1):
+        self.counts[name] += n
+
+    def for_doc(self) -> 'ExtractionStats':
+        # Where to record one Doc: a fresh object when callbacks need the Doc's own numbers, otherwise this one.
+        return ExtractionStats() if self.callbacks else self
+
+    def finish_doc(self, doc_stats: 'ExtractionStats', doc: Doc):
+        if doc_stats is self:
+            return
+        self.merge(doc_stats)
+        for callback in self.callbacks:
+            callback(doc_stats, doc)
+
+    def merge(self, other: 'ExtractionStats'):
+        for stage, seconds in other.seconds.items():
+            self.seconds[stage] += seconds
+        self.counts.update(other.counts)
+
+    def reset(self):
+        self.seconds.clear()
+        self.counts.clear()
+
+    def as_dict(self) -> dict:
+        return {'seconds': dict(self.seconds), 'counts': dict(self.counts)}
+
+    def summary(self) -> str:
+        lines = []
+
+        for stage in _ordered(self.seconds, STAGES):
+            lines.append('%-26s %10.3fs' % (stage, self.seconds[stage]))
+
+        for name in _ordered(self.counts, COUNTERS):
+            lines.append('%-26s %10d' % (name, self.counts[name]))
+
+        return '\n'.join(lines)
+
+    def __repr__(self):
+        return 'ExtractionStats(%r)' % self.as_dict()
+
+
+def _ordered(values: Dict[str, object], order: Sequence[str]):
+    return [name for name in order if name in values] + sorted(name for name in values if name not in order)
+
+
+class _Timer:
+    __slots__ = ('stats', 'stage', 'start')
+
+    def __init__(self, stats: ExtractionStats, stage: str):
+        self.stats = stats
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stats.add_time(self.stage, time.perf_counter() - self.start)
+
+
+_NOT_TIMED = contextlib.nullcontext()
+
+
+def timed(stats: Optional[ExtractionStats], stage: str):
+    # A context manager adding the time its block takes to `stage`. It does nothing when stats is None.
+    if stats is None:
+        return _NOT_TIMED
+    return _Timer(stats, stage)
+
+
+def timed_iter(iterable: Iterable, stats: Optional[ExtractionStats], stage: str) -> Iterable:
+    # Adds the time spent producing each item to `stage`, for lazy iterators such as nlp.pipe.
+    if stats is None:
+        return iterable
+    return _timed_iter(iterable, stats, stage)
+
+
+def _timed_iter(iterable: Iterable, stats: ExtractionStats, stage: str) -> Iterator:
+    iterator = iter(iterable)
+    while True:
+        start = time.perf_counter()
+        try:
+            item = next(iterator)
+        except StopIteration:
+            stats.add_time(stage, time.perf_counter() - start)
+            return
+        stats.add_time(stage, time.perf_counter() - start)
+        yield item
+
+
+__all__ = ['ExtractionStats', 'StatsCallback', 'STAGES', 'COUNTERS', 'timed', 'timed_iter']
@@ -0,0 +1,180 @@
+import argparse
+import http.client
+import itertools
+import json
+import threading
+import time
+import urllib.parse
+from typing import List, Optional, Sequence
+
+DEFAULT_URL = 'http://127.0.0.1:8080/triples'
+DEFAULT_CONCURRENCY = 16
+DEFAULT_REQUESTS = 1000
+
+# Used when no --input-file is given.
+SAMPLE_SENTENCES = (
+    'Landlords may exercise oppression.',
+    'The soldiers were ill.',
+    'The farmers did not want to sell their land.',
+    'The government, which had failed to act, was blamed by the workers.',
+    'Cats and dogs eat quickly from large bowls.',
+    'He said that the tenants were not paying rent.',
+    'The committee wanted to buy the old house and the farm.',
+    'No member of the house objected to the very long bill.',
+)
+
+PERCENTILES = (50, 90, 99)
+
+
+def percentile(sorted_values: Sequence[float], p: float) -> float:
+    # Nearest-rank percentile of an already sorted sequence.
+    if not sorted_values:
+        return 0.0
+    rank = max(int(round(p / 100 * len(sorted_values))) - 1, 0)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+
+def read_sentences(path: str) -> List[str]:
+    with open(path, encoding='utf-8') as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+def run_load(url: str, sentences: Sequence[str], concurrency: int = DEFAULT_CONCURRENCY,
+             requests: int = DEFAULT_REQUESTS, texts_per_request: int = 1, json_lines: bool = False,
+             timeout: float = 60.0) -> dict:
+    # Sends `requests` requests from `concurrency` threads, each over its own kept-alive connection, and reports
+    # throughput and the latency of successful requests. Refused (503) requests are counted, not retried.
+    parsed = urllib.parse.urlsplit(url)
+    path = parsed.path or '/'
+
+    counter = itertools.count()
+    texts = itertools.cycle(sentences)
+    lock = threading.Lock()
+
+    latencies = []
+    statuses = {}
+    errors = []
+
+    def make_body():
+        with lock:
+            batch = [next(texts) for _ in range(texts_per_request)]
+        if json_lines:
+            return ''.join(json.dumps({'text': text}) + '\n' for text in batch).encode('utf-8'), \
+                   'application/x-ndjson'
+        if texts_per_request == 1:
+            return json.dumps({'text': batch[0]}).encode('utf-8'), 'application/json'
+        return json.dumps({'texts': batch}).encode('utf-8'), 'application/json'
+
+    def worker():
+        connection = http.client.HTTPConnection(parsed.hostname, parsed.port or 80, timeout=timeout)
+        local_latencies = []
+        local_statuses = {}
+
+        try:
+            while next(counter) < requests:
+                body, content_type = make_body()
+                start = time.perf_counter()
+                try:
+                    connection.request('POST', path, body=body, headers={'Content-Type': content_type})
+                    response = connection.getresponse()
+                    response.read()
+                except (OSError, http.client.HTTPException) as e:
+                    connection.close()
+                    with lock:
+                        errors.append('%s: %s' % (type(e).__name__, e))
+                    continue
+
+                elapsed = time.perf_counter() - start
+                local_statuses[response.status] = local_statuses.get(response.status, 0) + 1
+                if response.status == 200:
+                    local_latencies.append(elapsed)
+        finally:
+            connection.close()
+            with lock:
+                latencies.extend(local_latencies)
+                for status, count in local_statuses.items():
+                    statuses[status] = statuses.get(status, 0) + count
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    duration = time.perf_counter() - start
+
+    latencies.sort()
+    ok = statuses.get(200, 0)
+
+    report = {
+        'url': url,
+        'concurrency': concurrency,
+        'requests': requests,
+        'texts_per_request': texts_per_request,
+        'duration_s': duration,
+        'ok': ok,
+        'rejected': statuses.get(503, 0),
+        'failed': sum(count for status, count in statuses.items() if status not in (200, 503)) + len(errors),
+        'statuses': {str(status): count for status, count in sorted(statuses.items())},
+        'throughput_rps': ok / duration if duration else 0.0,
+        'throughput_texts_per_s': ok * texts_per_request / duration if duration else 0.0,
+        'latency_ms': {
+            'mean': 1000 * sum(latencies) / len(latencies) if latencies else 0.0,
+            'max': 1000 * latencies[-1] if latencies else 0.0,
+        },
+    }
+
+    for p in PERCENTILES:
+        report['latency_ms']['p%d' % p] = 1000 * percentile(latencies, p)
+
+    if errors:
+        report['errors'] = errors[:10]
+
+    return report
+
+
+def main(argv: Optional[Sequence[str]] = None):
+    parser = argparse.ArgumentParser(prog='python -m posextract loadgen',
+                                     description='posextract: load generator for the extraction server')
+    parser.add_argument('--url', type=str, default=DEFAULT_URL,
+                        help='the endpoint to send requests to (default: %(default)s)')
+    parser.add_argument('--input-file', type=str, default=None,
+                        help='a text file with one sentence per line (default: built-in sample sentences)')
+    parser.add_argument('--concurrency', type=int, default=DEFAULT_CONCURRENCY,
+                        help='number of concurrent clients (default: %(default)s)')
+    parser.add_argument('--requests', type=int, default=DEFAULT_REQUESTS,
+                        help='total number of requests to send (default: %(default)s)')
+    parser.add_argument('--texts-per-request', type=int, default=1,
+                        help='number of sentences sent in each request (default: %(default)s)')
+    parser.add_argument('--json-lines', action='store_true',
+                        help='send requests as JSON lines instead of JSON')
+    parser.add_argument('--timeout', type=float, default=60.0,
+                        help='seconds to wait for each response (default: %(default)s)')
+    parser.add_argument('--output', type=str, default=None,
+                        help='a path to write the JSON report to')
+
+    args = parser.parse_args(argv)
+
+    sentences = read_sentences(args.input_file) if args.input_file else list(SAMPLE_SENTENCES)
+    if not sentences:
+        exit('No sentences to send')
+
+    report = run_load(args.url, sentences, concurrency=args.concurrency, requests=args.requests,
+                      texts_per_request=args.texts_per_request, json_lines=args.json_lines, timeout=args.timeout)
+
+    print('%d requests in %.2fs: %d ok, %d rejected, %d failed' %
+          (report['requests'], report['duration_s'], report['ok'], report['rejected'], report['failed']))
+    print('throughput: %.1f requests/s, %.1f texts/s' %
+          (report['throughput_rps'], report['throughput_texts_per_s']))
+    print('latency (ms): ' + ', '.join('%s %.1f' % (name, value) for name, value in report['latency_ms'].items()))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
+
+__all__ = ['run_load', 'percentile', 'main']
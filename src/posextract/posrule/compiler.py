@@ -0,0 +1,322 @@
+import copy
+import re
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from spacy.tokens import Doc
+
+from posextract.triple_extraction import TripleExtraction
+
+# Names the generated predicate gives the text of each rule variable, by VarEnum value.
+VARIABLE_NAMES = ('subject', 'verb', 'object')
+
+# An inline flag group such as (?i) applies to the whole pattern, so a regex containing one is never merged.
+_GLOBAL_FLAGS = re.compile(r'\(\?[aiLmsux]+\)')
+
+# Assertions that look at the text around a match. A regex without any of them that matches a token's text also
+# matches somewhere in the sentence the token came from.
+_CONTEXT_ASSERTIONS = ('^', '$', '\\A', '\\Z', '\\b', '\\B', '(?=', '(?!', '(?<=', '(?<!')
+
+
+class Prefilter:
+    # A test on a sentence's text, before it is parsed, that is false only when no triple extracted from it could
+    # pass the filters. Every token's text is a substring of its sentence, so a sentence without a literal, or
+    # without a match for a regex, that the filters require cannot produce a triple that passes them.
+    def __init__(self, source: str, constants: Dict[str, object]):
+        self.source = source
+        self.predicate: Callable[[str], bool] = eval('lambda text: %s' % source, dict(constants, __builtins__={}))
+        self.checked = 0
+        self.skipped = 0
+
+    def __call__(self, text: str) -> bool:
+        self.checked += 1
+        if self.predicate(text):
+            return True
+        self.skipped += 1
+        return False
+
+    def copy(self) -> 'Prefilter':
+        # The same test with its own counts.
+        prefilter = copy.copy(self)
+        prefilter.checked = 0
+        prefilter.skipped = 0
+        return prefilter
+
+
+class CompiledFilter:
+    # posrule filters compiled into one Python predicate over a triple's subject, verb and object text. It is true
+    # when any of the filters matches, as in extract_one. Literals compared with the same variable under an OR
+    # become one set lookup, and regexes become one alternation, so evaluation no longer walks the rule trees.
+    def __init__(self, expressions: Iterable):
+        self.expressions = list(expressions)
+
+        tree = ('or', [_normalize(expression) for expression in self.expressions])
+
+        constants: Dict[str, object] = {}
+        self.source = _generate(tree, constants)
+
+        namespace = dict(constants, __builtins__={})
+        self.predicate: Callable[[str, str, str], bool] = eval(
+            'lambda %s: %s' % (', '.join(VARIABLE_NAMES), self.source), namespace)
+
+        # None when the filters do not rule out any sentence from its text alone.
+        prefilter_constants: Dict[str, object] = {}
+        prefilter_source = _generate_prefilter(tree, prefilter_constants)
+        self.prefilter = Prefilter(prefilter_source, prefilter_constants) if prefilter_source is not None else None
+
+        # Tests on one variable's lower-cased text that any triple passing the filters satisfies, or None when the
+        # filters do not constrain it. Lower-cased, so triples that deduplicate together are pruned together.
+        self.verb_constraint = _compile_constraint(tree, 'verb')
+        self.subject_constraint = _compile_constraint(tree, 'subject')
+
+    def __call__(self, subject: str, verb: str, object: str) -> bool:
+        return self.predicate(subject, verb, object)
+
+    def matches(self, triple: TripleExtraction, doc: Doc) -> bool:
+        return self.predicate(doc[triple.subject].text, triple.get_verb(doc).text, doc[triple.object].text)
+
+    def __reduce__(self):
+        # The generated function cannot be pickled, so a copy is compiled again from the rule trees.
+        return CompiledFilter, (self.expressions,)
+
+
+def compile_filters(filters: Optional[Iterable]) -> Optional[CompiledFilter]:
+    if filters is None or isinstance(filters, CompiledFilter):
+        return filters
+
+    filters = list(filters)
+    if not filters:
+        return None
+
+    return CompiledFilter(filters)
+
+
+def _operands(expression, op) -> List:
+    # The operands of a chain of `op` expressions, left to right. condense_expressions chains every statement in a
+    # file this way, so the chain is walked with a stack rather than by recursion.
+    from posextract.posrule.parser import Expression
+
+    operands = []
+    stack = [expression, ]
+
+    while stack:
+        node = stack.pop()
+        if isinstance(node, Expression) and node.op == op:
+            stack.append(node.rrule)
+            stack.append(node.lrule)
+        else:
+            operands.append(node)
+
+    return operands
+
+
+def _normalize(expression) -> Tuple:
+    # Rewrites a rule tree as ('or', [...]), ('and', [...]), ('not', node) and ('eq', variable, value) nodes.
+    from posextract.posrule.parser import EqualityRule, ExpressionEnum
+
+    if isinstance(expression, EqualityRule):
+        return 'eq', VARIABLE_NAMES[expression.var], expression.value
+
+    if expression.op == ExpressionEnum.IGNORE:
+        return 'not', _normalize(expression.lrule)
+
+    if expression.op == ExpressionEnum.AND:
+        return 'and', [_normalize(operand) for operand in _operands(expression, ExpressionEnum.AND)]
+
+    if expression.op == ExpressionEnum.OR:
+        return 'or', [_normalize(operand) for operand in _operands(expression, ExpressionEnum.OR)]
+
+    raise ValueError('unknown op')
+
+
+def _constant(constants: Dict[str, object], value) -> str:
+    name = '_c%d' % len(constants)
+    constants[name] = value
+    return name
+
+
+def _mergeable(pattern: re.Pattern) -> bool:
+    # Merging renumbers groups, which would break backreferences, and would spread an inline flag to every branch.
+    return pattern.groups == 0 and not _GLOBAL_FLAGS.search(pattern.pattern)
+
+
+def _generate_matches(variable: str, values: List, constants: Dict[str, object]) -> List[str]:
+    terms = []
+    literals = [value for value in values if not isinstance(value, re.Pattern)]
+    patterns = [value for value in values if isinstance(value, re.Pattern)]
+
+    if len(literals) == 1:
+        terms.append('%s == %s' % (variable, _constant(constants, literals[0])))
+    elif literals:
+        terms.append('%s in %s' % (variable, _constant(constants, frozenset(literals))))
+
+    merged = {}
+    for pattern in patterns:
+        if _mergeable(pattern):
+            merged.setdefault(pattern.flags, []).append(pattern.pattern)
+        else:
+            terms.append('%s(%s) is not None' % (_constant(constants, pattern.match), variable))
+
+    for flags, sources in merged.items():
+        pattern = re.compile('|'.join('(?:%s)' % source for source in sources), flags)
+        terms.append('%s(%s) is not None' % (_constant(constants, pattern.match), variable))
+
+    return terms
+
+
+def _generate(node: Tuple, constants: Dict[str, object]) -> str:
+    kind = node[0]
+
+    if kind == 'eq':
+        return ' or '.join(_generate_matches(node[1], [node[2], ], constants))
+
+    if kind == 'not':
+        return '(not (%s))' % _generate(node[1], constants)
+
+    if kind == 'and':
+        return '(%s)' % ' and '.join(_generate(operand, constants) for operand in node[1])
+
+    # An OR of matches against the same variable is tested with one set lookup and one regex per variable.
+    operands = _or_operands(node)
+    matches = {}
+    terms = []
+
+    for operand in operands:
+        if operand[0] == 'eq':
+            matches.setdefault(operand[1], []).append(operand[2])
+        else:
+            terms.append(_generate(operand, constants))
+
+    match_terms = []
+    for variable, values in matches.items():
+        match_terms.extend(_generate_matches(variable, values, constants))
+    terms = match_terms + terms
+
+    if not terms:
+        return 'False'
+
+    return '(%s)' % ' or '.join(terms)
+
+
+def _or_operands(node: Tuple) -> List[Tuple]:
+    operands = []
+    for operand in node[1]:
+        if operand[0] == 'or':
+            operands.extend(operand[1])
+        else:
+            operands.append(operand)
+    return operands
+
+
+def _generate_prefilter(node: Tuple, constants: Dict[str, object]) -> Optional[str]:
+    # Source for a test on the sentence text implied by `node`, or None when the text cannot rule it out.
+    kind = node[0]
+
+    if kind == 'not':
+        return None
+
+    if kind == 'and':
+        terms = [_generate_prefilter(operand, constants) for operand in node[1]]
+        terms = [term for term in terms if term is not None]
+        return '(%s)' % ' and '.join(terms) if terms else None
+
+    operands = [node, ] if kind == 'eq' else _or_operands(node)
+    literals = []
+    patterns = {}
+    terms = []
+
+    for operand in operands:
+        if operand[0] != 'eq':
+            term = _generate_prefilter(operand, constants)
+            if term is None:
+                return None
+            terms.append(term)
+            continue
+
+        variable, value = operand[1], operand[2]
+
+        if isinstance(value, re.Pattern):
+            # A verb phrase's text is not always a substring of the sentence, see XCompVerbPhrase.text.
+            if variable == 'verb' or any(assertion in value.pattern for assertion in _CONTEXT_ASSERTIONS):
+                return None
+            if _mergeable(value):
+                patterns.setdefault(value.flags, []).append(value.pattern)
+            else:
+                terms.append('%s(text) is not None' % _constant(constants, value.search))
+            continue
+
+        # A verb phrase's text joins its tokens with spaces, so each part is looked for separately.
+        parts = [part for part in value.split(' ') if part] if variable == 'verb' else [value, ]
+        if not parts:
+            return None
+        if len(parts) == 1:
+            literals.append(parts[0])
+        else:
+            terms.append('(%s)' % ' and '.join('%s in text' % _constant(constants, part) for part in parts))
+
+    literal_flags = re.compile('').flags
+    if len(literals) == 1 and literal_flags not in patterns:
+        terms.append('%s in text' % _constant(constants, literals[0]))
+    elif literals:
+        patterns.setdefault(literal_flags, []).extend(re.escape(literal) for literal in literals)
+
+    for flags, sources in patterns.items():
+        pattern = re.compile('|'.join('(?:%s)' % source for source in sources), flags)
+        terms.append('%s(text) is not None' % _constant(constants, pattern.search))
+
+    if not terms:
+        return None
+
+    return '(%s)' % ' or '.join(terms)
+
+
+def _generate_constraint(node: Tuple, variable: str, constants: Dict[str, object]) -> Optional[str]:
+    # Source for a test on `value`, a lower-cased text of `variable`, that is true whenever `node` could be. Regexes
+    # are not case-insensitive in the same way as str.lower, so they leave the variable unconstrained.
+    kind = node[0]
+
+    if kind == 'not':
+        return None
+
+    if kind == 'eq':
+        if node[1] != variable or isinstance(node[2], re.Pattern):
+            return None
+        return 'value == %s' % _constant(constants, node[2].lower())
+
+    if kind == 'and':
+        terms = [_generate_constraint(operand, variable, constants) for operand in node[1]]
+        terms = [term for term in terms if term is not None]
+        return '(%s)' % ' and '.join(terms) if terms else None
+
+    literals = set()
+    terms = []
+
+    for operand in _or_operands(node):
+        if operand[0] == 'eq' and operand[1] == variable and not isinstance(operand[2], re.Pattern):
+            literals.add(operand[2].lower())
+            continue
+
+        term = _generate_constraint(operand, variable, constants)
+        if term is None:
+            return None
+        terms.append(term)
+
+    if literals:
+        terms.insert(0, 'value in %s' % _constant(constants, frozenset(literals)))
+
+    if not terms:
+        return None
+
+    return '(%s)' % ' or '.join(terms)
+
+
+def _compile_constraint(tree: Tuple, variable: str) -> Optional[Callable[[str], bool]]:
+    constants: Dict[str, object] = {}
+    source = _generate_constraint(tree, variable, constants)
+
+    if source is None:
+        return None
+
+    return eval('lambda value: %s' % source, dict(constants, __builtins__={}))
+
+
+__all__ = ['CompiledFilter', 'Prefilter', 'compile_filters']
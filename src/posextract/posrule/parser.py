@@ -1,3 +1,6 @@
+import hashlib
+import os
+import pickle
 import re
 
 import lark
@@ -7,11 +10,34 @@ from posextract.posrule.grammar import GRAMMAR
 from typing import List, Union, Optional, Tuple
 from dataclasses import dataclass
 
+from spacy.tokens import Doc
+
 from posextract.triple_extraction import TripleExtraction
 
 from enum import IntEnum
 
-RULE_PARSER = Lark(GRAMMAR, start='start_posrule', parser='lalr', lexer='contextual', debug=False)
+POSRULE_EXTENSION = '.posrule'
+
+_RULE_PARSER = None
+
+# Parsed rule files by absolute path, as ((mtime_ns, size), expression).
+_PARSED_RULES = {}
+
+
+def get_rule_parser() -> Lark:
+    # Building the LALR tables is slow, so it is only done when the first rule file is parsed. Lark also caches the
+    # tables on disk (keyed by the grammar and options), so later processes load them instead of rebuilding them.
+    global _RULE_PARSER
+    if _RULE_PARSER is None:
+        _RULE_PARSER = Lark(GRAMMAR, start='start_posrule', parser='lalr', lexer='contextual', debug=False,
+                            cache=True)
+    return _RULE_PARSER
+
+
+def __getattr__(name):
+    if name == 'RULE_PARSER':
+        return get_rule_parser()
+    raise AttributeError('module %r has no attribute %r' % (__name__, name))
 
 
 class VarEnum(IntEnum):
@@ -29,13 +55,13 @@ class EqualityRule:
     var: VarEnum
     value: Union[str, re.Pattern]
 
-    def eval(self, triple: TripleExtraction):
+    def eval(self, triple: TripleExtraction, doc: Doc):
         if self.var == VarEnum.SUBJECT:
-            target = triple.subject
+            target = doc[triple.subject]
         elif self.var == VarEnum.VERB:
-            target = triple.verb
+            target = triple.get_verb(doc)
         elif self.var == VarEnum.PREDICATE:
-            target = triple.object
+            target = doc[triple.object]
         else:
             raise ValueError('invalid variable name')
 
@@ -61,13 +87,13 @@ class Expression:
     lrule: Union[EqualityRule, 'Expression']
     rrule: Optional[Union[EqualityRule, 'Expression']] = None
 
-    def eval(self, triple: TripleExtraction):
+    def eval(self, triple: TripleExtraction, doc: Doc):
         if self.op == ExpressionEnum.AND:
-            return self.lrule.eval(triple) and self.rrule.eval(triple)
+            return self.lrule.eval(triple, doc) and self.rrule.eval(triple, doc)
         elif self.op == ExpressionEnum.OR:
-            return self.lrule.eval(triple) or self.rrule.eval(triple)
+            return self.lrule.eval(triple, doc) or self.rrule.eval(triple, doc)
         elif self.op == ExpressionEnum.IGNORE:
-            return not self.lrule.eval(triple)
+            return not self.lrule.eval(triple, doc)
         else:
             raise ValueError('unknown op')
 
@@ -142,12 +168,74 @@ class PosRuleTransformer(Transformer):
         return tree
 
 
-def parse_posrule(filepath) -> Expression:
-    print('Parsing: %s' % filepath)
-    with open(filepath, 'r') as f:
-        data = f.read()
-    parse_tree = RULE_PARSER.parse(data)
-    return condense_expressions(PosRuleTransformer().transform(parse_tree))
+def _cached_rule_path(cache_dir: str, filepath: str) -> str:
+    return os.path.join(cache_dir, hashlib.blake2b(filepath.encode('utf-8'), digest_size=16).hexdigest() + '.pickle')
+
+
+def _read_cached_rule(cache_dir: str, filepath: str, stamp: Tuple[int, int]) -> Optional[Expression]:
+    try:
+        with open(_cached_rule_path(cache_dir, filepath), 'rb') as f:
+            cached_path, cached_stamp, expression = pickle.load(f)
+    except (OSError, EOFError, pickle.UnpicklingError, ValueError):
+        return None
+
+    if cached_path != filepath or cached_stamp != stamp:
+        return None
+
+    return expression
+
+
+def _write_cached_rule(cache_dir: str, filepath: str, stamp: Tuple[int, int], expression: Expression):
+    os.makedirs(cache_dir, exist_ok=True)
+    path = _cached_rule_path(cache_dir, filepath)
+    # Written to a temporary name first so a concurrent reader never sees a partial file.
+    temp_path = '%s.%d.tmp' % (path, os.getpid())
+    with open(temp_path, 'wb') as f:
+        pickle.dump((filepath, stamp, expression), f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(temp_path, path)
+
+
+def parse_posrule(filepath, verbose: bool = False, cache_dir: Optional[str] = None) -> Expression:
+    # Parsed files are kept in memory, and in `cache_dir` when one is given, until their mtime or size changes.
+    filepath = os.path.abspath(filepath)
+    stat = os.stat(filepath)
+    stamp = (stat.st_mtime_ns, stat.st_size)
+
+    cached = _PARSED_RULES.get(filepath)
+    if cached is not None and cached[0] == stamp:
+        return cached[1]
+
+    expression = _read_cached_rule(cache_dir, filepath, stamp) if cache_dir is not None else None
+
+    if expression is None:
+        if verbose:
+            print('Parsing: %s' % filepath)
+        with open(filepath, 'r') as f:
+            data = f.read()
+        parse_tree = get_rule_parser().parse(data)
+        expression = condense_expressions(PosRuleTransformer().transform(parse_tree))
+
+        if cache_dir is not None:
+            _write_cached_rule(cache_dir, filepath, stamp, expression)
+
+    _PARSED_RULES[filepath] = (stamp, expression)
+    return expression
+
+
+def load_posrules(path: str, verbose: bool = False, cache_dir: Optional[str] = None) -> List[Expression]:
+    # A single rule file, or every .posrule file under a directory in a stable order.
+    if os.path.isfile(path):
+        return [parse_posrule(path, verbose=verbose, cache_dir=cache_dir), ]
+
+    if not os.path.isdir(path):
+        raise FileNotFoundError(path)
+
+    filepaths = []
+    for dirpath, dirnames, filenames in os.walk(path):
+        dirnames.sort()
+        filepaths.extend(os.path.join(dirpath, fn) for fn in sorted(filenames) if fn.endswith(POSRULE_EXTENSION))
+
+    return [parse_posrule(filepath, verbose=verbose, cache_dir=cache_dir) for filepath in filepaths]
 
 
 def condense_expressions(expressions: List[Expression]) -> Expression:
@@ -190,8 +278,8 @@ def split_expressions(expressions: List[Expression]) -> Tuple[List[Expression],
     return match_filters, ignore_filters
 
 
-__all__ = ['RULE_PARSER', 'PosRuleTransformer',
-           'split_expressions', 'parse_posrule',
+__all__ = ['RULE_PARSER', 'get_rule_parser', 'PosRuleTransformer',
+           'split_expressions', 'parse_posrule', 'load_posrules', 'POSRULE_EXTENSION',
            'ExpressionEnum', 'Expression']
 
 
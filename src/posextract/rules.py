@@ -1,74 +1,103 @@
-from typing import Union
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
 
 from spacy.symbols import *
-from spacy.tokens import Token
 
-from .util import is_noun_attribute, VerbPhrase
+from .docview import DocView, ViewVerb, ROOT_DEP, DATIVE_DEP
 
+# Rules in the order they are tried; the first one that matches a subject, verb and object wins.
+RULES: List[Callable] = []
 
-def rule1(verb_token: Union[Token, VerbPhrase], subject_token: Token, object_token: Token, poa: Token):
-    if verb_token.dep != pcomp:
-        return False
 
+def verb_rule(deps: Optional[Iterable[int]] = None):
+    # Registers a rule along with the dependency labels its verb can have. The label is checked by the dispatch table
+    # rather than in the rule, so a rule is only ever called for verbs it could match. None means any label.
+    def decorator(func):
+        func.verb_deps = frozenset(deps) if deps is not None else None
+        RULES.append(func)
+        return func
+
+    return decorator
+
+
+class RuleDispatch:
+    # The rules that can apply to a verb, by the verb's dependency label, in their original order.
+    def __init__(self, rules: List[Callable]):
+        self.any_dep: Tuple[Callable, ...] = tuple(rule for rule in rules if rule.verb_deps is None)
+        self.by_dep: Dict[int, Tuple[Callable, ...]] = {}
+
+        labels = set()
+        for rule in rules:
+            if rule.verb_deps is not None:
+                labels.update(rule.verb_deps)
+
+        for label in labels:
+            self.by_dep[label] = tuple(rule for rule in rules if rule.verb_deps is None or label in rule.verb_deps)
+
+    def get(self, dep: int) -> Tuple[Callable, ...]:
+        return self.by_dep.get(dep, self.any_dep)
+
+
+@verb_rule(deps={pcomp})
+def rule1(view: DocView, verb_token: ViewVerb, subject_token: int, object_token: int, poa: Optional[int]):
     # Check if the verb head is a preposition.
     verb_head = verb_token.head
-    if verb_head.dep != prep:
+    if view.dep[verb_head] != prep:
         return False
 
     # The preposition’s head must be the same as the subject’s head
-    if subject_token.head != verb_head.head:
+    if view.head[subject_token] != view.head[verb_head]:
         return False
 
-    return object_token.dep == dobj and verb_token == object_token.head
+    return view.dep[object_token] == dobj and verb_token == view.head[object_token]
 
 
-def rule2(verb_token: Union[Token, VerbPhrase], subject_token: Token, object_token: Token, poa: Token):
-    if verb_token.dep not in {ccomp, conj, relcl, advcl, pcomp} and verb_token.dep_ != "ROOT":
+@verb_rule(deps={ccomp, conj, relcl, advcl, pcomp, ROOT_DEP})
+def rule2(view: DocView, verb_token: ViewVerb, subject_token: int, object_token: int, poa: Optional[int]):
+    if verb_token != view.head[subject_token]:
         return False
 
-    if verb_token != subject_token.head:
-        return False
+    object_dep = view.dep[object_token]
 
-    if object_token.dep == pobj:
+    if object_dep == pobj:
         if poa is None:
             return False
-        if poa.head.pos == SCONJ:
-            return verb_token == poa.head.head and object_token.head == poa
+        poa_head = view.head[poa]
+        if view.pos[poa_head] == SCONJ:
+            return verb_token == view.head[poa_head] and view.head[object_token] == poa
         else:
-            return verb_token == poa.head and object_token.head == poa
-    elif object_token.dep == dobj:
-        return verb_token == object_token.head
-    elif object_token.dep in {acomp, amod, advmod}:
+            return verb_token == poa_head and view.head[object_token] == poa
+    elif object_dep == dobj:
+        return verb_token == view.head[object_token]
+    elif object_dep in {acomp, amod, advmod}:
         return True
-    elif object_token.dep == attr:
+    elif object_dep == attr:
         return True
     else:
         return False
 
 
-def rule3(verb_token: Union[Token, VerbPhrase], subject_token: Token, object_token: Token, poa: Token):
-    if verb_token.dep not in {relcl, acl}:
-        return False
-
+@verb_rule(deps={relcl, acl})
+def rule3(view: DocView, verb_token: ViewVerb, subject_token: int, object_token: int, poa: Optional[int]):
     if verb_token.head != subject_token:
         return False
 
-    if object_token.dep == pobj:
+    object_dep = view.dep[object_token]
+
+    if object_dep == pobj:
         if poa is None:
             return False
-        return verb_token == poa.head and object_token.head == poa.head
-    elif object_token.dep == dobj:
+        return verb_token == view.head[poa] and view.head[object_token] == view.head[poa]
+    elif object_dep == dobj:
         # return verb_token.head == object_token
-        return verb_token == object_token.head
+        return verb_token == view.head[object_token]
     else:
         return False
 
 
-def rule4(verb_token: Union[Token, VerbPhrase], subject_token: Token, object_token: Token, poa: Token):
-    if verb_token.dep not in {xcomp, advcl, conj}:
-        return False
-
-    if verb_token != subject_token.head and verb_token.head != subject_token.head:
+@verb_rule(deps={xcomp, advcl, conj})
+def rule4(view: DocView, verb_token: ViewVerb, subject_token: int, object_token: int, poa: Optional[int]):
+    subject_head = view.head[subject_token]
+    if verb_token != subject_head and verb_token.head != subject_head:
         return False
 
     # Traverse until we reach the end or the verb is the subject's head.
@@ -86,188 +115,199 @@ def rule4(verb_token: Union[Token, VerbPhrase], subject_token: Token, object_tok
     #     if curr_verb.pos != VERB:
     #         return False
 
-    if object_token.dep == pobj:
+    object_dep = view.dep[object_token]
+
+    if object_dep == pobj:
         # we originally checked object_token.head == poa.head
         if poa is None:
             return False
-        return verb_token == poa.head and object_token.head.head == poa.head
-    elif object_token.dep == dobj:
-        return verb_token == object_token.head
+        return verb_token == view.head[poa] and view.head[view.head[object_token]] == view.head[poa]
+    elif object_dep == dobj:
+        return verb_token == view.head[object_token]
     else:
         return False
 
 
-def rule5(verb_token: Union[Token, VerbPhrase], subject_token: Token, object_token: Token, poa: Token):
-    if verb_token.dep not in {ccomp, advcl, pcomp} and verb_token.dep_ != "ROOT":
+@verb_rule(deps={ccomp, advcl, pcomp, ROOT_DEP})
+def rule5(view: DocView, verb_token: ViewVerb, subject_token: int, object_token: int, poa: Optional[int]):
+    if verb_token != view.head[subject_token]:
         return False
 
-    if verb_token != subject_token.head:
-        return False
+    object_dep = view.dep[object_token]
 
 # pobj requires POA
 # acomp and amod (optional)
-    if object_token.dep == pobj:
+    if object_dep == pobj:
         if poa is None:
             return False
-        return verb_token == poa.head and poa.head == subject_token.head
-    elif object_token.dep in {acomp, amod, advmod}:
+        return verb_token == view.head[poa] and view.head[poa] == view.head[subject_token]
+    elif object_dep in {acomp, amod, advmod}:
         return True
     else:
         return False
 
 
-def rule6(verb_token: Union[Token, VerbPhrase], subject_token: Token, object_token: Token, poa: Token):
-    if verb_token.dep != xcomp and verb_token.dep != advcl:
+@verb_rule(deps={xcomp, advcl})
+def rule6(view: DocView, verb_token: ViewVerb, subject_token: int, object_token: int, poa: Optional[int]):
+    if verb_token.head != view.head[subject_token]:
         return False
 
-    if verb_token.head != subject_token.head:
-        return False
+    object_dep = view.dep[object_token]
 
-    if object_token.dep == pobj:
+    if object_dep == pobj:
         if poa is None:
             return False
-        return verb_token == poa.head and poa.head == subject_token.head
-    elif object_token.dep in {acomp, amod, advmod}:
+        return verb_token == view.head[poa] and view.head[poa] == view.head[subject_token]
+    elif object_dep in {acomp, amod, advmod}:
         return True
-    elif object_token.dep_ == "dative":
+    elif object_dep == DATIVE_DEP:
         return True
     else:
         return False
 
 
-def rule7(verb_token: Union[Token, VerbPhrase], subject_token: Token, object_token: Token, poa: Token):
-    if verb_token.dep != relcl:
-        return False
-
+@verb_rule(deps={relcl})
+def rule7(view: DocView, verb_token: ViewVerb, subject_token: int, object_token: int, poa: Optional[int]):
     if verb_token.head != subject_token:
         return False
 
-    if object_token.dep == pobj:
+    object_dep = view.dep[object_token]
+
+    if object_dep == pobj:
         if poa is None:
             return False
-        return verb_token == poa.head and poa.head == subject_token.head
-    elif object_token.dep in {acomp, amod, advmod}:
+        return verb_token == view.head[poa] and view.head[poa] == view.head[subject_token]
+    elif object_dep in {acomp, amod, advmod}:
         return True
-    elif object_token.dep_ == "dative":
+    elif object_dep == DATIVE_DEP:
         return True
     else:
         return False
 
 
-def rule8(verb_token: Union[Token, VerbPhrase], subject_token: Token, object_token: Token, poa: Token):
-    if verb_token.dep != conj:
+@verb_rule(deps={conj})
+def rule8(view: DocView, verb_token: ViewVerb, subject_token: int, object_token: int, poa: Optional[int]):
+    if verb_token.head != view.head[subject_token]:
         return False
 
-    if verb_token.head != subject_token.head:
-        return False
+    object_dep = view.dep[object_token]
 
-    if object_token.dep == pobj:
+    if object_dep == pobj:
         if poa is None:
             return False
-        return poa.head == verb_token and object_token.head == poa
-    if object_token.dep in {acomp, amod, advmod}:
+        # Compared by index, so a verb phrase is never the preposition's head here.
+        return view.head[poa] == verb_token.i and view.head[object_token] == poa
+    if object_dep in {acomp, amod, advmod}:
         return True
-    elif object_token.dep in {dobj, acomp, amod, advmod} and verb_token == object_token.head:
+    elif object_dep in {dobj, acomp, amod, advmod} and verb_token == view.head[object_token]:
         return True
 
 
-def rule9(verb_token: Union[Token, VerbPhrase], subject_token: Token, object_token: Token, poa: Token):
-    if verb_token.dep != relcl:
-        return False
-
+@verb_rule(deps={relcl})
+def rule9(view: DocView, verb_token: ViewVerb, subject_token: int, object_token: int, poa: Optional[int]):
     noun_attribute = None
 
-    for child in object_token.children:
-        if is_noun_attribute(child):
+    for child in view.children(object_token):
+        if view.is_noun_attribute(child):
             noun_attribute = child
             break
 
-    if not noun_attribute:
+    if noun_attribute is None:
         return False
 
-    if subject_token.head != noun_attribute.head:
+    if view.head[subject_token] != view.head[noun_attribute]:
         return False
 
     if verb_token.head != noun_attribute:
         return False
 
-    if object_token.dep in {pobj, acomp, amod, advmod} and verb_token == poa.head and object_token.head == poa:
+    object_dep = view.dep[object_token]
+
+    if object_dep in {pobj, acomp, amod, advmod} and verb_token == view.head[poa] \
+            and view.head[object_token] == poa:
         return True
 
-    if object_token.dep in {dobj, acomp, amod, advmod} and verb_token == object_token.head:
+    if object_dep in {dobj, acomp, amod, advmod} and verb_token == view.head[object_token]:
         return True
 
     return False
 
 
-def rule10(verb_token: Union[Token, VerbPhrase], subject_token: Token, object_token: Token, poa: Token):
-    if verb_token.head != subject_token.head:
+@verb_rule()
+def rule10(view: DocView, verb_token: ViewVerb, subject_token: int, object_token: int, poa: Optional[int]):
+    if verb_token.head != view.head[subject_token]:
         return False
 
     verb_conj = None
 
-    if not hasattr(verb_token, 'conjuncts'):
+    # Only single-token verbs have conjuncts.
+    if verb_token.phrase is not None:
         return False
 
-    for conjunct in verb_token.conjuncts:
-        if conjunct.head == verb_token.head:
+    for conjunct in view.conjuncts(verb_token.i):
+        if view.head[conjunct] == verb_token.head:
             verb_conj = conjunct
             break
 
     if verb_conj is None:
         return False
 
-    if object_token.dep == pobj:
+    object_dep = view.dep[object_token]
+
+    if object_dep == pobj:
         if poa is None:
             return False
 
-        return verb_conj == poa.head and poa == object_token.head
+        return verb_conj == view.head[poa] and poa == view.head[object_token]
 
-    if object_token.dep == dobj and verb_conj == object_token.head:
+    if object_dep == dobj and verb_conj == view.head[object_token]:
         return True
 
     return False
 
 
-def rule11(verb_token: Union[Token, VerbPhrase], subject_token: Token, object_token: Token, poa: Token):
-    if verb_token.dep != ccomp:
-        return False
-
-    if verb_token != subject_token.head:
+@verb_rule(deps={ccomp})
+def rule11(view: DocView, verb_token: ViewVerb, subject_token: int, object_token: int, poa: Optional[int]):
+    if verb_token != view.head[subject_token]:
         return False
 
     verb_xcomp = None
 
-    for child in verb_token.children:
-        if child.dep == xcomp:
+    for child in view.verb_children(verb_token):
+        if view.dep[child] == xcomp:
             verb_xcomp = child
             break
 
     if verb_xcomp is None:
         return False
 
-    if object_token.dep == pobj:
+    object_dep = view.dep[object_token]
+
+    if object_dep == pobj:
         return False
 
-    if object_token.dep in {dobj, acomp, amod, advmod} and verb_token.head == object_token.head:
+    if object_dep in {dobj, acomp, amod, advmod} and verb_token.head == view.head[object_token]:
         return True
 
     return False
 
 
-def rule12(verb_token: Union[Token, VerbPhrase], subject_token: Token, object_token: Token, poa: Token):
-    if verb_token.dep != conj:
+@verb_rule(deps={conj})
+def rule12(view: DocView, verb_token: ViewVerb, subject_token: int, object_token: int, poa: Optional[int]):
+    if verb_token != view.head[subject_token]:
         return False
 
-    if verb_token != subject_token.head:
-        return False
+    object_dep = view.dep[object_token]
 
-    if object_token.dep in {pobj, acomp, amod, advmod}:
+    if object_dep in {pobj, acomp, amod, advmod}:
         if poa is None:
             return False
-        return verb_token == poa.head and object_token.head == poa
+        return verb_token == view.head[poa] and view.head[object_token] == poa
 
-    if object_token.dep == dobj and verb_token == object_token.head:
+    if object_dep == dobj and verb_token == view.head[object_token]:
         return True
 
     return False
+
+
+RULE_DISPATCH = RuleDispatch(RULES)
@@ -0,0 +1,472 @@
+import argparse
+import dataclasses
+import json
+import queue
+import threading
+import time
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional, Sequence
+
+from spacy.language import Language
+
+from posextract import unified
+from posextract.posrule.compiler import compile_filters
+from posextract.unified import STREAMS
+from posextract.util import TripleExtractorOptions
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8080
+DEFAULT_MAX_BATCH_SIZE = 64
+DEFAULT_MAX_WAIT_MS = 5.0
+DEFAULT_MAX_QUEUE = 1024
+DEFAULT_REQUEST_TIMEOUT = 60.0
+DEFAULT_MAX_BODY_BYTES = 16 * 1024 * 1024
+
+JSON_LINES_TYPES = ('application/x-ndjson', 'application/jsonl', 'application/jsonlines', 'application/x-jsonlines')
+
+# POST paths and the streams they return. /extract returns the streams named in the request, or all of them.
+ROUTES = {
+    '/extract': None,
+    '/triples': (unified.TRIPLES, ),
+    '/adj_noun': (unified.ADJ_NOUN, ),
+    '/subj_verb': (unified.SUBJ_VERB, ),
+}
+
+
+class ServerBusy(Exception):
+    pass
+
+
+class _Job:
+    __slots__ = ('texts', 'done', 'results', 'error')
+
+    def __init__(self, texts: List[str]):
+        self.texts = texts
+        self.done = threading.Event()
+        self.results = None
+        self.error = None
+
+
+class MicroBatcher:
+    # Coalesces the texts of concurrent requests into one batch for nlp.pipe. A batch starts with the oldest waiting
+    # job and takes further jobs until it holds max_batch_size texts or max_wait seconds have passed; a job is never
+    # split, so a batch can end up a little larger. At most max_queue texts wait at once, and submitting more raises
+    # ServerBusy straight away rather than letting the latency of every queued request grow.
+    def __init__(self, extract_batch: Callable[[List[str]], List], max_batch_size: int = DEFAULT_MAX_BATCH_SIZE,
+                 max_wait: float = DEFAULT_MAX_WAIT_MS / 1000, max_queue: int = DEFAULT_MAX_QUEUE):
+        self.extract_batch = extract_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.max_queue = max_queue
+
+        self.batches = 0
+        self.texts = 0
+        self.rejected = 0
+
+        self._queue = queue.Queue()
+        self._queued_texts = 0
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name='posextract-batcher', daemon=True)
+
+    @property
+    def queued_texts(self) -> int:
+        return self._queued_texts
+
+    def start(self):
+        self._thread.start()
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join()
+
+    def submit(self, texts: List[str]) -> _Job:
+        job = _Job(texts)
+
+        with self._lock:
+            if self._queued_texts + len(texts) > self.max_queue:
+                self.rejected += 1
+                raise ServerBusy()
+            self._queued_texts += len(texts)
+
+        self._queue.put(job)
+        return job
+
+    def _take(self, timeout: Optional[float] = None) -> Optional[_Job]:
+        job = self._queue.get(timeout=timeout)
+        if job is not None:
+            with self._lock:
+                self._queued_texts -= len(job.texts)
+        return job
+
+    def _run(self):
+        stopping = False
+
+        while not stopping:
+            job = self._take()
+            if job is None:
+                return
+
+            jobs = [job, ]
+            size = len(job.texts)
+            deadline = time.monotonic() + self.max_wait
+
+            while size < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    job = self._take(timeout=remaining)
+                except queue.Empty:
+                    break
+                if job is None:
+                    stopping = True
+                    break
+                jobs.append(job)
+                size += len(job.texts)
+
+            self._process(jobs)
+
+    def _process(self, jobs: List[_Job]):
+        texts = [text for job in jobs for text in job.texts]
+
+        try:
+            results = self.extract_batch(texts)
+        except Exception as e:
+            # Extract the jobs one at a time, so a text that fails only fails the request it came in.
+            if len(jobs) > 1:
+                for job in jobs:
+                    self._process([job, ])
+                return
+            jobs[0].error = e
+            jobs[0].done.set()
+            return
+
+        self.batches += 1
+        self.texts += len(texts)
+
+        start = 0
+        for job in jobs:
+            job.results = results[start:start + len(job.texts)]
+            start += len(job.texts)
+            job.done.set()
+
+
+def _record(extraction) -> dict:
+    if dataclasses.is_dataclass(extraction):
+        return dataclasses.asdict(extraction)
+    return extraction._asdict()
+
+
+def make_extract_batch(extractor_options: TripleExtractorOptions = None, streams: Sequence[str] = STREAMS,
+                       lemmatize_pairs: bool = False, letter_case: str = 'default',
+                       filters: Optional[List] = None,
+                       nlp: Optional[Language] = None) -> Callable[[List[str]], List[Dict[str, List[dict]]]]:
+    # Filters are compiled once for the life of the server.
+    filters = compile_filters(filters)
+    streams = tuple(streams)
+
+    def extract_batch(texts: List[str]) -> List[Dict[str, List[dict]]]:
+        results = [{stream: [] for stream in streams} for _ in texts]
+
+        for i, extractions in unified.extract_iter(texts, extractor_options, streams=streams,
+                                                   lemmatize_pairs=lemmatize_pairs, letter_case=letter_case,
+                                                   filters=filters, batch_size=max(len(texts), 1), nlp=nlp):
+            for extraction in extractions:
+                results[i][extraction.stream].append(_record(extraction.extraction))
+
+        return results
+
+    return extract_batch
+
+
+class ExtractionServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # The default listen backlog of 5 resets connections when many clients connect at once.
+    request_queue_size = 256
+
+    def __init__(self, address, batcher: MicroBatcher, streams: Sequence[str] = STREAMS,
+                 request_timeout: float = DEFAULT_REQUEST_TIMEOUT, max_body_bytes: int = DEFAULT_MAX_BODY_BYTES,
+                 verbose: bool = False):
+        self.batcher = batcher
+        self.streams = tuple(streams)
+        self.request_timeout = request_timeout
+        self.max_body_bytes = max_body_bytes
+        self.verbose = verbose
+        super().__init__(address, ExtractionRequestHandler)
+
+
+class ExtractionRequestHandler(BaseHTTPRequestHandler):
+    # Kept-alive connections let a client send many requests without reconnecting.
+    protocol_version = 'HTTP/1.1'
+    server: ExtractionServer
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def _send(self, status: HTTPStatus, body: bytes, content_type: str = 'application/json', headers: dict = None):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_json(self, status: HTTPStatus, value, headers: dict = None):
+        self._send(status, json.dumps(value).encode('utf-8'), headers=headers)
+
+    def _send_error(self, status: HTTPStatus, message: str, headers: dict = None):
+        self._send_json(status, {'error': message}, headers=headers)
+
+    def do_GET(self):
+        if self.path != '/health':
+            self._send_error(HTTPStatus.NOT_FOUND, 'unknown path: %s' % self.path)
+            return
+
+        batcher = self.server.batcher
+        self._send_json(HTTPStatus.OK, {
+            'status': 'ok',
+            'streams': list(self.server.streams),
+            'queued_texts': batcher.queued_texts,
+            'batches': batcher.batches,
+            'texts': batcher.texts,
+            'rejected': batcher.rejected,
+        })
+
+    def do_POST(self):
+        if self.path not in ROUTES:
+            self._send_error(HTTPStatus.NOT_FOUND, 'unknown path: %s' % self.path)
+            return
+
+        if 'Content-Length' not in self.headers:
+            self._send_error(HTTPStatus.LENGTH_REQUIRED, 'a Content-Length header is required')
+            return
+
+        try:
+            length = int(self.headers['Content-Length'])
+            if length < 0:
+                raise ValueError
+        except ValueError:
+            # The body's extent is unknown, so the connection cannot be reused.
+            self.close_connection = True
+            self._send_error(HTTPStatus.BAD_REQUEST, 'invalid Content-Length: %s' % self.headers['Content-Length'])
+            return
+
+        if length > self.server.max_body_bytes:
+            # Refused before reading, so the unread body means the connection cannot be reused either.
+            self.close_connection = True
+            self._send_error(HTTPStatus.REQUEST_ENTITY_TOO_LARGE,
+                             'the request body can be at most %d bytes' % self.server.max_body_bytes)
+            return
+
+        body = self.rfile.read(length)
+        content_type = self.headers.get('Content-Type', 'application/json').split(';')[0].strip().lower()
+        json_lines = content_type in JSON_LINES_TYPES
+
+        try:
+            if json_lines:
+                texts, ids, streams = _parse_json_lines(body)
+                single = False
+            else:
+                texts, ids, streams, single = _parse_json(body)
+            streams = self._resolve_streams(ROUTES[self.path] or streams)
+        except ValueError as e:
+            self._send_error(HTTPStatus.BAD_REQUEST, str(e))
+            return
+
+        if len(texts) > self.server.batcher.max_queue:
+            self._send_error(HTTPStatus.REQUEST_ENTITY_TOO_LARGE,
+                             'at most %d texts can be sent at once' % self.server.batcher.max_queue)
+            return
+
+        if texts:
+            try:
+                job = self.server.batcher.submit(texts)
+            except ServerBusy:
+                self._send_error(HTTPStatus.SERVICE_UNAVAILABLE, 'the server is busy, retry later',
+                                 headers={'Retry-After': '1'})
+                return
+
+            if not job.done.wait(self.server.request_timeout):
+                self._send_error(HTTPStatus.GATEWAY_TIMEOUT, 'extraction did not finish in time')
+                return
+
+            if job.error is not None:
+                self._send_error(HTTPStatus.INTERNAL_SERVER_ERROR, '%s: %s' % (type(job.error).__name__, job.error))
+                return
+
+            results = [{stream: result[stream] for stream in streams} for result in job.results]
+        else:
+            results = []
+
+        for result, id_ in zip(results, ids):
+            if id_ is not None:
+                result['id'] = id_
+
+        if json_lines:
+            body = ''.join(json.dumps(result) + '\n' for result in results).encode('utf-8')
+            self._send(HTTPStatus.OK, body, content_type='application/x-ndjson')
+        elif single:
+            self._send_json(HTTPStatus.OK, results[0])
+        else:
+            self._send_json(HTTPStatus.OK, {'results': results})
+
+    def _resolve_streams(self, streams: Optional[Sequence[str]]) -> Sequence[str]:
+        if streams is None:
+            return self.server.streams
+
+        for stream in streams:
+            if stream not in self.server.streams:
+                raise ValueError('stream %r is not served (expected one of %s)' %
+                                 (stream, ', '.join(self.server.streams)))
+
+        return streams
+
+
+def _parse_item(item):
+    # A text is sent either as a string or as an object with a "text" and an optional "id" to echo back.
+    if isinstance(item, str):
+        return item, None
+    if isinstance(item, dict) and isinstance(item.get('text'), str):
+        return item['text'], item.get('id')
+    raise ValueError('expected a string or an object with a "text" string')
+
+
+def _parse_streams(value) -> Optional[List[str]]:
+    if value is None:
+        return None
+    if not isinstance(value, list) or not all(isinstance(stream, str) for stream in value):
+        raise ValueError('"streams" should be a list of stream names')
+    return value
+
+
+def _parse_json(body: bytes):
+    # {"text": ...} returns one result, {"texts": [...]} returns {"results": [...]}.
+    try:
+        request = json.loads(body)
+    except json.JSONDecodeError as e:
+        raise ValueError('invalid JSON: %s' % e)
+
+    if not isinstance(request, dict):
+        raise ValueError('expected a JSON object')
+
+    streams = _parse_streams(request.get('streams'))
+
+    if 'text' in request:
+        text, id_ = _parse_item(request)
+        return [text, ], [id_, ], streams, True
+
+    items = request.get('texts')
+    if not isinstance(items, list):
+        raise ValueError('expected a "text" string or a "texts" list')
+
+    parsed = [_parse_item(item) for item in items]
+    return [text for text, _ in parsed], [id_ for _, id_ in parsed], streams, False
+
+
+def _parse_json_lines(body: bytes):
+    texts, ids = [], []
+
+    for number, line in enumerate(body.decode('utf-8').splitlines(), 1):
+        if not line.strip():
+            continue
+        try:
+            text, id_ = _parse_item(json.loads(line))
+        except (json.JSONDecodeError, ValueError) as e:
+            raise ValueError('line %d: %s' % (number, e))
+        texts.append(text)
+        ids.append(id_)
+
+    return texts, ids, None
+
+
+def main(argv: Optional[Sequence[str]] = None):
+    parser = argparse.ArgumentParser(prog='python -m posextract serve',
+                                     description='posextract: extraction over HTTP with one warm pipeline')
+    parser.add_argument('--host', type=str, default=DEFAULT_HOST,
+                        help='the address to listen on (default: %(default)s)')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT,
+                        help='the port to listen on (default: %(default)s)')
+    parser.add_argument('--streams', nargs='+', default=list(STREAMS), choices=STREAMS,
+                        help='the extractions to serve (default: all)')
+    parser.add_argument('--input-filters', type=str,
+                        help='An input file or directory containing posextract filter rules.')
+    parser.add_argument('--filter-cache', type=str, default=None,
+                        help='a directory in which to cache parsed filter rule files between runs')
+    parser.add_argument('--post-combine-adj', action='store_true')
+    parser.add_argument('--lemma', action='store_true')
+    parser.add_argument('--pair-lemma', action='store_true',
+                        help='lemmatize the adjective-noun and subject-verb pairs')
+    parser.add_argument('--add-auxiliary', action='store_true')
+    parser.add_argument('--prep-phrase', action='store_true')
+    parser.add_argument('--no-compound-subject', action='store_true')
+    parser.add_argument('--no-compound-object', action='store_true')
+    parser.add_argument('--use-noun-chunks', action='store_true')
+    parser.add_argument('--max-expansions', type=int, default=None,
+                        help='maximum number of conjunct triples added per sentence (default: no limit)')
+    parser.add_argument('--letter-case', default='default', const='default', nargs='?',
+                        choices=['default', 'upper', 'lower'],
+                        help='letter casing to use in the pair outputs (default: %(default)s)')
+    parser.add_argument('--max-batch-size', type=int, default=DEFAULT_MAX_BATCH_SIZE,
+                        help='most texts coalesced into one nlp.pipe batch (default: %(default)s)')
+    parser.add_argument('--max-wait-ms', type=float, default=DEFAULT_MAX_WAIT_MS,
+                        help='longest a batch waits for more requests to join it (default: %(default)s)')
+    parser.add_argument('--max-queue', type=int, default=DEFAULT_MAX_QUEUE,
+                        help='most texts waiting at once before requests are refused with 503 (default: %(default)s)')
+    parser.add_argument('--request-timeout', type=float, default=DEFAULT_REQUEST_TIMEOUT,
+                        help='seconds a request waits for its results (default: %(default)s)')
+    parser.add_argument('--max-body-bytes', type=int, default=DEFAULT_MAX_BODY_BYTES,
+                        help='largest request body accepted, larger ones are refused with 413 (default: %(default)s)')
+    parser.add_argument('--verbose', action='store_true',
+                        help='log every request')
+
+    args = parser.parse_args(argv)
+
+    extractor_options = TripleExtractorOptions(
+        compound_subject=not args.no_compound_subject,
+        compound_object=not args.no_compound_object,
+        combine_adj=args.post_combine_adj,
+        add_auxiliary=args.add_auxiliary,
+        prep_phrase=args.prep_phrase,
+        lemmatize=args.lemma,
+        use_noun_chunks=args.use_noun_chunks,
+        max_expansions=args.max_expansions,
+    )
+
+    filters = None
+    if args.input_filters:
+        from posextract.posrule.parser import load_posrules
+
+        filters = load_posrules(args.input_filters, verbose=args.verbose, cache_dir=args.filter_cache)
+
+    extract_batch = make_extract_batch(extractor_options, streams=args.streams, lemmatize_pairs=args.pair_lemma,
+                                       letter_case=args.letter_case, filters=filters)
+
+    # Load the model and matcher before the first request rather than during it.
+    extract_batch(['The server is warming up.', ])
+
+    batcher = MicroBatcher(extract_batch, max_batch_size=args.max_batch_size, max_wait=args.max_wait_ms / 1000,
+                           max_queue=args.max_queue)
+    batcher.start()
+
+    server = ExtractionServer((args.host, args.port), batcher, streams=args.streams,
+                              request_timeout=args.request_timeout, max_body_bytes=args.max_body_bytes,
+                              verbose=args.verbose)
+    print('Serving %s on http://%s:%d' % (', '.join(args.streams), args.host, server.server_address[1]), flush=True)
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        batcher.close()
+
+
+if __name__ == '__main__':
+    main()
+
+__all__ = ['MicroBatcher', 'ServerBusy', 'ExtractionServer', 'ExtractionRequestHandler', 'make_extract_batch',
+           'ROUTES', 'main']
@@ -1,58 +1,117 @@
-from spacy.tokens import Token
-from typing import List, Union
+import time
+from typing import List, Optional, Set
 
+from spacy.matcher import DependencyMatcher
 from spacy.tokens import Doc
 from spacy.symbols import *
 
+from posextract.docview import DocView, ViewVerb
+from posextract.instrumentation import ExtractionStats, timed
+from posextract.posrule.compiler import CompiledFilter
 from posextract.triple_extraction import TripleExtraction
-from posextract.util import is_root, get_verb_neg, is_verb, get_nlp, is_object, get_object_neg, is_poa, get_poa_neg, \
-    get_subject_neg
-from posextract.util import get_dep_matcher, should_consider_verb_phrase, VerbPhrase
+from posextract.util import get_dep_matcher
 from posextract import rules
 from posextract.verb_phrase import VERB_PHRASE_TABLE
 
-rule_funcs = [
-    rules.rule1,
-    rules.rule2,
-    rules.rule3,
-    rules.rule4,
-    rules.rule5,
-    rules.rule6,
-    rules.rule7,
-    rules.rule8,
-    rules.rule9,
-    rules.rule10,
-    rules.rule11,
-    rules.rule12,
-]
-
-
-def visit_verb(verb: Union[Token, VerbPhrase], parent_subjects, parent_objects, verbose=False):
+rule_funcs = rules.RULES
+
+# Subjects that coreference resolution replaces with another token.
+COREFERENCE_SUBJECTS = ('which', 'who')
+
+
+def _token(doc: Doc, i: Optional[int]):
+    return doc[i] if i is not None else None
+
+
+class FilterPruning:
+    # Checks a CompiledFilter's verb and subject constraints during traversal, so triples that could never pass the
+    # filters are not searched for. Each decision depends only on lower-cased text, as deduplication does. A subject
+    # is kept when any token with its text, or any noun coordinated with one, could pass, because conjunct expansion
+    # may still replace the subject with those.
+    def __init__(self, view: DocView, filters: CompiledFilter):
+        self.view = view
+        self.verb_constraint = filters.verb_constraint
+        self.subject_constraint = filters.subject_constraint
+        self._subject_texts = {}
+        self._tokens_by_text = None
+
+    def verb_allowed(self, verb: ViewVerb) -> bool:
+        if self.verb_constraint is None:
+            return True
+        return self.verb_constraint(verb.token(self.view.doc).text.lower())
+
+    def subject_allowed(self, i: int) -> bool:
+        if self.subject_constraint is None:
+            return True
+
+        view = self.view
+        text = view.lower[i]
+        allowed = self._subject_texts.get(text)
+
+        if allowed is None:
+            if self._tokens_by_text is None:
+                self._tokens_by_text = {}
+                for token, lower in enumerate(view.lower):
+                    self._tokens_by_text.setdefault(lower, []).append(token)
+
+            strings = view.doc.vocab.strings
+            allowed = False
+
+            for token in self._tokens_by_text[text]:
+                for candidate in [token, ] + view.noun_conjuncts(token):
+                    candidate_text = strings[view.lower[candidate]]
+                    if candidate_text in COREFERENCE_SUBJECTS or self.subject_constraint(candidate_text):
+                        allowed = True
+                        break
+                if allowed:
+                    break
+
+            self._subject_texts[text] = allowed
+
+        return allowed
+
+
+def visit_verb(view: DocView, verb: ViewVerb, parent_subjects, parent_objects, verbose=False, doc_id=None,
+               pruning: Optional[FilterPruning] = None, stats: Optional[ExtractionStats] = None):
+    doc = view.doc
+
+    if pruning is not None and not pruning.verb_allowed(verb):
+        if verbose: print('Skipping verb the filters rule out:', verb.token(doc))
+        if stats is not None: stats.count('verbs_pruned')
+        return
+
+    if stats is not None: stats.count('verbs')
+
     if verbose:
-        print('beginning triple search for verb:', verb)
-        print('verb dep=', verb.dep_)
+        print('beginning triple search for verb:', verb.token(doc))
+        print('verb dep=', doc.vocab.strings[verb.dep])
         print('\tparent_subjects=', parent_subjects)
         print('\tparent_objects=', parent_objects)
 
     # Search for the subject.
-    if isinstance(verb, VerbPhrase):
-        subjects = subject_search(verb.subject_search_root, verbose=verbose, verb_phrase=True)
+    if verb.phrase is not None:
+        subjects = subject_search(view, verb.phrase.subject_search_root.i, verbose=verbose, verb_phrase=True)
     else:
-        subjects = subject_search(verb, verbose=verbose)
+        subjects = subject_search(view, verb.i, verbose=verbose)
 
     # Search for the objects.
-    if isinstance(verb, VerbPhrase):
-        objects = object_search(verb.object_search_root) + parent_objects
+    if verb.phrase is not None:
+        objects = object_search(view, verb.phrase.object_search_root.i) + parent_objects
     else:
-        objects = object_search(verb) + parent_objects
+        objects = object_search(view, verb.i) + parent_objects
+
+    # Remove duplicates, keeping the order they were found in so output is deterministic.
+    subjects = list(dict.fromkeys(subjects))
+    objects = list(dict.fromkeys(objects))
 
-    # Remove duplicates.
-    subjects = list(set(subjects))
-    objects = list(set(objects))
+    if pruning is not None:
+        allowed = [(negdet, subject) for negdet, subject in subjects if pruning.subject_allowed(subject)]
+        if stats is not None: stats.count('subjects_pruned', len(subjects) - len(allowed))
+        subjects = allowed
 
     if verbose:
-        print('\tsubjects=', subjects)
-        print('\tobjects=', objects)
+        print('\tsubjects=', [(_token(doc, negdet), doc[subject]) for negdet, subject in subjects])
+        print('\tobjects=', [tuple(_token(doc, i) for i in obj) for obj in objects])
 
     if not subjects:
         if verbose: print('Could not find subjects.')
@@ -60,75 +119,132 @@ def visit_verb(verb: Union[Token, VerbPhrase], parent_subjects, parent_objects,
     if not objects:
         if verbose: print('Could not find objects.')
 
-    neg_adverb, neg_adverb_part = get_verb_neg(verb)
+    neg_adverb, neg_adverb_part = view.verb_neg(verb)
+    candidate_rules = rules.RULE_DISPATCH.get(verb.dep)
+
+    if stats is not None:
+        stats.count('candidates', len(subjects) * len(objects))
+        rules_tried = rule_matches = 0
+        rules_start = time.perf_counter()
 
     for subject_negdet, subject in subjects:
         for poa_neg, poa, obj_negdet, obj in objects:
-            if verbose: print('\tconsidering triple:', subject, verb, poa if poa else '', obj)
+            if verbose: print('\tconsidering triple:', doc[subject], verb.token(doc), doc[poa] if poa is not None else '',
+                              doc[obj])
 
-            for rule in rule_funcs:
-                if rule(verb, subject, obj, poa):
+            for rule in candidate_rules:
+                if rule(view, verb, subject, obj, poa):
                     if verbose: print('\tmatched with', rule.__name__, '\n')
+                    if stats is not None:
+                        rules_tried += candidate_rules.index(rule) + 1
+                        rule_matches += 1
 
                     extraction = TripleExtraction(
                         subject_negdet=subject_negdet, subject=subject,
-                        neg_adverb=neg_adverb, neg_adverb_part=neg_adverb_part, verb=verb,
-                        poa_neg=poa_neg, poa=poa, object_negdet=obj_negdet, object=obj,
+                        neg_adverb=neg_adverb, neg_adverb_part=neg_adverb_part,
+                        verb=verb.first,
+                        poa_neg=poa_neg, poa=poa,
+                        object_negdet=obj_negdet, object=obj,
                         rule=' <%s>' % rule.__name__,
-                        verb_phrase=isinstance(verb, VerbPhrase))
+                        verb_phrase=type(verb.phrase) if verb.phrase is not None else None,
+                        verb_second=verb.second if verb.phrase is not None else None,
+                        doc_id=doc_id)
                     yield extraction
                     break
             else:
                 if verbose: print('\tNo matching rule found.\n')
+                if stats is not None: rules_tried += len(candidate_rules)
+
+    if stats is not None:
+        stats.count('rules_tried', rules_tried)
+        stats.count('rule_matches', rule_matches)
+        stats.add_time('rules', time.perf_counter() - rules_start)
 
-    yield from visit_token(verb, parent_subjects=subjects, verbose=verbose)
 
+def visit_tree(view: DocView, verb: ViewVerb, visited: Set[int], verbose=False, doc_id=None,
+               pruning: Optional[FilterPruning] = None,
+               stats: Optional[ExtractionStats] = None) -> List[TripleExtraction]:
+    # Visits the verb and then every verb below it, depth first in document order. Tokens in `visited` have already
+    # had their whole subtree visited, and visiting them again would only repeat the same extractions.
+    extractions = list(visit_verb(view, verb, [], [], verbose=verbose, doc_id=doc_id, pruning=pruning, stats=stats))
 
-def visit_token(token, parent_subjects, verbose=False):
-    for child in token.children:
-        if is_verb(child):
-            yield from visit_verb(child, parent_subjects=[], parent_objects=[], verbose=verbose)
-        else:
-            # Reset inherited subjects and objects.
-            yield from visit_token(child, [], verbose=verbose)
+    stack = view.verb_children(verb)
+    stack.reverse()
 
+    while stack:
+        token = stack.pop()
+
+        if token in visited:
+            continue
+
+        visited.add(token)
+
+        if view.is_verb(token):
+            # Subjects and objects are not inherited from the verb above.
+            extractions.extend(visit_verb(view, ViewVerb(view, token), [], [], verbose=verbose, doc_id=doc_id,
+                                          pruning=pruning, stats=stats))
+
+        stack.extend(reversed(view.children(token)))
+
+    return extractions
 
-def graph_tokens(doc: Doc, verbose=False) -> List[TripleExtraction]:
-    root_verb = None
 
-    for token in doc:
-        if is_root(token):
-            root_verb = token
-            if verbose: print(f"Root verb is {root_verb}")
-            break
+def graph_tokens(doc: Doc, verbose=False, dep_matcher: Optional[DependencyMatcher] = None,
+                 view: Optional[DocView] = None, doc_id=None,
+                 filters: Optional[CompiledFilter] = None,
+                 stats: Optional[ExtractionStats] = None) -> List[TripleExtraction]:
+    # `filters` only prunes triples that could not pass them; the caller still applies them to the result.
+    if view is None:
+        view = DocView(doc)
+    pruning = None
+    if filters is not None and (filters.verb_constraint is not None or filters.subject_constraint is not None):
+        pruning = FilterPruning(view, filters)
+    root_verb = view.find_root()
 
     if root_verb is None:
         if verbose: print('Could not find root verb.')
         return []
 
-    triple_extractions = list(visit_verb(root_verb, [], [], verbose=verbose))
+    if verbose: print(f"Root verb is {doc[root_verb]}")
 
-    dep_matcher = get_dep_matcher(get_nlp())
-    matches = dep_matcher(doc)
+    visited = {root_verb, }
+    triple_extractions = visit_tree(view, ViewVerb(view, root_verb), visited, verbose=verbose,
+                                     doc_id=doc_id, pruning=pruning, stats=stats)
+
+    if dep_matcher is None:
+        dep_matcher = get_dep_matcher(doc)
+
+    with timed(stats, 'dep_matcher'):
+        matches = dep_matcher(doc)
+    visited_phrases = set()
 
     for match_id, token_ids in matches:
-        match_type = get_nlp().vocab[match_id].text
+        match_type = dep_matcher.vocab.strings[match_id]
         class_ = VERB_PHRASE_TABLE[match_type]
+
+        key = (class_, *token_ids)
+        if key in visited_phrases:
+            continue
+        visited_phrases.add(key)
+
         verb_phrase = class_(*(doc[ti] for ti in token_ids))
+        verb = ViewVerb(view, verb_phrase.first.i, verb_phrase.second.i, phrase=verb_phrase)
 
-        if not should_consider_verb_phrase(verb_phrase):
+        if not view.should_consider_verb_phrase(verb):
             if verbose: print('Disregarding verb phrase: %s' % repr(verb_phrase))
             continue
 
         if verbose:
             print('Matched verb phrase %s: %s' % (match_type, repr(verb_phrase)))
+        if stats is not None: stats.count('verb_phrases')
 
-        triple_extractions.extend(visit_verb(verb_phrase, [], [], verbose=verbose))
+        triple_extractions.extend(visit_tree(view, verb, visited, verbose=verbose, doc_id=doc_id,
+                                                 pruning=pruning, stats=stats))
 
     return triple_extractions
 
 
-def object_search(token: Token):
+def object_search(view: DocView, token: int):
     objects = []
 
     visited = set()
@@ -142,32 +258,33 @@ def object_search(token: Token):
 
         visited.add(candidate)
 
-        if is_object(candidate):
-            obj_negdet = get_object_neg(candidate)
-            # obj_adj = get_object_adj(candidate)
-            poa = candidate.head if is_poa(candidate.head) else None
-            poa_neg = get_poa_neg(poa) if poa is not None else None
+        if view.is_object(candidate):
+            obj_negdet = view.object_neg(candidate)
+            head = view.head[candidate]
+            poa = head if view.is_poa(head) else None
+            poa_neg = view.poa_neg(poa) if poa is not None else None
             objects.append((poa_neg, poa, obj_negdet, candidate))
 
-        for child in candidate.children:
+        for child in view.children(candidate):
             if child not in visited:
-                if child.pos == VERB or child.pos == AUX:
+                if view.pos[child] == VERB or view.pos[child] == AUX:
                     continue
                 considering.append(child)
 
     return objects
 
 
-def subject_search(token: Token, verbose=False, verb_phrase=False):
+def subject_search(view: DocView, token: int, verbose=False, verb_phrase=False):
+    doc = view.doc
     objects = []
 
     visited = set()
     considering = [token, ]
 
     if verbose:
-        print('\tDoing subject search for token: ', token)
-        print('\tverb.head', token.head)
-        print('\tverb.children', list(token.children))
+        print('\tDoing subject search for token: ', doc[token])
+        print('\tverb.head', doc[token].head)
+        print('\tverb.children', list(doc[token].children))
 
     while considering:
         candidate = considering.pop(-1)
@@ -177,29 +294,30 @@ def subject_search(token: Token, verbose=False, verb_phrase=False):
 
         visited.add(candidate)
 
-        if candidate.dep == nsubj or candidate.dep == nsubjpass:
-            objects.append((get_subject_neg(candidate), candidate))
+        dep = view.dep[candidate]
+        if dep == nsubj or dep == nsubjpass:
+            objects.append((view.subject_neg(candidate), candidate))
 
-        for child in candidate.children:
+        for child in view.children(candidate):
             if child not in visited:
-                if child.pos == VERB:
+                if view.pos[child] == VERB:
                     continue
-                if verb_phrase and child.pos == AUX:
+                if verb_phrase and view.pos[child] == AUX:
                     continue
 
                 if verbose:
-                    print('\t\t(verb=%s) considering child:' % token, child.text, 'with POS=', child.pos_)
-                    print('\t\tdependency of %s->%s:' % (candidate, child), child.dep_)
+                    print('\t\t(verb=%s) considering child:' % doc[token], doc[child].text, 'with POS=', doc[child].pos_)
+                    print('\t\tdependency of %s->%s:' % (doc[candidate], doc[child]), doc[child].dep_)
                 considering.append(child)
 
-        parent = candidate.head
+        parent = view.head[candidate]
         if parent not in visited:
-            if (parent.pos == VERB or parent.pos == AUX) and (candidate.dep == conj or candidate.dep == advcl):
+            if (view.pos[parent] == VERB or view.pos[parent] == AUX) and (dep == conj or dep == advcl):
                 continue
 
             if verbose:
-                print('\t\t(verb=%s) considering parent:' % token, parent.text, 'with POS=', parent.pos_)
-                print('\t\tdependency of %s->%s:' % (parent, candidate), candidate.dep_)
+                print('\t\t(verb=%s) considering parent:' % doc[token], doc[parent].text, 'with POS=', doc[parent].pos_)
+                print('\t\tdependency of %s->%s:' % (doc[parent], doc[candidate]), doc[candidate].dep_)
             considering.append(parent)
 
     return objects
@@ -1,4 +1,4 @@
-from typing import Optional, List, Union
+from typing import Dict, Hashable, Optional, List, Tuple, Type, Union
 
 from spacy.matcher import DependencyMatcher
 from spacy.symbols import *
@@ -35,62 +35,111 @@ class TripleExtractionFlattened:
 EMPHASIS_ADJ_LIST = ('very', 'much', 'most', 'utterly', 'as')
 
 
-@dataclass
-class TripleExtraction:
-    subject_negdet: Optional[Token] = None
-    subject: Optional[Token] = None
-    neg_adverb: Optional[Token] = None
-    neg_adverb_part: Optional[Token] = None
-    aux_verb: Optional[Token] = None
-    verb: Optional[Union[Token, VerbPhrase]] = None
-    poa_neg: Optional[Token] = None
-    poa: Optional[Token] = None
-    object_negdet: Optional[Token] = None
-    object_adjectives: Optional[List[Token]] = None
-    object: Optional[Token] = None
-    object_prep: Optional[Token] = None
-    object_prep_noun: Optional[Token] = None
-    rule: str = ''
-    verb_phrase: bool = False
+# The Token-valued fields of TripleExtraction, in field order.
+TOKEN_FIELDS = ('subject_negdet', 'subject', 'neg_adverb', 'neg_adverb_part', 'aux_verb', 'verb', 'poa_neg', 'poa',
+                'object_negdet', 'object', 'object_prep', 'object_prep_noun')
 
-    def flatten(self, lemmatize=False, compound_subject=True, compound_object=True) -> TripleExtractionFlattened:
-        kwargs = {k: v for k, v in self.__dict__.items() if v is not None}
 
-        del kwargs['verb_phrase']
+class TripleExtraction:
+    # Token fields hold indices into the Doc the triple was extracted from, so a triple does not keep its Doc alive
+    # and can be pickled. `doc_id` identifies that Doc to the caller; the text is only looked up when flattening.
+    # A verb phrase stores its first token in `verb`, its second in `verb_second` and its class in `verb_phrase`.
+    __slots__ = ('doc_id', 'subject_negdet', 'subject', 'neg_adverb', 'neg_adverb_part', 'aux_verb', 'verb',
+                 'verb_second', 'poa_neg', 'poa', 'object_negdet', 'object_adjectives', 'object', 'object_prep',
+                 'object_prep_noun', 'rule', 'verb_phrase')
+
+    def __init__(self, subject_negdet: Optional[int] = None, subject: Optional[int] = None,
+                 neg_adverb: Optional[int] = None, neg_adverb_part: Optional[int] = None,
+                 aux_verb: Optional[int] = None, verb: Optional[int] = None, poa_neg: Optional[int] = None,
+                 poa: Optional[int] = None, object_negdet: Optional[int] = None,
+                 object_adjectives: Optional[Tuple[int, ...]] = None, object: Optional[int] = None,
+                 object_prep: Optional[int] = None, object_prep_noun: Optional[int] = None, rule: str = '',
+                 verb_phrase: Optional[Type[VerbPhrase]] = None, verb_second: Optional[int] = None,
+                 doc_id: Optional[Hashable] = None):
+        self.doc_id = doc_id
+        self.subject_negdet = subject_negdet
+        self.subject = subject
+        self.neg_adverb = neg_adverb
+        self.neg_adverb_part = neg_adverb_part
+        self.aux_verb = aux_verb
+        self.verb = verb
+        self.verb_second = verb_second
+        self.poa_neg = poa_neg
+        self.poa = poa
+        self.object_negdet = object_negdet
+        self.object_adjectives = object_adjectives
+        self.object = object
+        self.object_prep = object_prep
+        self.object_prep_noun = object_prep_noun
+        self.rule = rule
+        self.verb_phrase = verb_phrase
+
+    def __eq__(self, other):
+        if other.__class__ is not self.__class__:
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name) for name in self.__slots__)
+
+    __hash__ = None
+
+    def __repr__(self):
+        fields = ', '.join('%s=%r' % (name, getattr(self, name)) for name in self.__slots__)
+        return '%s(%s)' % (self.__class__.__name__, fields)
+
+    def get_token(self, doc: Doc, name: str) -> Optional[Token]:
+        i = getattr(self, name)
+        return doc[i] if i is not None else None
+
+    def get_verb(self, doc: Doc) -> Union[Token, VerbPhrase]:
+        if self.verb_phrase is None:
+            return doc[self.verb]
+        return self.verb_phrase(doc[self.verb], doc[self.verb_second])
+
+    def get_tokens(self, doc: Doc) -> Dict[str, Union[Token, VerbPhrase, List[Token]]]:
+        # The Tokens of every field that is set, keyed by field name.
+        tokens = {name: doc[getattr(self, name)] for name in TOKEN_FIELDS if getattr(self, name) is not None}
+        if self.verb is not None:
+            tokens['verb'] = self.get_verb(doc)
+        if self.object_adjectives is not None:
+            tokens['object_adjectives'] = [doc[i] for i in self.object_adjectives]
+        return tokens
+
+    def flatten(self, doc: Doc, lemmatize=False, compound_subject=True,
+                compound_object=True) -> TripleExtractionFlattened:
+        tokens = self.get_tokens(doc)
+        subject, verb, obj = tokens.get('subject'), tokens.get('verb'), tokens.get('object')
+
+        kwargs = {name: str(token) for name, token in tokens.items()}
+        kwargs['rule'] = self.rule
 
         if lemmatize:
-            if self.object:
-                kwargs['object'] = self.object.lemma_
-            if self.verb:
-                kwargs['verb'] = self.verb.lemma_
-            if self.subject:
-                kwargs['subject'] = self.subject.lemma_
+            if obj:
+                kwargs['object'] = obj.lemma_
+            if verb:
+                kwargs['verb'] = verb.lemma_
+            if subject:
+                kwargs['subject'] = subject.lemma_
         else:
-            if hasattr(self.verb, 'i') and (self.verb and self.subject) and (self.verb.i < self.subject.i):
-                kwargs['verb'] = self.verb.lemma_
+            if hasattr(verb, 'i') and (verb and subject) and (verb.i < subject.i):
+                kwargs['verb'] = verb.lemma_
 
         if self.object_adjectives:
-            kwargs['object_adjectives'] = ' '.join((adj.text for adj in self.object_adjectives))
-
-        for k, v in kwargs.items():
-            if type(v) != str:
-                kwargs[k] = str(v)
+            kwargs['object_adjectives'] = ' '.join((adj.text for adj in tokens['object_adjectives']))
 
         if compound_subject:
-            for child in self.subject.children:
+            for child in subject.children:
                 if child.dep_ == "compound":
                     kwargs['subject'] = child.text + ' ' + kwargs['subject']
 
-        if self.object.dep == advmod and self.object.pos == ADV:
-            if self.object.head.pos == ADJ and self.object.text.lower() in EMPHASIS_ADJ_LIST:
-                kwargs['object'] += ' ' + self.object.head.text
+        if obj.dep == advmod and obj.pos == ADV:
+            if obj.head.pos == ADJ and obj.text.lower() in EMPHASIS_ADJ_LIST:
+                kwargs['object'] += ' ' + obj.head.text
 
         if compound_object:
-            for child in reversed(list(self.object.children)):
+            for child in reversed(list(obj.children)):
                 if child.dep_ == "compound":
                     kwargs['object'] = child.text + ' ' + kwargs['object']
 
-        for verb_child in self.verb.children:
+        for verb_child in verb.children:
             if verb_child.pos == ADP and verb_child.dep == prt:
                 kwargs['verb'] += ' ' + verb_child.text
 
@@ -98,6 +147,8 @@ class TripleExtraction:
             **kwargs
         )
 
-    def get_triple_hash(self) -> int:
+    def get_triple_hash(self, doc: Doc) -> int:
         default_empty_str = lambda x: x.text.lower() if x else ''
-        return hash((default_empty_str(self.subject), default_empty_str(self.verb), default_empty_str(self.object)))
+        return hash((default_empty_str(self.get_token(doc, 'subject')),
+                     default_empty_str(self.get_verb(doc) if self.verb is not None else None),
+                     default_empty_str(self.get_token(doc, 'object'))))
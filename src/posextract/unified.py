@@ -0,0 +1,328 @@
+import argparse
+import collections.abc
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Tuple, Union
+
+from spacy.language import Language
+
+from posextract import adj_noun_pairs, subj_verb_pairs
+from posextract.adj_noun_pairs import AdjNounExtraction
+from posextract.cache import ParseCache, pipe_docs
+from posextract.checkpoint import checkpoint_from_args, DEFAULT_CHECKPOINT_INTERVAL
+from posextract.corpus import read_corpus, DEFAULT_CHUNK_SIZE
+from posextract.engine import extract_corpus
+from posextract.grammatical_triples import TripleExtractor
+from posextract.instrumentation import ExtractionStats, timed, timed_iter
+from posextract.posrule.compiler import Prefilter
+from posextract.subj_verb_pairs import SubjVerbExtraction
+from posextract.triple_extraction import TripleExtractionFlattened
+from posextract.util import TripleExtractorOptions, get_pipeline, make_pipeline, split_quotes, DEFAULT_BATCH_SIZE
+from posextract.writer import open_writer, record_fields, DEFAULT_FLUSH_SIZE, FSYNC_POLICIES
+
+TRIPLES = 'triples'
+ADJ_NOUN = 'adj_noun'
+SUBJ_VERB = 'subj_verb'
+STREAMS = (TRIPLES, ADJ_NOUN, SUBJ_VERB)
+
+PAIR_RULES = {
+    ADJ_NOUN: adj_noun_pairs.rule,
+    SUBJ_VERB: subj_verb_pairs.rule,
+}
+
+RECORD_TYPES = {
+    TRIPLES: TripleExtractionFlattened,
+    ADJ_NOUN: AdjNounExtraction,
+    SUBJ_VERB: SubjVerbExtraction,
+}
+
+
+class StreamExtraction(NamedTuple):
+    stream: str
+    extraction: Any
+
+
+def _iter_parse_units(input_object: Iterable[str], want_triples: bool, want_pairs: bool,
+                      prefilter: Optional[Prefilter] = None, stats: Optional[ExtractionStats] = None):
+    # Triples are extracted per quote-split fragment and pairs per document. A document without quotes is its own
+    # only fragment, so it is parsed once for both; otherwise the whole document is parsed again for the pairs.
+    # Fragments the prefilter rules out are only parsed when the pairs need them.
+    for i, document in enumerate(input_object):
+        fragments = list(split_quotes(document)) if want_triples else []
+        shared = want_pairs and fragments == [document, ]
+
+        if prefilter is not None:
+            allowed = [fragment for fragment in fragments if prefilter(fragment)]
+            if stats is not None: stats.count('sentences_skipped', len(fragments) - len(allowed))
+            fragments = allowed
+
+        for fragment in fragments:
+            yield fragment, (i, True, shared)
+
+        if want_pairs and not (shared and fragments):
+            yield document, (i, False, True)
+
+
+def extract_iter(input_object: Union[str, Iterable[str]], extractor_options: TripleExtractorOptions = None,
+                 streams: Sequence[str] = STREAMS,
+                 lemmatize_pairs: bool = False,
+                 letter_case: str = 'default',
+                 verbose: bool = False,
+                 filters: Optional[List] = None,
+                 batch_size: int = DEFAULT_BATCH_SIZE,
+                 parse_cache: Optional[ParseCache] = None,
+                 stats: Optional[ExtractionStats] = None,
+                 nlp: Optional[Language] = None) -> Iterator[Tuple[int, List[StreamExtraction]]]:
+    # `nlp` defaults to the shared en_core_web_sm pipeline.
+    for stream in streams:
+        if stream not in STREAMS:
+            raise ValueError('unknown stream: %s (expected one of %s)' % (stream, ', '.join(STREAMS)))
+
+    if type(input_object) == str:
+        input_object = [input_object, ]
+    elif not isinstance(input_object, collections.abc.Iterable):
+        raise ValueError('extract_iter: input should be a string or a collection of strings')
+
+    want_triples = TRIPLES in streams
+    pair_rules = [(stream, PAIR_RULES[stream]) for stream in streams if stream in PAIR_RULES]
+
+    # Filters are compiled once here rather than for every Doc.
+    triple_extractor = TripleExtractor(extractor_options, filters=filters, nlp=nlp, verbose=verbose,
+                                       batch_size=batch_size) if want_triples else None
+    filters = triple_extractor.filters if triple_extractor is not None else None
+
+    # The triples need lemmas whatever their options are, the pairs only when lemmatizing. Noun chunks are merged
+    # by the triple extractor, into a copy, so the pairs and any cached Doc see the unmerged parse.
+    lemmas = want_triples or lemmatize_pairs
+    parser = get_pipeline(lemmas=lemmas) if nlp is None else make_pipeline(nlp, lemmas=lemmas)
+    units = _iter_parse_units(input_object, want_triples, bool(pair_rules),
+                              prefilter=filters.prefilter if filters is not None else None, stats=stats)
+
+    def generate():
+        docs = pipe_docs(parser, units, batch_size=batch_size, parse_cache=parse_cache)
+        for doc, (i, for_triples, for_pairs) in timed_iter(docs, stats, 'nlp'):
+            extractions = []
+
+            if for_pairs:
+                for stream, rule in pair_rules:
+                    with timed(stats, 'pairs'):
+                        pairs = rule(doc, lemmatize=lemmatize_pairs, verbose=verbose, letter_case=letter_case)
+                    extractions.extend(StreamExtraction(stream, pair) for pair in pairs)
+
+            if for_triples:
+                triples = triple_extractor.extract_doc(doc, stats=stats, finish=True)
+                extractions.extend(StreamExtraction(TRIPLES, triple) for triple in triples)
+
+            yield i, extractions
+
+    return generate()
+
+
+def extract(input_object: Union[str, Iterable[str]], extractor_options: TripleExtractorOptions = None,
+            streams: Sequence[str] = STREAMS,
+            lemmatize_pairs: bool = False,
+            letter_case: str = 'default',
+            verbose: bool = False,
+            filters: Optional[List] = None,
+            batch_size: int = DEFAULT_BATCH_SIZE,
+            parse_cache: Optional[ParseCache] = None,
+            stats: Optional[ExtractionStats] = None,
+            nlp: Optional[Language] = None) -> Dict[str, List]:
+    output_extractions = {stream: [] for stream in streams}
+
+    for i, extractions in extract_iter(input_object, extractor_options, streams=streams,
+                                       lemmatize_pairs=lemmatize_pairs, letter_case=letter_case, verbose=verbose,
+                                       filters=filters, batch_size=batch_size, parse_cache=parse_cache,
+                                       stats=stats, nlp=nlp):
+        for extraction in extractions:
+            output_extractions[extraction.stream].append(extraction.extraction)
+
+    return output_extractions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='posextract: triples, adj-noun and subj-verb pairs in one pass')
+    parser.add_argument('--input', type=str,
+                        help='an input string')
+    parser.add_argument('--input-file', type=str,
+                        help='The filepath of a input csv file')
+    parser.add_argument('--input-filters', type=str,
+                        help='An input file or directory containing posextract filter rules.')
+    parser.add_argument('--output-triples', type=str, default=None,
+                        help='an output path for grammatical triples')
+    parser.add_argument('--output-adj-noun', type=str, default=None,
+                        help='an output path for adjective-noun pairs')
+    parser.add_argument('--output-subj-verb', type=str, default=None,
+                        help='an output path for subject-verb pairs')
+    parser.add_argument('--data-column', type=str, default=None, metavar='data_col',
+                        help='what column to use if a csv is given', dest='data_column')
+    parser.add_argument('--id-column', type=str, default=None, metavar='id_col',
+                        help='what column to use if a csv is given', dest='id_column')
+    parser.add_argument('--file-delimiter', default='comma', const='comma', nargs='?',
+                        choices=['comma', 'pipe', 'tab'],
+                        help='delimiter character for data file (default: %(default)s)')
+    parser.add_argument('--post-combine-adj', action='store_true')
+    parser.add_argument('--lemma', action='store_true')
+    parser.add_argument('--pair-lemma', action='store_true',
+                        help='lemmatize the adjective-noun and subject-verb pairs')
+    parser.add_argument('--add-auxiliary', action='store_true')
+    parser.add_argument('--verbose', action='store_true')
+    parser.add_argument('--prep-phrase', action='store_true')
+    parser.add_argument('--no-compound-subject', action='store_true')
+    parser.add_argument('--no-compound-object', action='store_true')
+    parser.add_argument('--use-noun-chunks', action='store_true')
+    parser.add_argument('--max-expansions', type=int, default=None,
+                        help='maximum number of conjunct triples added per sentence (default: no limit)')
+    parser.add_argument('--letter-case', default='default', const='default', nargs='?',
+                        choices=['default', 'upper', 'lower'],
+                        help='letter casing to use in the pair outputs (default: %(default)s)')
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+                        help='number of sentences parsed per nlp.pipe batch (default: %(default)s)')
+    parser.add_argument('--jobs', type=int, default=1,
+                        help='number of worker processes to extract with (default: %(default)s)')
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE,
+                        help='number of csv rows read into memory at a time (default: %(default)s)')
+    parser.add_argument('--flush-size', type=int, default=DEFAULT_FLUSH_SIZE,
+                        help='number of output rows buffered between writes (default: %(default)s)')
+    parser.add_argument('--fsync', default='none', choices=FSYNC_POLICIES,
+                        help='when to fsync the output files (default: %(default)s)')
+    parser.add_argument('--row-group-size', type=int, default=None,
+                        help='maximum rows per row group in Parquet or Arrow output (default: one per flush)')
+    parser.add_argument('--parse-cache', type=str, default=None,
+                        help='a directory in which to cache parsed sentences between runs')
+    parser.add_argument('--filter-cache', type=str, default=None,
+                        help='a directory in which to cache parsed filter rule files between runs')
+    parser.add_argument('--stats', action='store_true',
+                        help='print the time spent in each extraction stage and counts of the work done '
+                             '(only with --jobs 1)')
+    parser.add_argument('--checkpoint', type=str, default=None,
+                        help='a file in which to record how far the run has got, for --resume')
+    parser.add_argument('--checkpoint-interval', type=int, default=DEFAULT_CHECKPOINT_INTERVAL,
+                        help='number of input rows between checkpoints (default: %(default)s)')
+    parser.add_argument('--resume', action='store_true',
+                        help='continue from the --checkpoint file, if there is one, instead of starting over')
+
+    args = parser.parse_args()
+    is_file = args.input_file is not None
+
+    outputs = {
+        TRIPLES: args.output_triples,
+        ADJ_NOUN: args.output_adj_noun,
+        SUBJ_VERB: args.output_subj_verb,
+    }
+    outputs = {stream: path for stream, path in outputs.items() if path is not None}
+
+    if not outputs:
+        exit('Please provide at least one of --output-triples, --output-adj-noun or --output-subj-verb')
+
+    if not args.input and not args.input_file:
+        exit('Please provide either an input string or an input file')
+
+    # Worker processes would each record into their own copy.
+    if args.stats and args.jobs > 1:
+        exit('Invalid arguments: --stats can only be used with --jobs 1')
+
+    extractor_options = TripleExtractorOptions(
+        compound_subject=not args.no_compound_subject,
+        compound_object=not args.no_compound_object,
+        combine_adj=args.post_combine_adj,
+        add_auxiliary=args.add_auxiliary,
+        prep_phrase=args.prep_phrase,
+        lemmatize=args.lemma,
+        use_noun_chunks=args.use_noun_chunks,
+        max_expansions=args.max_expansions,
+    )
+
+    filters = []
+
+    delimiter = {'comma': ',', 'pipe': '|', 'tab': '\t'}[args.file_delimiter]
+
+    if is_file:
+        if args.verbose:
+            print('Loading input (%s) as a CSV file...' % args.input_file)
+            print('delimiter:', args.file_delimiter)
+        if args.data_column is None:
+            exit('Invalid arguments: Must specify column name for data using --data-column')
+
+        rows = read_corpus(args.input_file, args.data_column, id_column=args.id_column, delimiter=delimiter,
+                           chunksize=args.chunk_size)
+    else:
+        rows = enumerate([args.input, ])
+
+    try:
+        checkpoint = checkpoint_from_args(args, list(outputs.values()))
+    except ValueError as e:
+        exit('Invalid arguments: %s' % e)
+
+    if checkpoint is not None:
+        if args.verbose and checkpoint.offset:
+            print('Resuming after %d rows' % checkpoint.offset)
+        rows = checkpoint.track(rows)
+
+    if args.input_filters:
+        from posextract.posrule.parser import load_posrules
+
+        filters = load_posrules(args.input_filters, verbose=args.verbose, cache_dir=args.filter_cache)
+
+    # Compiled once here; worker processes compile their own copy when it is unpickled.
+    filters = compile_filters(filters)
+    prefilter = None
+
+    # Rows whose text rules out every filter are not sent to the extractor at all. They are counted on a copy of the
+    # prefilter, apart from the fragments the extractor skips itself. The pairs are not filtered, so this is only
+    # done when triples are the only output.
+    if filters is not None and filters.prefilter is not None and set(outputs) == {TRIPLES, }:
+        prefilter = filters.prefilter.copy()
+        rows = ((row_id, text) for row_id, text in rows if prefilter(text))
+
+    # The id column is named as in the single-extractor CLIs, so each output file matches theirs.
+    id_columns = {TRIPLES: 'sentence_id', ADJ_NOUN: 'index', SUBJ_VERB: 'index'}
+
+    extraction_counts = collections.Counter()
+    parse_cache = ParseCache(args.parse_cache) if args.parse_cache else None
+    stats = ExtractionStats() if args.stats else None
+
+    results = extract_corpus('unified', rows, jobs=args.jobs, extractor_options=extractor_options,
+                             streams=tuple(outputs), lemmatize_pairs=args.pair_lemma, letter_case=args.letter_case,
+                             verbose=args.verbose, filters=filters, batch_size=args.batch_size,
+                             parse_cache=parse_cache, stats=stats)
+
+    writers = {
+        stream: open_writer(path, record_fields(RECORD_TYPES[stream]), delimiter=delimiter,
+                            id_column=id_columns[stream] if is_file else None,
+                            flush_size=args.flush_size, fsync=args.fsync,
+                            row_group_size=args.row_group_size,
+                            resume_at=checkpoint.resume_at(path) if checkpoint is not None else None)
+        for stream, path in outputs.items()
+    }
+
+    if checkpoint is not None:
+        results = checkpoint.commit(results, writers.values())
+
+    try:
+        for row_id, extractions in results:
+            grouped = {stream: [] for stream in writers}
+            for extraction in extractions:
+                grouped[extraction.stream].append(extraction.extraction)
+
+            for stream, records in grouped.items():
+                writers[stream].write(records, row_id)
+                extraction_counts[stream] += len(records)
+
+        if checkpoint is not None:
+            checkpoint.save(writers.values())
+    finally:
+        for writer in writers.values():
+            writer.close()
+
+    if parse_cache is not None:
+        parse_cache.close()
+
+    if stats is not None:
+        print(stats.summary())
+
+    if args.verbose:
+        for stream in writers:
+            print('Number of %s extractions: %d' % (stream, extraction_counts[stream]))
+        if prefilter is not None:
+            print('Skipped %d of %d sentences that cannot match the filters' % (prefilter.skipped, prefilter.checked))
+
+__all__ = ['extract', 'extract_iter', 'StreamExtraction', 'STREAMS', 'TRIPLES', 'ADJ_NOUN', 'SUBJ_VERB']
@@ -1,8 +1,10 @@
+import threading
 from dataclasses import dataclass
-from typing import NamedTuple, Union
+from typing import Callable, NamedTuple, Optional, Union, Sequence
 
 import spacy.tokens
 from spacy.matcher import DependencyMatcher
+from spacy.pipeline.functions import merge_noun_chunks
 from spacy.symbols import *
 from spacy.tokens import *
 
@@ -11,14 +13,21 @@ from posextract.verb_phrase import VerbPhrase, ADVCLVerbPhrase, ConjVerbPhrase,
 
 import re
 
-__DEP_MATCHER = None
+__DEP_MATCHERS = {}
 __NLP = None
+__PIPELINES = {}
+# Guards the lazily built globals above, so threads starting together do not each load the model.
+__LOCK = threading.RLock()
+
+DEFAULT_BATCH_SIZE = 1000
 
 
 def get_nlp():
     global __NLP
     if __NLP is None:
-        __NLP = spacy.load("en_core_web_sm")
+        with __LOCK:
+            if __NLP is None:
+                __NLP = spacy.load("en_core_web_sm")
     return __NLP
 
 
@@ -30,15 +39,88 @@ def disable_pipe(pipe_name):
     get_nlp().remove_pipe(pipe_name)
 
 
-def get_dep_matcher(nlp):
-    global __DEP_MATCHER
+# Components none of the extractors read from. They are always skipped while parsing.
+UNUSED_PIPES = ('ner', 'entity_ruler', 'entity_linker')
+LEMMA_PIPES = ('lemmatizer', )
+
+
+class PipelineVariant:
+    # A view of a loaded pipeline that skips some of its components and runs `after` on each Doc it produces,
+    # sharing the loaded model weights. The pipeline itself is never modified, so variants can be used side by side.
+    def __init__(self, nlp, disable: Sequence[str] = (), after: Sequence[Callable[[Doc], Doc]] = ()):
+        self.nlp = nlp
+        self.disable = [name for name in nlp.pipe_names if name in disable]
+        self.after = list(after)
+
+    @property
+    def vocab(self):
+        return self.nlp.vocab
+
+    @property
+    def meta(self):
+        return self.nlp.meta
+
+    @property
+    def pipe_names(self):
+        # The functions in `after` are named too, so parse caches keep their Docs apart.
+        return [name for name in self.nlp.pipe_names if name not in self.disable] + \
+               [function.__name__ for function in self.after]
+
+    @property
+    def parser(self) -> 'PipelineVariant':
+        # The same variant without `after`, whose Docs are what a parse cache stores.
+        if not self.after:
+            return self
+        return PipelineVariant(self.nlp, disable=self.disable)
+
+    def finish(self, doc: Doc) -> Doc:
+        for function in self.after:
+            doc = function(doc)
+        return doc
+
+    def __call__(self, text):
+        return self.finish(self.nlp(text, disable=self.disable))
+
+    def pipe(self, texts, as_tuples=False, batch_size=None):
+        docs = self.nlp.pipe(texts, as_tuples=as_tuples, batch_size=batch_size, disable=self.disable)
+        if not self.after:
+            return docs
+        if as_tuples:
+            return ((self.finish(doc), context) for doc, context in docs)
+        return (self.finish(doc) for doc in docs)
+
+
+def make_pipeline(nlp, lemmas: bool = True, noun_chunks: bool = False) -> PipelineVariant:
+    disable = UNUSED_PIPES if lemmas else UNUSED_PIPES + LEMMA_PIPES
+    after = (merge_noun_chunks, ) if noun_chunks else ()
+    return PipelineVariant(nlp, disable=disable, after=after)
+
+
+def get_pipeline(lemmas: bool = True, noun_chunks: bool = False) -> PipelineVariant:
+    # Variants of the default model are built once per combination of options and reused by every later call.
+    key = (lemmas, noun_chunks)
+    if key not in __PIPELINES:
+        with __LOCK:
+            if key not in __PIPELINES:
+                __PIPELINES[key] = make_pipeline(get_nlp(), lemmas=lemmas, noun_chunks=noun_chunks)
+    return __PIPELINES[key]
+
+
+def get_dep_matcher(nlp) -> DependencyMatcher:
+    # A matcher only works on Docs that share its vocab, so there is one per vocab. Anything with a `vocab`, such as
+    # a pipeline or a Doc, can be passed. Matching does not modify the matcher, so threads can share it.
+    vocab = nlp.vocab
+    matcher = __DEP_MATCHERS.get(id(vocab))
 
-    if __DEP_MATCHER is None:
-        matcher = DependencyMatcher(get_nlp().vocab)
-        add_verb_phrase_patterns(matcher)
-        __DEP_MATCHER = matcher
+    if matcher is None or matcher.vocab is not vocab:
+        with __LOCK:
+            matcher = __DEP_MATCHERS.get(id(vocab))
+            if matcher is None or matcher.vocab is not vocab:
+                matcher = DependencyMatcher(vocab)
+                add_verb_phrase_patterns(matcher)
+                __DEP_MATCHERS[id(vocab)] = matcher
 
-    return __DEP_MATCHER
+    return matcher
 
 
 def should_consider_verb_phrase(verb_phrase: VerbPhrase):
@@ -60,6 +142,7 @@ class TripleExtractorOptions(NamedTuple):
     prep_phrase: bool = False
     lemmatize: bool = False
     use_noun_chunks: bool = False
+    max_expansions: Optional[int] = None
 
 
 VERB_DEP_TAGS = {ccomp, relcl, xcomp, acl, advcl, pcomp, csubj, csubjpass, conj}
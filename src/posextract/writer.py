@@ -0,0 +1,227 @@
+import csv
+import dataclasses
+import operator
+import os
+from typing import Any, Iterable, List, Optional, Sequence
+
+DEFAULT_FLUSH_SIZE = 10000
+
+FSYNC_NONE = 'none'
+FSYNC_CLOSE = 'close'
+FSYNC_FLUSH = 'flush'
+FSYNC_POLICIES = (FSYNC_NONE, FSYNC_CLOSE, FSYNC_FLUSH)
+
+
+def record_fields(record_type) -> List[str]:
+    if dataclasses.is_dataclass(record_type):
+        return [field.name for field in dataclasses.fields(record_type)]
+    return list(record_type._fields)
+
+
+# Columns whose values repeat heavily across a corpus, dictionary-encoded by the columnar writers.
+DICTIONARY_COLUMNS = ('subject', 'verb', 'object', 'adjective', 'noun')
+
+PARQUET_EXTENSIONS = ('.parquet', '.pq')
+ARROW_EXTENSIONS = ('.arrow', '.feather')
+
+# The --output help of the extractor command lines.
+OUTPUT_HELP = ('an output path, whose extension chooses the format: .parquet or .pq for Parquet, which '
+               'dictionary-encodes the %s columns; .arrow or .feather for an Arrow IPC file, which is lz4-compressed '
+               'but not dictionary-encoded; anything else for delimited text' % ', '.join(DICTIONARY_COLUMNS))
+
+
+class RecordWriter:
+    # Buffers records as tuples of their field values and writes them out `flush_size` at a time. Subclasses open
+    # `self._file` and implement _write_rows, and _finish if the format has a footer.
+    def __init__(self, path: str, fieldnames: List[str], id_column: Optional[str] = None,
+                 flush_size: int = DEFAULT_FLUSH_SIZE, fsync: str = FSYNC_NONE):
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError('invalid fsync policy: %s (expected one of %s)' % (fsync, ', '.join(FSYNC_POLICIES)))
+
+        self.path = path
+        self.fieldnames = list(fieldnames)
+        self.id_column = id_column
+        self.flush_size = flush_size
+        self.fsync = fsync
+        self.record_count = 0
+
+        self._get_values = operator.attrgetter(*self.fieldnames)
+        self._buffer = []
+        self._file = None
+
+    @property
+    def columns(self) -> List[str]:
+        return self.fieldnames + [self.id_column] if self.id_column is not None else self.fieldnames
+
+    def write(self, records: Iterable[Any], row_id: Any = None):
+        # Records are only buffered per input row, so a flush never splits one row's extractions.
+        get_values = self._get_values
+
+        if self.id_column is None:
+            self._buffer.extend(get_values(record) for record in records)
+        else:
+            self._buffer.extend(get_values(record) + (row_id,) for record in records)
+
+        if len(self._buffer) >= self.flush_size:
+            self.flush()
+
+    def _write_rows(self, rows: List[tuple]):
+        raise NotImplementedError
+
+    def _finish(self):
+        pass
+
+    def flush(self):
+        if self._buffer:
+            self._write_rows(self._buffer)
+            self.record_count += len(self._buffer)
+            self._buffer.clear()
+
+        self._file.flush()
+
+        if self.fsync == FSYNC_FLUSH:
+            os.fsync(self._file.fileno())
+
+    def sync(self) -> int:
+        # Writes out everything buffered and fsyncs it, whatever the fsync policy, and returns the file's size.
+        self.flush()
+
+        if self.fsync != FSYNC_FLUSH:
+            os.fsync(self._file.fileno())
+
+        return os.fstat(self._file.fileno()).st_size
+
+    def close(self):
+        if self._file.closed:
+            return
+
+        self.flush()
+        self._finish()
+        self._file.flush()
+
+        if self.fsync == FSYNC_CLOSE:
+            os.fsync(self._file.fileno())
+
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class CSVWriter(RecordWriter):
+    # With `resume_at`, an existing file is cut back to that size, dropping anything written after it, and appended
+    # to without writing the header again.
+    def __init__(self, path: str, fieldnames: List[str], delimiter: str = ',', id_column: Optional[str] = None,
+                 flush_size: int = DEFAULT_FLUSH_SIZE, fsync: str = FSYNC_NONE, resume_at: Optional[int] = None):
+        super().__init__(path, fieldnames, id_column=id_column, flush_size=flush_size, fsync=fsync)
+
+        if resume_at is None:
+            self._file = open(path, 'w', newline='')
+        else:
+            self._file = _open_truncated(path, resume_at)
+
+        self._writer = csv.writer(self._file, delimiter=delimiter, lineterminator='\n')
+
+        if resume_at is None:
+            self._writer.writerow(self.columns)
+
+    def _write_rows(self, rows: List[tuple]):
+        self._writer.writerows(rows)
+
+
+def _open_truncated(path: str, size: int):
+    if not os.path.exists(path) or os.path.getsize(path) < size:
+        raise ValueError('cannot resume writing %s: it is missing or shorter than when it was checkpointed' % path)
+
+    f = open(path, 'r+', newline='')
+    f.truncate(size)
+    f.seek(0, os.SEEK_END)
+    return f
+
+
+def _id_value(value: Any) -> Optional[str]:
+    # Row ids are written as strings, as in the CSV output, whatever type pandas gave each chunk's index. Missing ids
+    # (NaN) are written as nulls.
+    if value is None or (isinstance(value, float) and value != value):
+        return None
+    return str(value)
+
+
+class ArrowWriter(RecordWriter):
+    # Writes each flush as an Arrow record batch, to an Arrow IPC (Feather v2) file or, with `parquet`, a Parquet
+    # file in row groups of at most `row_group_size` rows. All columns, the id column included, are strings, so the
+    # schema is fixed before the first batch. Parquet dictionary-encodes `dictionary_columns` within each row group;
+    # IPC files cannot change a dictionary between batches, so they are lz4-compressed instead. Requires pyarrow.
+    def __init__(self, path: str, fieldnames: List[str], id_column: Optional[str] = None,
+                 flush_size: int = DEFAULT_FLUSH_SIZE, fsync: str = FSYNC_NONE, parquet: bool = False,
+                 row_group_size: Optional[int] = None, dictionary_columns: Sequence[str] = DICTIONARY_COLUMNS):
+        try:
+            import pyarrow
+        except ImportError:
+            raise ImportError('writing %s requires pyarrow (pip install pyarrow)' % path) from None
+
+        super().__init__(path, fieldnames, id_column=id_column, flush_size=flush_size, fsync=fsync)
+
+        self.parquet = parquet
+        self.row_group_size = row_group_size
+        self._schema = pyarrow.schema([(name, pyarrow.string()) for name in self.columns])
+        self._file = open(path, 'wb')
+
+        if parquet:
+            import pyarrow.parquet
+            self._writer = pyarrow.parquet.ParquetWriter(
+                self._file, self._schema,
+                use_dictionary=[name for name in self.fieldnames if name in dictionary_columns])
+        else:
+            import pyarrow.ipc
+            compression = 'lz4' if pyarrow.Codec.is_available('lz4') else None
+            self._writer = pyarrow.ipc.new_file(self._file, self._schema,
+                                                options=pyarrow.ipc.IpcWriteOptions(compression=compression))
+
+    def _write_rows(self, rows: List[tuple]):
+        import pyarrow
+
+        columns = list(zip(*rows))
+
+        if self.id_column is not None:
+            columns[-1] = [_id_value(value) for value in columns[-1]]
+
+        arrays = [pyarrow.array(values, pyarrow.string()) for values in columns]
+        table = pyarrow.Table.from_arrays(arrays, schema=self._schema)
+
+        if self.parquet:
+            self._writer.write_table(table, row_group_size=self.row_group_size)
+        else:
+            self._writer.write_table(table, max_chunksize=self.row_group_size)
+
+    def _finish(self):
+        self._writer.close()
+
+
+def open_writer(path: str, fieldnames: List[str], delimiter: str = ',', id_column: Optional[str] = None,
+                flush_size: int = DEFAULT_FLUSH_SIZE, fsync: str = FSYNC_NONE,
+                row_group_size: Optional[int] = None, resume_at: Optional[int] = None) -> RecordWriter:
+    # Chooses the output format from the file extension: Parquet, Arrow IPC, or delimited text for anything else.
+    extension = os.path.splitext(path)[1].lower()
+
+    if extension in PARQUET_EXTENSIONS or extension in ARROW_EXTENSIONS:
+        if resume_at is not None:
+            raise ValueError('cannot resume writing %s: Parquet and Arrow files can not be appended to' % path)
+        return ArrowWriter(path, fieldnames, id_column=id_column, flush_size=flush_size, fsync=fsync,
+                           parquet=extension in PARQUET_EXTENSIONS, row_group_size=row_group_size)
+
+    return CSVWriter(path, fieldnames, delimiter=delimiter, id_column=id_column, flush_size=flush_size, fsync=fsync,
+                     resume_at=resume_at)
+
+
+def is_resumable(path: str) -> bool:
+    # Whether open_writer can resume writing to `path`, which only depends on its format.
+    extension = os.path.splitext(path)[1].lower()
+    return extension not in PARQUET_EXTENSIONS and extension not in ARROW_EXTENSIONS
+
+
+__all__ = ['RecordWriter', 'CSVWriter', 'ArrowWriter', 'open_writer', 'is_resumable', 'record_fields',
+           'DEFAULT_FLUSH_SIZE', 'FSYNC_POLICIES', 'DICTIONARY_COLUMNS', 'OUTPUT_HELP']
@@ -0,0 +1,182 @@
+import pytest
+import spacy
+from spacy.language import Language
+from spacy.tokens import Doc
+
+# Sentences parsed by hand, so the tests do not depend on a trained model: words, heads (token indices), deps, pos,
+# tags and lemmas.
+PARSES = {
+    'Landlords may exercise oppression.': (
+        ['Landlords', 'may', 'exercise', 'oppression', '.'],
+        [2, 2, 2, 2, 2],
+        ['nsubj', 'aux', 'ROOT', 'dobj', 'punct'],
+        ['NOUN', 'AUX', 'VERB', 'NOUN', 'PUNCT'],
+        ['NNS', 'MD', 'VB', 'NN', '.'],
+        ['landlord', 'may', 'exercise', 'oppression', '.']),
+    'The soldiers were ill.': (
+        ['The', 'soldiers', 'were', 'ill', '.'],
+        [1, 2, 2, 2, 2],
+        ['det', 'nsubj', 'ROOT', 'acomp', 'punct'],
+        ['DET', 'NOUN', 'AUX', 'ADJ', 'PUNCT'],
+        ['DT', 'NNS', 'VBD', 'JJ', '.'],
+        ['the', 'soldier', 'be', 'ill', '.']),
+    'I eat pizza, and salad, and smoothies.': (
+        ['I', 'eat', 'pizza', ',', 'and', 'salad', ',', 'and', 'smoothies', '.'],
+        [1, 1, 1, 2, 2, 2, 5, 5, 5, 1],
+        ['nsubj', 'ROOT', 'dobj', 'punct', 'cc', 'conj', 'punct', 'cc', 'conj', 'punct'],
+        ['PRON', 'VERB', 'NOUN', 'PUNCT', 'CCONJ', 'NOUN', 'PUNCT', 'CCONJ', 'NOUN', 'PUNCT'],
+        ['PRP', 'VBP', 'NN', ',', 'CC', 'NN', ',', 'CC', 'NNS', '.'],
+        ['I', 'eat', 'pizza', ',', 'and', 'salad', ',', 'and', 'smoothie', '.']),
+    'The farmers and the workers signed the petition.': (
+        ['The', 'farmers', 'and', 'the', 'workers', 'signed', 'the', 'petition', '.'],
+        [1, 5, 1, 4, 1, 5, 7, 5, 5],
+        ['det', 'nsubj', 'cc', 'det', 'conj', 'ROOT', 'det', 'dobj', 'punct'],
+        ['DET', 'NOUN', 'CCONJ', 'DET', 'NOUN', 'VERB', 'DET', 'NOUN', 'PUNCT'],
+        ['DT', 'NNS', 'CC', 'DT', 'NNS', 'VBD', 'DT', 'NN', '.'],
+        ['the', 'farmer', 'and', 'the', 'worker', 'sign', 'the', 'petition', '.']),
+    'The farmers and the workers signed the petition and the letter.': (
+        ['The', 'farmers', 'and', 'the', 'workers', 'signed', 'the', 'petition', 'and', 'the', 'letter', '.'],
+        [1, 5, 1, 4, 1, 5, 7, 5, 7, 10, 7, 5],
+        ['det', 'nsubj', 'cc', 'det', 'conj', 'ROOT', 'det', 'dobj', 'cc', 'det', 'conj', 'punct'],
+        ['DET', 'NOUN', 'CCONJ', 'DET', 'NOUN', 'VERB', 'DET', 'NOUN', 'CCONJ', 'DET', 'NOUN', 'PUNCT'],
+        ['DT', 'NNS', 'CC', 'DT', 'NNS', 'VBD', 'DT', 'NN', 'CC', 'DT', 'NN', '.'],
+        ['the', 'farmer', 'and', 'the', 'worker', 'sign', 'the', 'petition', 'and', 'the', 'letter', '.']),
+    'The soldiers were tired and hungry.': (
+        ['The', 'soldiers', 'were', 'tired', 'and', 'hungry', '.'],
+        [1, 2, 2, 2, 3, 3, 2],
+        ['det', 'nsubj', 'ROOT', 'acomp', 'cc', 'conj', 'punct'],
+        ['DET', 'NOUN', 'AUX', 'ADJ', 'CCONJ', 'ADJ', 'PUNCT'],
+        ['DT', 'NNS', 'VBD', 'JJ', 'CC', 'JJ', '.'],
+        ['the', 'soldier', 'be', 'tired', 'and', 'hungry', '.']),
+    'The poor weavers demanded higher wages.': (
+        ['The', 'poor', 'weavers', 'demanded', 'higher', 'wages', '.'],
+        [2, 2, 3, 3, 5, 3, 3],
+        ['det', 'amod', 'nsubj', 'ROOT', 'amod', 'dobj', 'punct'],
+        ['DET', 'ADJ', 'NOUN', 'VERB', 'ADJ', 'NOUN', 'PUNCT'],
+        ['DT', 'JJ', 'NNS', 'VBD', 'JJR', 'NNS', '.'],
+        ['the', 'poor', 'weaver', 'demand', 'high', 'wage', '.']),
+    # A document with a quote, and the fragments split_quotes makes of it.
+    'The angry minister said "the farmers signed the petition"': (
+        ['The', 'angry', 'minister', 'said', '"', 'the', 'farmers', 'signed', 'the', 'petition', '"'],
+        [2, 2, 3, 3, 7, 6, 7, 3, 9, 7, 7],
+        ['det', 'amod', 'nsubj', 'ROOT', 'punct', 'det', 'nsubj', 'ccomp', 'det', 'dobj', 'punct'],
+        ['DET', 'ADJ', 'NOUN', 'VERB', 'PUNCT', 'DET', 'NOUN', 'VERB', 'DET', 'NOUN', 'PUNCT'],
+        ['DT', 'JJ', 'NN', 'VBD', '``', 'DT', 'NNS', 'VBD', 'DT', 'NN', "''"],
+        ['the', 'angry', 'minister', 'say', '"', 'the', 'farmer', 'sign', 'the', 'petition', '"']),
+    'The angry minister said': (
+        ['The', 'angry', 'minister', 'said'],
+        [2, 2, 3, 3],
+        ['det', 'amod', 'nsubj', 'ROOT'],
+        ['DET', 'ADJ', 'NOUN', 'VERB'],
+        ['DT', 'JJ', 'NN', 'VBD'],
+        ['the', 'angry', 'minister', 'say']),
+    'the farmers signed the petition': (
+        ['the', 'farmers', 'signed', 'the', 'petition'],
+        [1, 2, 2, 4, 2],
+        ['det', 'nsubj', 'ROOT', 'det', 'dobj'],
+        ['DET', 'NOUN', 'VERB', 'DET', 'NOUN'],
+        ['DT', 'NNS', 'VBD', 'DT', 'NN'],
+        ['the', 'farmer', 'sign', 'the', 'petition']),
+    'The tenants did not pay their rent.': (
+        ['The', 'tenants', 'did', 'not', 'pay', 'their', 'rent', '.'],
+        [1, 4, 4, 4, 4, 6, 4, 4],
+        ['det', 'nsubj', 'aux', 'neg', 'ROOT', 'poss', 'dobj', 'punct'],
+        ['DET', 'NOUN', 'AUX', 'PART', 'VERB', 'PRON', 'NOUN', 'PUNCT'],
+        ['DT', 'NNS', 'VBD', 'RB', 'VB', 'PRP$', 'NN', '.'],
+        ['the', 'tenant', 'do', 'not', 'pay', 'their', 'rent', '.']),
+    'The company bought the land, the mills and the warehouses.': (
+        ['The', 'company', 'bought', 'the', 'land', ',', 'the', 'mills', 'and', 'the', 'warehouses', '.'],
+        [1, 2, 2, 4, 2, 4, 7, 4, 7, 10, 7, 2],
+        ['det', 'nsubj', 'ROOT', 'det', 'dobj', 'punct', 'det', 'conj', 'cc', 'det', 'conj', 'punct'],
+        ['DET', 'NOUN', 'VERB', 'DET', 'NOUN', 'PUNCT', 'DET', 'NOUN', 'CCONJ', 'DET', 'NOUN', 'PUNCT'],
+        ['DT', 'NN', 'VBD', 'DT', 'NN', ',', 'DT', 'NNS', 'CC', 'DT', 'NNS', '.'],
+        ['the', 'company', 'buy', 'the', 'land', ',', 'the', 'mill', 'and', 'the', 'warehouse', '.']),
+}
+
+# Clauses inside clauses, relative pronouns, a passive and a prepositional phrase. Some of their verbs have no
+# subject of their own.
+CLAUSE_PARSES = {
+    'The farmers wanted to sell their corn at the market.': (
+        ['The', 'farmers', 'wanted', 'to', 'sell', 'their', 'corn', 'at', 'the', 'market', '.'],
+        [1, 2, 2, 4, 2, 6, 4, 4, 9, 7, 2],
+        ['det', 'nsubj', 'ROOT', 'aux', 'xcomp', 'poss', 'dobj', 'prep', 'det', 'pobj', 'punct'],
+        ['DET', 'NOUN', 'VERB', 'PART', 'VERB', 'PRON', 'NOUN', 'ADP', 'DET', 'NOUN', 'PUNCT'],
+        ['DT', 'NNS', 'VBD', 'TO', 'VB', 'PRP$', 'NN', 'IN', 'DT', 'NN', '.'],
+        ['the', 'farmer', 'want', 'to', 'sell', 'their', 'corn', 'at', 'the', 'market', '.']),
+    'The landlords who owned the mills raised the rents.': (
+        ['The', 'landlords', 'who', 'owned', 'the', 'mills', 'raised', 'the', 'rents', '.'],
+        [1, 6, 3, 1, 5, 3, 6, 8, 6, 6],
+        ['det', 'nsubj', 'nsubj', 'relcl', 'det', 'dobj', 'ROOT', 'det', 'dobj', 'punct'],
+        ['DET', 'NOUN', 'PRON', 'VERB', 'DET', 'NOUN', 'VERB', 'DET', 'NOUN', 'PUNCT'],
+        ['DT', 'NNS', 'WP', 'VBD', 'DT', 'NNS', 'VBD', 'DT', 'NNS', '.'],
+        ['the', 'landlord', 'who', 'own', 'the', 'mill', 'raise', 'the', 'rent', '.']),
+    'The House passed the bill which protected the weavers.': (
+        ['The', 'House', 'passed', 'the', 'bill', 'which', 'protected', 'the', 'weavers', '.'],
+        [1, 2, 2, 4, 2, 6, 4, 8, 6, 2],
+        ['det', 'nsubj', 'ROOT', 'det', 'dobj', 'nsubj', 'relcl', 'det', 'dobj', 'punct'],
+        ['DET', 'PROPN', 'VERB', 'DET', 'NOUN', 'PRON', 'VERB', 'DET', 'NOUN', 'PUNCT'],
+        ['DT', 'NNP', 'VBD', 'DT', 'NN', 'WDT', 'VBD', 'DT', 'NNS', '.'],
+        ['the', 'House', 'pass', 'the', 'bill', 'which', 'protect', 'the', 'weaver', '.']),
+    'The minister said that the farmers would protest if the landlords raised the rents and refused to repair the '
+    'cottages.': (
+        ['The', 'minister', 'said', 'that', 'the', 'farmers', 'would', 'protest', 'if', 'the', 'landlords', 'raised',
+         'the', 'rents', 'and', 'refused', 'to', 'repair', 'the', 'cottages', '.'],
+        [1, 2, 2, 7, 5, 7, 7, 2, 11, 10, 11, 7, 13, 11, 11, 11, 17, 15, 19, 17, 2],
+        ['det', 'nsubj', 'ROOT', 'mark', 'det', 'nsubj', 'aux', 'ccomp', 'mark', 'det', 'nsubj', 'advcl', 'det',
+         'dobj', 'cc', 'conj', 'aux', 'xcomp', 'det', 'dobj', 'punct'],
+        ['DET', 'NOUN', 'VERB', 'SCONJ', 'DET', 'NOUN', 'AUX', 'VERB', 'SCONJ', 'DET', 'NOUN', 'VERB', 'DET', 'NOUN',
+         'CCONJ', 'VERB', 'PART', 'VERB', 'DET', 'NOUN', 'PUNCT'],
+        ['DT', 'NN', 'VBD', 'IN', 'DT', 'NNS', 'MD', 'VB', 'IN', 'DT', 'NNS', 'VBD', 'DT', 'NNS', 'CC', 'VBD', 'TO',
+         'VB', 'DT', 'NNS', '.'],
+        ['the', 'minister', 'say', 'that', 'the', 'farmer', 'would', 'protest', 'if', 'the', 'landlord', 'raise',
+         'the', 'rent', 'and', 'refuse', 'to', 'repair', 'the', 'cottage', '.']),
+    'No tenant paid rent to the landlord.': (
+        ['No', 'tenant', 'paid', 'rent', 'to', 'the', 'landlord', '.'],
+        [1, 2, 2, 2, 2, 6, 4, 2],
+        ['det', 'nsubj', 'ROOT', 'dobj', 'prep', 'det', 'pobj', 'punct'],
+        ['DET', 'NOUN', 'VERB', 'NOUN', 'ADP', 'DET', 'NOUN', 'PUNCT'],
+        ['DT', 'NN', 'VBD', 'NN', 'IN', 'DT', 'NN', '.'],
+        ['no', 'tenant', 'pay', 'rent', 'to', 'the', 'landlord', '.']),
+    'The petition was signed by the farmers.': (
+        ['The', 'petition', 'was', 'signed', 'by', 'the', 'farmers', '.'],
+        [1, 3, 3, 3, 3, 6, 4, 3],
+        ['det', 'nsubjpass', 'auxpass', 'ROOT', 'agent', 'det', 'pobj', 'punct'],
+        ['DET', 'NOUN', 'AUX', 'VERB', 'ADP', 'DET', 'NOUN', 'PUNCT'],
+        ['DT', 'NN', 'VBD', 'VBN', 'IN', 'DT', 'NNS', '.'],
+        ['the', 'petition', 'be', 'sign', 'by', 'the', 'farmer', '.']),
+}
+PARSES.update(CLAUSE_PARSES)
+
+
+def make_doc(vocab, text: str) -> Doc:
+    # Fragments split from around a quote keep the space before it.
+    words, heads, deps, pos, tags, lemmas = PARSES[text.rstrip(' ')]
+    spaces = []
+    end = 0
+    for word in words:
+        end = text.index(word, end) + len(word)
+        spaces.append(text[end:end + 1] == ' ')
+    return Doc(vocab, words=words, spaces=spaces, heads=heads, deps=deps, pos=pos, tags=tags, lemmas=lemmas)
+
+
+# Stands in for a trained tagger and parser: replaces each Doc with its hand-made parse.
+@Language.component('hand_parser')
+def hand_parser(doc: Doc) -> Doc:
+    if not doc.text:
+        return doc
+    parsed = make_doc(doc.vocab, doc.text)
+    # The context nlp.pipe(..., as_tuples=True) passes along with each Doc.
+    parsed._context = doc._context
+    return parsed
+
+
+@pytest.fixture(scope='session')
+def nlp():
+    nlp = spacy.blank('en')
+    nlp.add_pipe('hand_parser')
+    return nlp
+
+
+@pytest.fixture
+def parse(nlp):
+    return lambda text: make_doc(nlp.vocab, text)
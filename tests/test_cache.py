@@ -0,0 +1,185 @@
+import os
+import pickle
+import threading
+
+import pytest
+import spacy
+from spacy.language import Language
+
+from conftest import PARSES
+from posextract.cache import ParseCache, pipe_docs
+from posextract.util import PipelineVariant, make_pipeline
+
+TEXTS = list(PARSES)
+
+# The texts parsed by the `counting_nlp` pipeline.
+PARSED = []
+
+
+@Language.component('record_parse')
+def record_parse(doc):
+    PARSED.append(doc.text)
+    return doc
+
+
+@pytest.fixture
+def counting_nlp():
+    nlp = spacy.blank('en')
+    nlp.add_pipe('hand_parser')
+    nlp.add_pipe('record_parse')
+    PARSED.clear()
+    return nlp
+
+
+def annotations(doc):
+    return [(token.text, token.dep_, token.head.i, token.pos_, token.lemma_) for token in doc]
+
+
+def pipe(cache, nlp, texts):
+    return [(annotations(doc), context) for doc, context in cache.pipe(nlp, ((text, i) for i, text in enumerate(texts)),
+                                                                         batch_size=3)]
+
+
+def expected(nlp, texts):
+    return [(annotations(nlp(text)), i) for i, text in enumerate(texts)]
+
+
+def test_misses_then_hits(counting_nlp, tmp_path):
+    parses = expected(counting_nlp, TEXTS)
+    PARSED.clear()
+
+    with ParseCache(str(tmp_path), segment_size=2) as cache:
+        assert pipe(cache, counting_nlp, TEXTS) == parses
+        assert (cache.hits, cache.misses) == (0, len(TEXTS))
+
+        assert pipe(cache, counting_nlp, TEXTS) == parses
+        assert (cache.hits, cache.misses) == (len(TEXTS), len(TEXTS))
+
+    assert PARSED == TEXTS
+
+
+def test_repeated_texts_are_parsed_once(counting_nlp, tmp_path):
+    # The first batch of three parses its two texts once each; the second finds both among the Docs parsed but not
+    # yet flushed to a segment.
+    texts = [TEXTS[0], TEXTS[1], TEXTS[0], TEXTS[1], TEXTS[0]]
+    parses = expected(counting_nlp, texts)
+    PARSED.clear()
+
+    with ParseCache(str(tmp_path)) as cache:
+        assert pipe(cache, counting_nlp, texts) == parses
+        assert (cache.hits, cache.misses) == (3, 2)
+        assert os.listdir(str(tmp_path / 'segments')) == []
+
+    assert PARSED == TEXTS[:2]
+
+
+@pytest.mark.parametrize('flushed', [False, True])
+@pytest.mark.parametrize('noun_chunks', [False, True])
+def test_changes_to_returned_docs_do_not_reach_the_cache(flushed, noun_chunks, counting_nlp, tmp_path):
+    nlp = make_pipeline(counting_nlp, noun_chunks=noun_chunks)
+    text = TEXTS[0]
+    parse = annotations(nlp(text))
+
+    with ParseCache(str(tmp_path)) as cache:
+        docs = [doc for doc, _ in cache.pipe(nlp, [(text, 0), (text, 1)])]
+        if flushed:
+            cache.flush()
+
+        for doc in docs + [doc for doc, _ in cache.pipe(nlp, [(text, 2)])] + [cache.get(nlp, text)]:
+            assert annotations(doc) == parse
+            doc[0].lemma_ = 'changed'
+            doc.user_data['changed'] = True
+
+        for doc in [doc for doc, _ in cache.pipe(nlp, [(text, 3)])] + [cache.get(nlp, text)]:
+            assert annotations(doc) == parse
+            assert 'changed' not in doc.user_data
+
+
+def test_cache_persists(counting_nlp, tmp_path):
+    with ParseCache(str(tmp_path), segment_size=2) as cache:
+        pipe(cache, counting_nlp, TEXTS)
+
+    assert len(os.listdir(str(tmp_path / 'segments'))) == (len(TEXTS) + 1) // 2
+
+    parses = expected(counting_nlp, TEXTS)
+    PARSED.clear()
+
+    with ParseCache(str(tmp_path), segment_size=2, max_loaded_segments=1) as cache:
+        assert pipe(cache, counting_nlp, TEXTS) == parses
+        assert (cache.hits, cache.misses) == (len(TEXTS), 0)
+
+        assert annotations(cache.get(counting_nlp, TEXTS[2])) == parses[2][0]
+        assert cache.get(counting_nlp, 'Not a cached sentence.') is None
+
+    assert PARSED == []
+
+
+def test_pipelines_are_cached_apart(counting_nlp, tmp_path):
+    variant = PipelineVariant(counting_nlp, disable=['record_parse'])
+
+    with ParseCache(str(tmp_path)) as cache:
+        pipe(cache, counting_nlp, TEXTS)
+        pipe(cache, variant, TEXTS)
+        assert (cache.hits, cache.misses) == (0, 2 * len(TEXTS))
+
+
+def test_noun_chunk_variants_share_parses(counting_nlp, tmp_path):
+    plain = make_pipeline(counting_nlp)
+    merged = make_pipeline(counting_nlp, noun_chunks=True)
+    text = 'The farmers and the workers signed the petition.'
+    plain_parses, merged_parses = expected(plain, TEXTS), expected(merged, TEXTS)
+    PARSED.clear()
+
+    with ParseCache(str(tmp_path)) as cache:
+        assert pipe(cache, plain, TEXTS) == plain_parses
+
+        # merge_noun_chunks is applied to a copy of each cached Doc.
+        assert pipe(cache, merged, TEXTS) == merged_parses
+        assert (cache.hits, cache.misses) == (len(TEXTS), len(TEXTS))
+        assert [token.text for token in cache.get(merged, text)] == ['The farmers', 'and', 'the workers', 'signed',
+                                                                     'the petition', '.']
+
+        # The cached Docs themselves stay unmerged.
+        assert pipe(cache, plain, TEXTS) == plain_parses
+        assert len(cache.get(plain, text)) == 9
+
+    assert PARSED == TEXTS
+
+
+def test_threads_share_a_cache(counting_nlp, tmp_path):
+    texts = TEXTS * 20
+    errors = []
+    results = []
+
+    def work():
+        try:
+            results.append(pipe(cache, counting_nlp, texts))
+        except Exception as e:
+            errors.append(e)
+
+    with ParseCache(str(tmp_path), segment_size=5) as cache:
+        threads = [threading.Thread(target=work) for _ in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert errors == []
+        assert results == [expected(counting_nlp, texts)] * 6
+        assert cache.hits + cache.misses == len(texts) * 6
+
+
+def test_pickled_cache_opens_the_same_directory(counting_nlp, tmp_path):
+    with ParseCache(str(tmp_path)) as cache:
+        pipe(cache, counting_nlp, TEXTS)
+
+    copied = pickle.loads(pickle.dumps(cache))
+    assert copied.directory == cache.directory
+    assert pipe(copied, counting_nlp, TEXTS) == expected(counting_nlp, TEXTS)
+    assert (copied.hits, copied.misses) == (len(TEXTS), 0)
+    copied.close()
+
+
+def test_pipe_docs_without_cache(counting_nlp):
+    docs = pipe_docs(counting_nlp, ((text, i) for i, text in enumerate(TEXTS)))
+    assert [(annotations(doc), i) for doc, i in docs] == expected(counting_nlp, TEXTS)
@@ -0,0 +1,178 @@
+import argparse
+import json
+import os
+
+import pytest
+
+from conftest import PARSES
+from posextract.checkpoint import CorpusCheckpoint, checkpoint_from_args, run_settings
+from posextract.grammatical_triples import TripleExtractor
+from posextract.triple_extraction import TripleExtractionFlattened
+from posextract.writer import CSVWriter, record_fields
+
+FIELDS = record_fields(TripleExtractionFlattened)
+
+ROWS = [('row%d' % i, text) for i, text in enumerate(list(PARSES) * 3)]
+
+SETTINGS = {'input': 'corpus.csv', 'output': 'out.csv'}
+
+
+class Interrupted(Exception):
+    pass
+
+
+def run(extractor, output, checkpoint_path, resume=False, stop_after=None, extracted=None):
+    # A corpus run as the CLIs do it. With `stop_after`, it dies after that many rows, leaving behind what a killed
+    # process would: the rows flushed since the last checkpoint and a partly written line.
+    checkpoint = CorpusCheckpoint(checkpoint_path, SETTINGS, interval=3)
+    if resume:
+        checkpoint.load()
+
+    def results():
+        for row_id, text in checkpoint.track(ROWS):
+            if extracted is not None:
+                extracted.append(row_id)
+            yield row_id, extractor.extract_doc(extractor.nlp(text))
+
+    writer = CSVWriter(output, FIELDS, id_column='id', flush_size=4, resume_at=checkpoint.resume_at(output))
+
+    for count, (row_id, records) in enumerate(checkpoint.commit(results(), [writer])):
+        if count == stop_after:
+            writer.flush()
+            writer._file.write('farmers,sig')
+            writer._file.close()
+            raise Interrupted
+
+        writer.write(records, row_id)
+
+    checkpoint.save([writer])
+    writer.close()
+
+
+@pytest.fixture
+def extractor(nlp):
+    return TripleExtractor(nlp=nlp)
+
+
+@pytest.fixture
+def expected(extractor, tmp_path):
+    path = str(tmp_path / 'expected.csv')
+    run(extractor, path, str(tmp_path / 'expected.checkpoint'))
+    with open(path) as f:
+        return f.read()
+
+
+@pytest.mark.parametrize('stops', [[0], [1], [5], [7], [len(ROWS) - 1], [4, 2, 6]])
+def test_resume_gives_identical_output(stops, extractor, expected, tmp_path):
+    output = str(tmp_path / 'out.csv')
+    checkpoint_path = str(tmp_path / 'out.checkpoint')
+    extracted = []
+
+    for i, stop_after in enumerate(stops):
+        with pytest.raises(Interrupted):
+            run(extractor, output, checkpoint_path, resume=i > 0, stop_after=stop_after, extracted=extracted)
+
+    run(extractor, output, checkpoint_path, resume=True, extracted=extracted)
+
+    with open(output) as f:
+        assert f.read() == expected
+
+    # Only the rows after each interruption's last checkpoint are extracted again.
+    assert len(extracted) <= len(ROWS) + 3 * len(stops)
+
+
+def test_finished_run_resumes_with_nothing_to_do(extractor, expected, tmp_path):
+    output = str(tmp_path / 'out.csv')
+    checkpoint_path = str(tmp_path / 'out.checkpoint')
+    extracted = []
+
+    run(extractor, output, checkpoint_path)
+    run(extractor, output, checkpoint_path, resume=True, extracted=extracted)
+
+    assert extracted == []
+    with open(output) as f:
+        assert f.read() == expected
+
+
+def test_checkpoint_records_offset_and_sizes(extractor, tmp_path):
+    output = str(tmp_path / 'out.csv')
+    checkpoint_path = str(tmp_path / 'out.checkpoint')
+
+    with pytest.raises(Interrupted):
+        run(extractor, output, checkpoint_path, stop_after=7)
+
+    with open(checkpoint_path) as f:
+        state = json.load(f)
+
+    assert state['offset'] == 6
+    assert state['settings'] == SETTINGS
+    assert set(state['sizes']) == {output}
+    assert state['sizes'][output] < os.path.getsize(output)
+    assert not os.path.exists(checkpoint_path + '.tmp')
+
+
+def test_load_rejects_other_settings(tmp_path):
+    path = str(tmp_path / 'run.checkpoint')
+    CorpusCheckpoint(path, SETTINGS).save([])
+
+    assert CorpusCheckpoint(path, SETTINGS).load()
+    assert not CorpusCheckpoint(str(tmp_path / 'missing.checkpoint'), SETTINGS).load()
+
+    with pytest.raises(ValueError):
+        CorpusCheckpoint(path, dict(SETTINGS, output='other.csv')).load()
+
+
+def test_resume_at_unknown_output(tmp_path):
+    path = str(tmp_path / 'run.checkpoint')
+    checkpoint = CorpusCheckpoint(path, SETTINGS)
+    assert checkpoint.resume_at('out.csv') is None
+
+    checkpoint.save([])
+    with pytest.raises(ValueError):
+        checkpoint.resume_at('out.csv')
+
+
+def arguments(tmp_path, **kwargs):
+    values = dict(input='corpus.csv', output=str(tmp_path / 'out.csv'), checkpoint=str(tmp_path / 'run.checkpoint'),
+                  checkpoint_interval=3, resume=False, jobs=1, verbose=False)
+    values.update(kwargs)
+    return argparse.Namespace(**values)
+
+
+def test_run_settings_ignore_resumable_arguments(tmp_path):
+    args = arguments(tmp_path)
+    assert run_settings(args) == run_settings(arguments(tmp_path, jobs=4, resume=True, checkpoint_interval=10))
+    assert run_settings(args) != run_settings(arguments(tmp_path, input='other.csv'))
+
+
+def test_checkpoint_from_args(tmp_path):
+    assert checkpoint_from_args(arguments(tmp_path, checkpoint=None), []) is None
+
+    with pytest.raises(ValueError):
+        checkpoint_from_args(arguments(tmp_path, checkpoint=None, resume=True), [])
+
+    with pytest.raises(ValueError):
+        checkpoint_from_args(arguments(tmp_path), [str(tmp_path / 'out.parquet')])
+
+    # Starting over removes an older checkpoint.
+    args = arguments(tmp_path)
+    CorpusCheckpoint(args.checkpoint, run_settings(args)).save([])
+    assert checkpoint_from_args(args, [args.output]).offset == 0
+    assert not os.path.exists(args.checkpoint)
+
+
+def test_checkpoint_from_args_checks_outputs(tmp_path):
+    args = arguments(tmp_path, resume=True)
+
+    with CSVWriter(args.output, FIELDS) as writer:
+        checkpoint = CorpusCheckpoint(args.checkpoint, run_settings(args))
+        writer.write([TripleExtractionFlattened(subject='farmers', verb='signed', object='petition')])
+        checkpoint.save([writer])
+
+    assert checkpoint_from_args(args, [args.output]).sizes == {args.output: os.path.getsize(args.output)}
+
+    with open(args.output, 'r+') as f:
+        f.truncate(4)
+
+    with pytest.raises(ValueError):
+        checkpoint_from_args(args, [args.output])
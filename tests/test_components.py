@@ -0,0 +1,55 @@
+import dataclasses
+
+import pytest
+import spacy
+from spacy.tokens import DocBin
+
+import posextract.components  # noqa: F401 (registers the components)
+from conftest import CLAUSE_PARSES, PARSES
+from posextract import adj_noun_pairs, subj_verb_pairs
+from posextract.grammatical_triples import extract_one
+from posextract.util import TripleExtractorOptions, get_dep_matcher
+
+# subj_verb_pairs.rule cannot pair a verb that has no subject of its own.
+TEXTS = [text for text in PARSES if text not in CLAUSE_PARSES]
+
+EXTENSIONS = ('triples', 'adj_noun_pairs', 'subj_verb_pairs')
+
+
+@pytest.fixture
+def component_nlp():
+    nlp = spacy.blank('en')
+    nlp.add_pipe('hand_parser')
+    nlp.add_pipe('posextract_triples', config={'add_auxiliary': True, 'lemmatize': True})
+    nlp.add_pipe('posextract_adj_noun')
+    nlp.add_pipe('posextract_subj_verb', config={'letter_case': 'lower'})
+    return nlp
+
+
+def test_components_match_the_extractors(component_nlp, parse):
+    options = TripleExtractorOptions(add_auxiliary=True, lemmatize=True)
+
+    for text in TEXTS:
+        doc = component_nlp(text)
+        assert doc._.triples == tuple(dataclasses.asdict(triple) for triple in extract_one(parse(text), options,
+                                                                                            flatten=True))
+        assert doc._.adj_noun_pairs == tuple(pair._asdict() for pair in adj_noun_pairs.rule(parse(text)))
+        assert doc._.subj_verb_pairs == tuple(pair._asdict() for pair in subj_verb_pairs.rule(parse(text),
+                                                                                              letter_case='lower'))
+
+    assert any(component_nlp(text)._.triples for text in TEXTS)
+
+
+def test_extractions_survive_a_docbin(component_nlp):
+    docs = list(component_nlp.pipe(TEXTS))
+    doc_bin = DocBin(store_user_data=True, docs=docs)
+
+    restored = list(DocBin().from_bytes(doc_bin.to_bytes()).get_docs(spacy.blank('en').vocab))
+
+    assert [doc.text for doc in restored] == TEXTS
+    for extension in EXTENSIONS:
+        assert [doc._.get(extension) for doc in restored] == [doc._.get(extension) for doc in docs]
+
+
+def test_triples_component_shares_the_dep_matcher(component_nlp):
+    assert component_nlp.get_pipe('posextract_triples').dep_matcher is get_dep_matcher(component_nlp)
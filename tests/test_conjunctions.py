@@ -0,0 +1,56 @@
+import pytest
+
+from posextract.docview import DocView
+from posextract.grammatical_triples import extract_one, find_triples, post_process_conj_triples
+from posextract.util import TripleExtractorOptions
+
+CROSS_PRODUCT = 'The farmers and the workers signed the petition and the letter.'
+
+
+def extract_strings(doc, **options):
+    return [str(triple) for triple in extract_one(doc, TripleExtractorOptions(**options), flatten=True)]
+
+
+def expand(doc, max_expansions=None):
+    view = DocView(doc)
+    triples = find_triples(doc, view, TripleExtractorOptions())
+    return [(doc[triple.subject].text, doc[triple.object].text)
+            for triple in post_process_conj_triples(triples, view, max_expansions=max_expansions)]
+
+
+@pytest.mark.parametrize('text,expected', [
+    ('I eat pizza, and salad, and smoothies.', ['I eat pizza', 'I eat salad', 'I eat smoothies']),
+    ('The farmers and the workers signed the petition.', ['farmers signed petition', 'workers signed petition']),
+    ('The company bought the land, the mills and the warehouses.',
+     ['company bought land', 'company bought mills', 'company bought warehouses']),
+    (CROSS_PRODUCT, ['farmers signed petition', 'workers signed petition', 'farmers signed letter',
+                     'workers signed letter']),
+    ('The soldiers were tired and hungry.', ['soldiers were tired', 'soldiers were hungry']),
+])
+def test_conjuncts_are_expanded(text, expected, parse):
+    assert extract_strings(parse(text)) == expected
+
+
+def test_each_state_is_expanded_once(parse):
+    # Both orders of expanding the subject and the object reach (workers, letter), which is only added once.
+    assert expand(parse(CROSS_PRODUCT)) == [('farmers', 'petition'), ('workers', 'petition'), ('farmers', 'letter'),
+                                            ('workers', 'letter')]
+
+
+def test_triples_without_conjuncts_are_unchanged(parse):
+    doc = parse('Landlords may exercise oppression.')
+    assert expand(doc) == [('Landlords', 'oppression')]
+
+
+@pytest.mark.parametrize('max_expansions', [0, 1, 2, 3, 10])
+def test_max_expansions_caps_added_triples(max_expansions, parse):
+    doc = parse(CROSS_PRODUCT)
+    expanded = expand(doc)
+
+    # The cap keeps the breadth-first order, so a capped run is a prefix of the full one.
+    assert expand(doc, max_expansions=max_expansions) == expanded[:1 + max_expansions]
+    assert extract_strings(doc, max_expansions=max_expansions) == extract_strings(doc)[:1 + max_expansions]
+
+
+def test_max_expansions_counts_adjective_conjuncts(parse):
+    assert extract_strings(parse('The soldiers were tired and hungry.'), max_expansions=0) == ['soldiers were tired']
@@ -0,0 +1,32 @@
+import pandas as pd
+import pytest
+
+from posextract.corpus import read_corpus
+
+TEXTS = ['The soldiers were ill.', '', 'I eat pizza, and salad, and smoothies.', 'He said "no"', '',
+         'The tenants did not pay their rent.', 'Landlords may exercise oppression.']
+
+
+@pytest.fixture(params=[',', '|'])
+def corpus(request, tmp_path):
+    # 23 rows, some without text, with an id column that is not in row order and a column that is not read.
+    frame = pd.DataFrame({'other': range(23), 'text': [TEXTS[i % len(TEXTS)] for i in range(23)],
+                          'id': ['row-%d' % (i * 5 % 23) for i in range(23)]})
+    path = str(tmp_path / 'corpus.csv')
+    frame.to_csv(path, sep=request.param, index=False)
+    return path, request.param
+
+
+@pytest.mark.parametrize('id_column', [None, 'id'])
+@pytest.mark.parametrize('chunksize', [1, 5, 23, 100])
+def test_read_corpus_matches_read_csv(id_column, chunksize, corpus):
+    path, delimiter = corpus
+    usecols = ['text'] if id_column is None else ['text', id_column]
+    frame = pd.read_csv(path, index_col=id_column, usecols=usecols, delimiter=delimiter)
+    assert frame['text'].isna().sum() == 7
+
+    rows = list(read_corpus(path, 'text', id_column=id_column, delimiter=delimiter, chunksize=chunksize))
+
+    assert [row_id for row_id, _ in rows] == list(frame.index)
+    assert [text for _, text in rows] == [text if isinstance(text, str) else '' for text in frame['text']]
+    assert [text for _, text in rows][:len(TEXTS)] == TEXTS
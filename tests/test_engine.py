@@ -0,0 +1,26 @@
+import pytest
+
+from conftest import CLAUSE_PARSES, PARSES
+from posextract.engine import EXTRACTORS, extract_corpus
+
+# subj_verb_pairs.rule cannot pair a verb that has no subject of its own.
+TEXTS = [text for text in PARSES if text not in CLAUSE_PARSES] + ['']
+
+ROWS = [('row-%d' % i, TEXTS[(i * 7) % len(TEXTS)]) for i in range(200)]
+
+
+@pytest.mark.parametrize('kind', list(EXTRACTORS))
+def test_jobs_match_a_single_process(kind, nlp):
+    expected = list(extract_corpus(kind, ROWS, nlp=nlp))
+    assert [row_id for row_id, _ in expected] == [row_id for row_id, _ in ROWS]
+    assert any(extractions for _, extractions in expected)
+
+    assert list(extract_corpus(kind, iter(ROWS), jobs=3, shard_size=7, nlp=nlp)) == expected
+
+
+def test_worker_errors_reach_the_caller(nlp):
+    # The hand parser only knows the sentences in PARSES.
+    rows = ROWS[:50] + [('unparsed', 'A sentence nobody parsed.')] + ROWS[50:]
+
+    with pytest.raises(KeyError, match='A sentence nobody parsed.'):
+        list(extract_corpus('triples', rows, jobs=3, shard_size=7, nlp=nlp))
@@ -0,0 +1,243 @@
+import pytest
+
+from conftest import PARSES
+from posextract.grammatical_triples import extract_one
+from posextract.util import TripleExtractorOptions
+
+# What extract_one(..., flatten=True) gave for each hand-parsed sentence before extraction worked on token indices
+# (DocView/ViewVerb), kept here so later changes to the traversal and post-processing can be checked against it.
+# Each triple is given by its non-empty fields, other than its rule.
+
+NESTED = ('The minister said that the farmers would protest if the landlords raised the rents and refused to repair '
+          'the cottages.')
+
+DEFAULT = {
+    'Landlords may exercise oppression.': [
+        {'subject': 'Landlords', 'verb': 'exercise', 'object': 'oppression'},
+    ],
+    'The soldiers were ill.': [
+        {'subject': 'soldiers', 'verb': 'were', 'object': 'ill'},
+    ],
+    'I eat pizza, and salad, and smoothies.': [
+        {'subject': 'I', 'verb': 'eat', 'object': 'pizza'},
+        {'subject': 'I', 'verb': 'eat', 'object': 'salad'},
+        {'subject': 'I', 'verb': 'eat', 'object': 'smoothies'},
+    ],
+    'The farmers and the workers signed the petition.': [
+        {'subject': 'farmers', 'verb': 'signed', 'object': 'petition'},
+        {'subject': 'workers', 'verb': 'signed', 'object': 'petition'},
+    ],
+    'The farmers and the workers signed the petition and the letter.': [
+        {'subject': 'farmers', 'verb': 'signed', 'object': 'petition'},
+        {'subject': 'workers', 'verb': 'signed', 'object': 'petition'},
+        {'subject': 'farmers', 'verb': 'signed', 'object': 'letter'},
+        {'subject': 'workers', 'verb': 'signed', 'object': 'letter'},
+    ],
+    'The soldiers were tired and hungry.': [
+        {'subject': 'soldiers', 'verb': 'were', 'object': 'tired'},
+        {'subject': 'soldiers', 'verb': 'were', 'object': 'hungry'},
+    ],
+    'The poor weavers demanded higher wages.': [
+        {'subject': 'weavers', 'verb': 'demanded', 'object': 'wages'},
+    ],
+    'The angry minister said "the farmers signed the petition"': [
+        {'subject': 'farmers', 'verb': 'signed', 'object': 'petition'},
+        {'subject': 'minister', 'verb': 'said', 'object': 'petition'},
+    ],
+    'The angry minister said': [
+    ],
+    'the farmers signed the petition': [
+        {'subject': 'farmers', 'verb': 'signed', 'object': 'petition'},
+    ],
+    'The tenants did not pay their rent.': [
+        {'subject': 'tenants', 'neg_adverb': 'not', 'verb': 'pay', 'object': 'rent'},
+    ],
+    'The company bought the land, the mills and the warehouses.': [
+        {'subject': 'company', 'verb': 'bought', 'object': 'land'},
+        {'subject': 'company', 'verb': 'bought', 'object': 'mills'},
+        {'subject': 'company', 'verb': 'bought', 'object': 'warehouses'},
+    ],
+    'The farmers wanted to sell their corn at the market.': [
+        {'subject': 'farmers', 'verb': 'sell', 'poa': 'at', 'object': 'market'},
+        {'subject': 'farmers', 'verb': 'sell', 'object': 'corn'},
+    ],
+    'The landlords who owned the mills raised the rents.': [
+        {'subject': 'landlords', 'verb': 'raised', 'object': 'rents'},
+        {'subject': 'landlords', 'verb': 'owned', 'object': 'mills'},
+        {'subject': 'landlords', 'verb': 'owned', 'object': 'mills'},
+    ],
+    'The House passed the bill which protected the weavers.': [
+        {'subject': 'House', 'verb': 'passed', 'object': 'bill'},
+        {'subject': 'which', 'verb': 'protected', 'object': 'weavers'},
+    ],
+    NESTED: [
+        {'subject': 'landlords', 'verb': 'raised', 'object': 'rents'},
+    ],
+    'No tenant paid rent to the landlord.': [
+        {'subject_negdet': 'No', 'subject': 'tenant', 'verb': 'paid', 'poa': 'to', 'object': 'landlord'},
+        {'subject_negdet': 'No', 'subject': 'tenant', 'verb': 'paid', 'object': 'rent'},
+    ],
+    'The petition was signed by the farmers.': [
+        {'subject': 'petition', 'verb': 'signed', 'poa': 'by', 'object': 'farmers'},
+    ],
+}
+
+POST_PROCESSED = {
+    'Landlords may exercise oppression.': [
+        {'subject': 'Landlords', 'aux_verb': 'may', 'verb': 'exercise', 'object': 'oppression'},
+    ],
+    'The soldiers were ill.': [
+        {'subject': 'soldiers', 'verb': 'were', 'object': 'ill'},
+    ],
+    'I eat pizza, and salad, and smoothies.': [
+        {'subject': 'I', 'verb': 'eat', 'object': 'salad'},
+        {'subject': 'I', 'verb': 'eat', 'object': 'smoothies'},
+        {'subject': 'I', 'verb': 'eat', 'object_adjectives': '[]', 'object': 'pizza'},
+    ],
+    'The farmers and the workers signed the petition.': [
+        {'subject': 'farmers', 'verb': 'signed', 'object': 'petition'},
+        {'subject': 'workers', 'verb': 'signed', 'object': 'petition'},
+    ],
+    'The farmers and the workers signed the petition and the letter.': [
+        {'subject': 'farmers', 'verb': 'signed', 'object': 'letter'},
+        {'subject': 'farmers', 'verb': 'signed', 'object_adjectives': '[]', 'object': 'petition'},
+        {'subject': 'workers', 'verb': 'signed', 'object': 'letter'},
+        {'subject': 'workers', 'verb': 'signed', 'object_adjectives': '[]', 'object': 'petition'},
+    ],
+    'The soldiers were tired and hungry.': [
+        {'subject': 'soldiers', 'verb': 'were', 'object': 'hungry'},
+        {'subject': 'soldiers', 'verb': 'were', 'object_adjectives': '[]', 'object': 'tired'},
+    ],
+    'The poor weavers demanded higher wages.': [
+        {'subject': 'weavers', 'verb': 'demanded', 'object': 'wages'},
+    ],
+    'The angry minister said "the farmers signed the petition"': [
+        {'subject': 'farmers', 'verb': 'signed', 'object': 'petition'},
+    ],
+    'The angry minister said': [
+    ],
+    'the farmers signed the petition': [
+        {'subject': 'farmers', 'verb': 'signed', 'object': 'petition'},
+    ],
+    'The tenants did not pay their rent.': [
+        {'subject': 'tenants', 'neg_adverb': 'not', 'aux_verb': 'did', 'verb': 'pay', 'object': 'rent'},
+    ],
+    'The company bought the land, the mills and the warehouses.': [
+        {'subject': 'company', 'verb': 'bought', 'object': 'mills'},
+        {'subject': 'company', 'verb': 'bought', 'object': 'warehouses'},
+        {'subject': 'company', 'verb': 'bought', 'object_adjectives': '[]', 'object': 'land'},
+    ],
+    'The farmers wanted to sell their corn at the market.': [
+        {'subject': 'farmers', 'aux_verb': 'to', 'verb': 'sell', 'object': 'corn'},
+        {'subject': 'farmers', 'aux_verb': 'to', 'verb': 'sell', 'poa': 'at', 'object_adjectives': '[]',
+         'object': 'market'},
+    ],
+    'The landlords who owned the mills raised the rents.': [
+        {'subject': 'landlords', 'verb': 'raised', 'object': 'rents'},
+        {'subject': 'landlords', 'verb': 'owned', 'object': 'mills'},
+        {'subject': 'landlords', 'verb': 'owned', 'object': 'mills'},
+    ],
+    'The House passed the bill which protected the weavers.': [
+        {'subject': 'House', 'verb': 'passed', 'object': 'bill'},
+        {'subject': 'which', 'verb': 'protected', 'object': 'weavers'},
+    ],
+    NESTED: [
+        {'subject': 'landlords', 'verb': 'raised', 'object': 'rents'},
+    ],
+    'No tenant paid rent to the landlord.': [
+        {'subject_negdet': 'No', 'subject': 'tenant', 'verb': 'paid', 'object': 'rent'},
+        {'subject_negdet': 'No', 'subject': 'tenant', 'verb': 'paid', 'poa': 'to', 'object_adjectives': '[]',
+         'object': 'landlord'},
+    ],
+    'The petition was signed by the farmers.': [
+        {'subject': 'petition', 'verb': 'signed', 'poa': 'by', 'object': 'farmers'},
+    ],
+}
+
+LEMMATIZED = {
+    'Landlords may exercise oppression.': [
+        {'subject': 'landlord', 'verb': 'exercise', 'object': 'oppression'},
+    ],
+    'The soldiers were ill.': [
+        {'subject': 'soldier', 'verb': 'be', 'object': 'ill'},
+    ],
+    'I eat pizza, and salad, and smoothies.': [
+        {'subject': 'I', 'verb': 'eat', 'object': 'pizza'},
+        {'subject': 'I', 'verb': 'eat', 'object': 'salad'},
+        {'subject': 'I', 'verb': 'eat', 'object': 'smoothie'},
+    ],
+    'The farmers and the workers signed the petition.': [
+        {'subject': 'farmer', 'verb': 'sign', 'object': 'petition'},
+        {'subject': 'worker', 'verb': 'sign', 'object': 'petition'},
+    ],
+    'The farmers and the workers signed the petition and the letter.': [
+        {'subject': 'farmer', 'verb': 'sign', 'object': 'petition'},
+        {'subject': 'worker', 'verb': 'sign', 'object': 'petition'},
+        {'subject': 'farmer', 'verb': 'sign', 'object': 'letter'},
+        {'subject': 'worker', 'verb': 'sign', 'object': 'letter'},
+    ],
+    'The soldiers were tired and hungry.': [
+        {'subject': 'soldier', 'verb': 'be', 'object': 'tired'},
+        {'subject': 'soldier', 'verb': 'be', 'object': 'hungry'},
+    ],
+    'The poor weavers demanded higher wages.': [
+        {'subject': 'weaver', 'verb': 'demand', 'object': 'wage'},
+    ],
+    'The angry minister said "the farmers signed the petition"': [
+        {'subject': 'farmer', 'verb': 'sign', 'object': 'petition'},
+        {'subject': 'minister', 'verb': 'say', 'object': 'petition'},
+    ],
+    'The angry minister said': [
+    ],
+    'the farmers signed the petition': [
+        {'subject': 'farmer', 'verb': 'sign', 'object': 'petition'},
+    ],
+    'The tenants did not pay their rent.': [
+        {'subject': 'tenant', 'neg_adverb': 'not', 'verb': 'pay', 'object': 'rent'},
+    ],
+    'The company bought the land, the mills and the warehouses.': [
+        {'subject': 'company', 'verb': 'buy', 'object': 'land'},
+        {'subject': 'company', 'verb': 'buy', 'object': 'mill'},
+        {'subject': 'company', 'verb': 'buy', 'object': 'warehouse'},
+    ],
+    'The farmers wanted to sell their corn at the market.': [
+        {'subject': 'farmer', 'verb': 'sell', 'poa': 'at', 'object': 'market'},
+        {'subject': 'farmer', 'verb': 'sell', 'object': 'corn'},
+    ],
+    'The landlords who owned the mills raised the rents.': [
+        {'subject': 'landlord', 'verb': 'raise', 'object': 'rent'},
+        {'subject': 'landlord', 'verb': 'own', 'object': 'mill'},
+        {'subject': 'landlord', 'verb': 'own', 'object': 'mill'},
+    ],
+    'The House passed the bill which protected the weavers.': [
+        {'subject': 'House', 'verb': 'pass', 'object': 'bill'},
+        {'subject': 'which', 'verb': 'protect', 'object': 'weaver'},
+    ],
+    NESTED: [
+        {'subject': 'landlord', 'verb': 'raise', 'object': 'rent'},
+    ],
+    'No tenant paid rent to the landlord.': [
+        {'subject_negdet': 'No', 'subject': 'tenant', 'verb': 'pay', 'poa': 'to', 'object': 'landlord'},
+        {'subject_negdet': 'No', 'subject': 'tenant', 'verb': 'pay', 'object': 'rent'},
+    ],
+    'The petition was signed by the farmers.': [
+        {'subject': 'petition', 'verb': 'sign', 'poa': 'by', 'object': 'farmer'},
+    ],
+}
+
+EXPECTED = [
+    (TripleExtractorOptions(), DEFAULT),
+    (TripleExtractorOptions(combine_adj=True, add_auxiliary=True, prep_phrase=True), POST_PROCESSED),
+    (TripleExtractorOptions(lemmatize=True, compound_subject=False, compound_object=False), LEMMATIZED),
+]
+
+
+def fields(triple):
+    return {name: value for name, value in vars(triple).items() if value and name != 'rule'}
+
+
+@pytest.mark.parametrize('options,expected', EXPECTED)
+def test_extract_one_matches_frozen_output(options, expected, parse):
+    assert set(expected) == set(PARSES)
+    for text, triples in expected.items():
+        assert [fields(triple) for triple in extract_one(parse(text), options, flatten=True)] == triples, text
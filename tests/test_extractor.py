@@ -0,0 +1,141 @@
+import concurrent.futures
+import pickle
+
+import pytest
+from spacy.tokens import Doc, Span, Token
+
+from conftest import PARSES
+from posextract import grammatical_triples
+from posextract.grammatical_triples import TripleExtractor, extract_one, flatten_triples
+from posextract.instrumentation import ExtractionStats
+from posextract.triple_extraction import TripleExtraction
+from posextract.util import TripleExtractorOptions, make_pipeline, split_quotes
+
+TEXTS = list(PARSES)
+
+OPTIONS = [
+    TripleExtractorOptions(),
+    TripleExtractorOptions(lemmatize=True, add_auxiliary=True),
+    TripleExtractorOptions(compound_subject=False, compound_object=False, max_expansions=1),
+    TripleExtractorOptions(use_noun_chunks=True),
+]
+
+
+def strings(triples):
+    return [tuple(triple.astuple()) for triple in triples]
+
+
+def expected(nlp, texts, options):
+    # extract_one on each quote-split fragment of each text, parsed by the pipeline the options call for.
+    pipeline = make_pipeline(nlp, noun_chunks=options.use_noun_chunks)
+    return [sum((strings(extract_one(pipeline(fragment), options, flatten=True)) for fragment in split_quotes(text)),
+                []) for text in texts]
+
+
+@pytest.mark.parametrize('options', OPTIONS)
+def test_extract_matches_extract_one(options, nlp):
+    extractor = TripleExtractor(options, nlp=nlp, batch_size=3)
+    assert strings(extractor.extract(TEXTS)) == sum(expected(nlp, TEXTS, options), [])
+
+
+@pytest.mark.parametrize('options', OPTIONS)
+def test_extract_batch_groups_by_text(options, nlp):
+    texts = [TEXTS[2], '', TEXTS[0], TEXTS[2]]
+    extractor = TripleExtractor(options, nlp=nlp, batch_size=2)
+
+    results = extractor.extract_batch(texts)
+
+    assert [strings(triples) for triples in results] == [expected(nlp, [text], options)[0] if text else []
+                                                          for text in texts]
+
+
+def test_extract_iter_yields_input_indices(nlp):
+    extractor = TripleExtractor(nlp=nlp)
+    results = list(extractor.extract_iter(['', TEXTS[0], TEXTS[1]]))
+    assert [i for i, _ in results] == [1, 2]
+
+
+def test_extract_accepts_a_string(nlp):
+    extractor = TripleExtractor(nlp=nlp)
+    assert strings(extractor(TEXTS[0])) == expected(nlp, TEXTS[:1], extractor.extractor_options)[0]
+
+    with pytest.raises(ValueError):
+        extractor.extract(42)
+
+
+def test_extractors_with_different_options_side_by_side(nlp):
+    plain = TripleExtractor(nlp=nlp)
+    merged = TripleExtractor(TripleExtractorOptions(use_noun_chunks=True, lemmatize=True), nlp=nlp)
+
+    for text in TEXTS:
+        assert strings(plain.extract(text)) == expected(nlp, [text], plain.extractor_options)[0]
+        assert strings(merged.extract(text)) == expected(nlp, [text], merged.extractor_options)[0]
+
+
+def test_extractor_is_shared_by_threads(nlp):
+    extractor = TripleExtractor(TripleExtractorOptions(use_noun_chunks=True), nlp=nlp)
+    texts = TEXTS * 10
+
+    with concurrent.futures.ThreadPoolExecutor(6) as pool:
+        results = list(pool.map(lambda text: strings(extractor.extract(text)), texts))
+
+    assert results == expected(nlp, texts, extractor.extractor_options)
+
+
+def test_extract_records_stats(nlp):
+    stats = ExtractionStats()
+    triples = TripleExtractor(nlp=nlp).extract(TEXTS, stats=stats)
+
+    assert stats.counts['docs'] == sum(len(list(split_quotes(text))) for text in TEXTS)
+    assert stats.counts['extractions'] == len(triples)
+    assert {'nlp', 'graph_tokens', 'conj_expansion', 'flatten'} <= set(stats.seconds)
+
+
+def test_extractor_matches_module_functions():
+    pytest.importorskip('en_core_web_sm')
+    texts = ['The farmers and the labourers signed the petition.', 'The soldiers were not tired.',
+             'I eat pizza, and salad, and smoothies.']
+
+    for options in OPTIONS:
+        extractor = TripleExtractor(options)
+        assert strings(extractor.extract(texts)) == strings(grammatical_triples.extract(texts, options))
+        assert strings(extractor.extract(texts)) == sum((strings(triples) for triples in
+                                                         extractor.extract_batch(texts)), [])
+
+
+def token_free(value):
+    if isinstance(value, (Doc, Span, Token)):
+        return False
+    if isinstance(value, (tuple, list)):
+        return all(token_free(item) for item in value)
+    return True
+
+
+@pytest.mark.parametrize('options', OPTIONS)
+def test_unflattened_triples(options, nlp):
+    extractor = TripleExtractor(options, nlp=nlp, batch_size=3)
+    texts = ['The soldiers were ill.', 'The angry minister said "the farmers signed the petition"',
+             'The farmers and the workers signed the petition and the letter.']
+    pipeline = make_pipeline(nlp, noun_chunks=options.use_noun_chunks)
+
+    results = list(extractor.extract_iter(texts, flatten=False))
+    flattened = list(extractor.extract_iter(texts))
+    assert [i for i, _ in results] == [i for i, _ in flattened] == [0, 1, 1, 2]
+
+    assert [len(triples) for _, triples in results] == [len(triples) for _, triples in flattened]
+    assert all(triples for i, triples in results if i != 1)
+
+    for (i, triples), (_, expected) in zip(results, flattened):
+        copied = pickle.loads(pickle.dumps(triples))
+        assert copied == triples
+
+        for triple in copied:
+            assert all(token_free(getattr(triple, name)) for name in TripleExtraction.__slots__)
+
+        # Each triple's doc_id gives the fragment to flatten it against.
+        doc_ids = {triple.doc_id for triple in copied}
+        assert len(doc_ids) <= 1
+        for document, fragment in doc_ids:
+            assert document == i
+            doc = pipeline(list(split_quotes(texts[i]))[fragment])
+            assert strings(flatten_triples(copied, doc, options)) == strings(expected)
@@ -0,0 +1,89 @@
+import pytest
+import spacy
+from spacy.language import Language
+
+from conftest import PARSES
+from posextract import util
+from posextract.util import get_pipeline, make_pipeline
+
+TEXTS = list(PARSES)
+
+# The texts the `ner` component of each hand-parsed model was run on, which should be none.
+RECOGNISED = []
+
+
+@Language.component('upper_lemmas')
+def upper_lemmas(doc):
+    for token in doc:
+        token.lemma_ = token.lemma_.upper()
+    return doc
+
+
+@Language.component('record_ner')
+def record_ner(doc):
+    RECOGNISED.append(doc.text)
+    return doc
+
+
+def hand_model():
+    nlp = spacy.blank('en')
+    nlp.add_pipe('hand_parser')
+    nlp.add_pipe('upper_lemmas', name='lemmatizer')
+    nlp.add_pipe('record_ner', name='ner')
+    return nlp
+
+
+@pytest.fixture
+def default_model(monkeypatch):
+    # Stands in for en_core_web_sm as the model get_pipeline's variants are made from.
+    nlp = hand_model()
+    monkeypatch.setattr(util, '__NLP', nlp)
+    monkeypatch.setattr(util, '__PIPELINES', {})
+    RECOGNISED.clear()
+    return nlp
+
+
+def annotations(doc):
+    return [(token.text, token.dep_, token.head.i, token.pos_, token.lemma_) for token in doc]
+
+
+OPTIONS = [(True, False), (True, True), (False, False), (False, True)]
+
+
+def test_variants_share_one_model(default_model):
+    variants = [get_pipeline(lemmas=lemmas, noun_chunks=noun_chunks) for lemmas, noun_chunks in OPTIONS]
+
+    assert all(variant.nlp is default_model for variant in variants)
+    assert [get_pipeline(lemmas=lemmas, noun_chunks=noun_chunks) for lemmas, noun_chunks in OPTIONS] == variants
+    assert [variant.pipe_names for variant in variants] == [
+        ['hand_parser', 'lemmatizer'], ['hand_parser', 'lemmatizer', 'merge_noun_chunks'],
+        ['hand_parser'], ['hand_parser', 'merge_noun_chunks']]
+
+    for variant in variants:
+        list(variant.pipe(TEXTS))
+    assert default_model.pipe_names == ['hand_parser', 'lemmatizer', 'ner']
+    assert RECOGNISED == []
+
+
+@pytest.mark.parametrize('lemmas', [True, False])
+def test_variants_used_alternately_match_fresh_pipelines(lemmas, default_model):
+    plain = get_pipeline(lemmas=lemmas)
+    merged = get_pipeline(lemmas=lemmas, noun_chunks=True)
+    fresh_plain = make_pipeline(hand_model(), lemmas=lemmas)
+    fresh_merged = make_pipeline(hand_model(), lemmas=lemmas, noun_chunks=True)
+
+    for text in TEXTS:
+        assert annotations(plain(text)) == annotations(fresh_plain(text))
+        assert annotations(merged(text)) == annotations(fresh_merged(text))
+
+    # Two streams over the same model, read in turn.
+    streams = zip(plain.pipe(((text, i) for i, text in enumerate(TEXTS)), as_tuples=True, batch_size=2),
+                  merged.pipe(((text, i) for i, text in enumerate(TEXTS)), as_tuples=True, batch_size=3))
+    for i, ((plain_doc, plain_i), (merged_doc, merged_i)) in enumerate(streams):
+        assert plain_i == merged_i == i
+        assert annotations(plain_doc) == annotations(fresh_plain(TEXTS[i]))
+        assert annotations(merged_doc) == annotations(fresh_merged(TEXTS[i]))
+
+    merged_texts = [[token.text for token in merged(text)] for text in TEXTS]
+    assert ['The farmers', 'and', 'the workers', 'signed', 'the petition', '.'] in merged_texts
+    assert all(token.lemma_.isupper() == lemmas for token in plain(TEXTS[0]) if token.is_alpha)
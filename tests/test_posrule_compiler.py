@@ -0,0 +1,154 @@
+import pickle
+import re
+
+import pytest
+
+from conftest import PARSES
+from posextract import grammatical_triples
+from posextract.grammatical_triples import TripleExtractor, extract_one
+from posextract.posrule.compiler import CompiledFilter, compile_filters
+from posextract.posrule.parser import EqualityRule, Expression, ExpressionEnum, VarEnum, condense_expressions
+from posextract.util import TripleExtractorOptions
+
+SUBJECT, VERB, PREDICATE = VarEnum.SUBJECT, VarEnum.VERB, VarEnum.PREDICATE
+OR, AND, IGNORE = ExpressionEnum.OR, ExpressionEnum.AND, ExpressionEnum.IGNORE
+
+
+def match(var, value):
+    return EqualityRule(var, value)
+
+
+def ignore(rule):
+    return Expression(IGNORE, rule)
+
+
+# Each case is a list of filter files, each given as its condensed statements.
+FILTERS = [
+    [[match(SUBJECT, 'soldiers')]],
+    [[match(VERB, 'eat')]],
+    [[Expression(OR, match(VERB, 'bought'), match(VERB, re.compile('sign')))]],
+    [[match(SUBJECT, 'soldiers')], [match(VERB, 'eat')]],
+    [[Expression(OR, match(PREDICATE, 'salad'), match(PREDICATE, re.compile('smooth')))]],
+    [[Expression(AND, match(SUBJECT, 'company'), match(PREDICATE, re.compile('mills|land')))]],
+    [[match(VERB, re.compile('(?i)SIGN'))]],
+    [[match(SUBJECT, re.compile('\\bfarm'))]],
+    [[ignore(match(VERB, 'eat'))]],
+    [[Expression(OR, match(SUBJECT, 'I'), match(SUBJECT, 'tenants')), ignore(match(PREDICATE, 'pizza'))]],
+    [[ignore(Expression(OR, match(SUBJECT, 'company'), match(VERB, 'exercise')))], [match(SUBJECT, 'workers')]],
+    [[Expression(AND, ignore(match(VERB, 'pay')), match(SUBJECT, re.compile('t')))]],
+    [[match(VERB, 'no such verb')]],
+]
+
+TEXTS = ['Landlords may exercise oppression.', 'The soldiers were ill.', 'I eat pizza, and salad, and smoothies.',
+         'The tenants did not pay their rent.']
+
+OPTIONS = [
+    TripleExtractorOptions(),
+    TripleExtractorOptions(compound_subject=False, compound_object=False),
+    TripleExtractorOptions(max_expansions=1),
+]
+
+
+def build(case):
+    return [condense_expressions(statements) for statements in case]
+
+
+def interpreted(filters, triples, doc):
+    return [triple for triple in triples if any(expression.eval(triple, doc) for expression in filters)]
+
+
+@pytest.mark.parametrize('case', FILTERS)
+def test_compiled_predicate_matches_interpreted(case, parse):
+    filters = build(case)
+    compiled = compile_filters(filters)
+    copied = pickle.loads(pickle.dumps(compiled))
+
+    for text in PARSES:
+        doc = parse(text)
+        for triple in extract_one(doc):
+            expected = any(expression.eval(triple, doc) for expression in filters)
+            assert compiled.matches(triple, doc) == expected
+            assert copied.matches(triple, doc) == expected
+
+
+@pytest.mark.parametrize('options', OPTIONS)
+@pytest.mark.parametrize('case', FILTERS)
+def test_filtered_extraction_matches_interpreted(case, options, parse):
+    # Pruning in the traversal must not change which triples pass the filters.
+    filters = build(case)
+    compiled = compile_filters(filters)
+
+    for text in PARSES:
+        doc = parse(text)
+        expected = interpreted(filters, extract_one(doc, options), doc)
+        actual = extract_one(doc, options, filters=compiled)
+        assert actual == expected
+
+
+@pytest.mark.parametrize('case', FILTERS)
+def test_prefilter_never_skips_a_match(case, parse):
+    filters = build(case)
+    prefilter = CompiledFilter(filters).prefilter
+    if prefilter is None:
+        return
+
+    for text in PARSES:
+        doc = parse(text)
+        if not prefilter(text):
+            assert interpreted(filters, extract_one(doc), doc) == []
+
+    assert prefilter.checked == len(PARSES)
+
+
+def test_prefilter_skips_sentences_without_required_literals():
+    prefilter = compile_filters(build([[match(SUBJECT, 'soldiers')], [match(VERB, 'eat')]])).prefilter
+
+    assert [text for text in TEXTS if prefilter(text)] == ['The soldiers were ill.',
+                                                           'I eat pizza, and salad, and smoothies.']
+    assert (prefilter.checked, prefilter.skipped) == (4, 2)
+
+    copied = prefilter.copy()
+    assert (copied.checked, copied.skipped) == (0, 0)
+
+
+def test_ignore_only_filters_have_no_prefilter():
+    assert compile_filters(build([[ignore(match(VERB, 'eat'))]])).prefilter is None
+
+
+def test_extractor_skips_prefiltered_sentences(nlp):
+    extractor = TripleExtractor(filters=build([[match(SUBJECT, 'soldiers')]]), nlp=nlp)
+
+    triples = extractor.extract(TEXTS)
+
+    assert [str(triple) for triple in triples] == ['soldiers were ill']
+    assert (extractor.filters.prefilter.checked, extractor.filters.prefilter.skipped) == (4, 3)
+
+
+def test_compile_filters_passes_through():
+    assert compile_filters(None) is None
+    assert compile_filters([]) is None
+
+    compiled = compile_filters(build([[match(SUBJECT, 'soldiers')]]))
+    assert compile_filters(compiled) is compiled
+
+
+def test_extract_one_compiles_a_filter_list_once(parse, monkeypatch):
+    compiled = []
+
+    def counting_compile_filters(filters):
+        compiled.append(list(filters))
+        return compile_filters(filters)
+
+    monkeypatch.setattr(grammatical_triples, 'compile_filters', counting_compile_filters)
+    filters = build([[match(SUBJECT, 'soldiers')]])
+    docs = [parse(text) for text in TEXTS]
+
+    assert [len(extract_one(doc, filters=filters)) for doc in docs] == [0, 1, 0, 0]
+    assert len(compiled) == 1
+
+    # A changed list is compiled again, and so is another list with the same rules.
+    filters.append(build([[match(VERB, 'eat')]])[0])
+    assert [len(extract_one(doc, filters=filters)) for doc in docs] == [0, 1, 3, 0]
+    copied = list(filters)
+    assert [len(extract_one(doc, filters=copied)) for doc in docs] == [0, 1, 3, 0]
+    assert len(compiled) == 3
@@ -0,0 +1,70 @@
+import functools
+
+import pytest
+from spacy.symbols import acl, advcl, ccomp, conj, dobj, nsubj, pcomp, relcl, xcomp
+
+from conftest import PARSES
+from posextract import rules
+from posextract.docview import ROOT_DEP
+from posextract.grammatical_triples import extract_one
+
+# The verb labels each rule checked for itself before the dispatch table, in priority order. None accepts any label.
+VERB_DEPS = [
+    ('rule1', {pcomp}),
+    ('rule2', {ccomp, conj, relcl, advcl, pcomp, ROOT_DEP}),
+    ('rule3', {relcl, acl}),
+    ('rule4', {xcomp, advcl, conj}),
+    ('rule5', {ccomp, advcl, pcomp, ROOT_DEP}),
+    ('rule6', {xcomp, advcl}),
+    ('rule7', {relcl}),
+    ('rule8', {conj}),
+    ('rule9', {relcl}),
+    ('rule10', None),
+    ('rule11', {ccomp}),
+    ('rule12', {conj}),
+]
+
+LABELS = [pcomp, ccomp, conj, relcl, advcl, xcomp, acl, ROOT_DEP, dobj, nsubj]
+
+
+def test_rules_are_registered_in_priority_order():
+    assert [(rule.__name__, rule.verb_deps) for rule in rules.RULES] == \
+           [(name, frozenset(deps) if deps is not None else None) for name, deps in VERB_DEPS]
+
+
+@pytest.mark.parametrize('label', LABELS)
+def test_dispatch_entry(label):
+    expected = [name for name, deps in VERB_DEPS if deps is None or label in deps]
+    assert [rule.__name__ for rule in rules.RULE_DISPATCH.get(label)] == expected
+
+
+class GuardedDispatch:
+    # Every rule, each checking its verb's label itself as the rules did before the dispatch table.
+    def __init__(self):
+        self.fired = set()
+        self.rules = [self.guard(rule, deps) for rule, (_, deps) in zip(rules.RULES, VERB_DEPS)]
+
+    def guard(self, rule, deps):
+        @functools.wraps(rule)
+        def guarded(view, verb_token, *args):
+            if deps is not None and verb_token.dep not in deps:
+                return False
+            if rule(view, verb_token, *args):
+                self.fired.add(rule.__name__)
+                return True
+            return False
+
+        return guarded
+
+    def get(self, dep):
+        return self.rules
+
+
+def test_dispatch_matches_rules_checking_their_own_labels(parse, monkeypatch):
+    dispatched = {text: [vars(triple) for triple in extract_one(parse(text), flatten=True)] for text in PARSES}
+
+    guarded = GuardedDispatch()
+    monkeypatch.setattr(rules, 'RULE_DISPATCH', guarded)
+
+    assert {text: [vars(triple) for triple in extract_one(parse(text), flatten=True)] for text in PARSES} == dispatched
+    assert {'rule2', 'rule3', 'rule4'} <= guarded.fired
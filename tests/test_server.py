@@ -0,0 +1,238 @@
+import http.client
+import json
+import socket
+import threading
+
+import pytest
+
+from posextract.server import ExtractionServer, MicroBatcher, ServerBusy, make_extract_batch
+
+TEXTS = ['The soldiers were ill.', 'The poor weavers demanded higher wages.', 'I eat pizza, and salad, and smoothies.']
+
+
+@pytest.fixture
+def extract_batch(nlp):
+    return make_extract_batch(nlp=nlp)
+
+
+@pytest.fixture
+def serve(extract_batch):
+    # Starts a server on a free port. Its batcher is only started with `start_batcher`, so tests can fill its queue.
+    running = []
+
+    def start(batcher=None, start_batcher=True, **kwargs):
+        if batcher is None:
+            batcher = MicroBatcher(extract_batch, max_wait=0.001)
+        if start_batcher:
+            batcher.start()
+
+        server = ExtractionServer(('127.0.0.1', 0), batcher, **kwargs)
+        threading.Thread(target=server.serve_forever, kwargs={'poll_interval': 0.01}, daemon=True).start()
+        running.append((server, batcher if start_batcher else None))
+        return server
+
+    yield start
+
+    for server, batcher in running:
+        server.shutdown()
+        server.server_close()
+        if batcher is not None:
+            batcher.close()
+
+
+def request(server, method, path, body=b'', headers=None):
+    connection = http.client.HTTPConnection(*server.server_address, timeout=10)
+    try:
+        connection.request(method, path, body=body, headers=headers or {})
+        response = connection.getresponse()
+        return response.status, response.headers, response.read()
+    finally:
+        connection.close()
+
+
+def post_json(server, path, value, headers=None):
+    status, headers, body = request(server, 'POST', path, json.dumps(value).encode('utf-8'),
+                                    dict({'Content-Type': 'application/json'}, **(headers or {})))
+    return status, headers, json.loads(body)
+
+
+def test_single_text(serve, extract_batch):
+    server = serve()
+
+    status, headers, result = post_json(server, '/extract', {'text': TEXTS[0], 'id': 7})
+
+    assert status == 200
+    assert result == dict(extract_batch(TEXTS[:1])[0], id=7)
+    assert [triple['subject'] for triple in result['triples']] == ['soldiers']
+
+
+def test_text_list(serve, extract_batch):
+    server = serve()
+
+    status, _, result = post_json(server, '/extract', {'texts': [TEXTS[0], {'text': TEXTS[1], 'id': 'b'},
+                                                                 {'text': TEXTS[2]}]})
+
+    expected = extract_batch(TEXTS)
+    expected[1]['id'] = 'b'
+    assert status == 200
+    assert result == {'results': expected}
+
+
+def test_streams(serve, extract_batch):
+    server = serve()
+    expected = extract_batch(TEXTS[1:2])[0]
+
+    _, _, result = post_json(server, '/adj_noun', {'text': TEXTS[1]})
+    assert result == {'adj_noun': expected['adj_noun']}
+    assert [pair['noun'] for pair in result['adj_noun']] == ['weavers', 'wages']
+
+    _, _, result = post_json(server, '/extract', {'text': TEXTS[1], 'streams': ['triples', 'subj_verb']})
+    assert result == {'triples': expected['triples'], 'subj_verb': expected['subj_verb']}
+
+
+def test_json_lines(serve, extract_batch):
+    server = serve()
+    body = '\n'.join([json.dumps(TEXTS[0]), '', json.dumps({'text': TEXTS[1], 'id': 2})]).encode('utf-8')
+
+    status, headers, response = request(server, 'POST', '/triples', body, {'Content-Type': 'application/x-ndjson'})
+
+    expected = extract_batch(TEXTS[:2])
+    assert status == 200
+    assert headers['Content-Type'] == 'application/x-ndjson'
+    assert [json.loads(line) for line in response.decode('utf-8').splitlines()] == [
+        {'triples': expected[0]['triples']}, {'triples': expected[1]['triples'], 'id': 2}]
+
+
+def test_empty_text_list(serve):
+    assert post_json(serve(), '/extract', {'texts': []})[::2] == (200, {'results': []})
+
+
+def test_health_and_unknown_paths(serve):
+    server = serve()
+    post_json(server, '/extract', {'texts': TEXTS})
+
+    status, _, body = request(server, 'GET', '/health')
+    health = json.loads(body)
+    assert status == 200
+    assert (health['status'], health['texts'], health['queued_texts']) == ('ok', 3, 0)
+
+    assert request(server, 'GET', '/metrics')[0] == 404
+    assert post_json(server, '/pairs', {'text': TEXTS[0]})[0] == 404
+
+
+@pytest.mark.parametrize('body,content_type', [
+    (b'{"text": ', 'application/json'),
+    (b'["The soldiers were ill."]', 'application/json'),
+    (b'{"texts": [1, 2]}', 'application/json'),
+    (b'{"text": "The soldiers were ill.", "streams": ["verbs"]}', 'application/json'),
+    (b'{"text": "The soldiers were ill.", "streams": "triples"}', 'application/json'),
+    (b'"The soldiers were ill."\n{"id": 1}\n', 'application/x-ndjson'),
+])
+def test_bad_body(body, content_type, serve):
+    status, _, response = request(serve(), 'POST', '/extract', body, {'Content-Type': content_type})
+    assert status == 400
+    assert 'error' in json.loads(response)
+
+
+def raw_request(server, head: bytes) -> bytes:
+    # Sends a request http.client would not, and reads the response until the server closes the connection.
+    with socket.create_connection(server.server_address, timeout=10) as connection:
+        connection.sendall(head)
+        chunks = []
+        while True:
+            chunk = connection.recv(65536)
+            if not chunk:
+                return b''.join(chunks)
+            chunks.append(chunk)
+
+
+@pytest.mark.parametrize('length', [b'abc', b'-5'])
+def test_bad_content_length(length, serve):
+    response = raw_request(serve(), b'POST /extract HTTP/1.1\r\nHost: x\r\nContent-Length: ' + length + b'\r\n\r\n')
+    assert response.startswith(b'HTTP/1.1 400 ')
+    assert b'invalid Content-Length' in response
+
+
+def test_missing_content_length(serve):
+    response = raw_request(serve(), b'POST /extract HTTP/1.1\r\nHost: x\r\nConnection: close\r\n\r\n')
+    assert response.startswith(b'HTTP/1.1 411 ')
+
+
+def test_body_too_large(serve):
+    server = serve(max_body_bytes=100)
+
+    # The body is refused from its Content-Length alone, without waiting for it to arrive.
+    response = raw_request(server, b'POST /extract HTTP/1.1\r\nHost: x\r\nContent-Length: 5000000000\r\n\r\n')
+    assert response.startswith(b'HTTP/1.1 413 ')
+
+    assert post_json(server, '/extract', {'text': TEXTS[0]})[0] == 200
+    assert post_json(server, '/extract', {'texts': TEXTS * 5})[0] == 413
+
+
+def test_too_many_texts(serve, extract_batch):
+    server = serve(batcher=MicroBatcher(extract_batch, max_queue=2))
+    status, _, response = post_json(server, '/extract', {'texts': TEXTS})
+    assert status == 413
+    assert response == {'error': 'at most 2 texts can be sent at once'}
+
+
+def test_busy(serve, extract_batch):
+    batcher = MicroBatcher(extract_batch, max_queue=2)
+    server = serve(batcher=batcher, start_batcher=False)
+    batcher.submit(TEXTS[:2])
+
+    status, headers, response = post_json(server, '/extract', {'text': TEXTS[0]})
+
+    assert status == 503
+    assert headers['Retry-After'] == '1'
+    assert batcher.rejected == 1
+
+
+def test_failing_text_fails_its_own_request(serve, extract_batch):
+    def failing_extract_batch(texts):
+        if 'boom' in texts:
+            raise RuntimeError('cannot parse boom')
+        return extract_batch(texts)
+
+    # The three jobs are queued before the batcher starts, so they make up one batch.
+    batcher = MicroBatcher(failing_extract_batch, max_batch_size=4, max_wait=0.01)
+    jobs = [batcher.submit(texts) for texts in ([TEXTS[0]], ['boom'], TEXTS[1:])]
+    server = serve(batcher=batcher)
+
+    for job in jobs:
+        assert job.done.wait(10)
+
+    assert [job.error is None for job in jobs] == [True, False, True]
+    assert jobs[0].results == extract_batch(TEXTS[:1])
+    assert jobs[2].results == extract_batch(TEXTS[1:])
+
+    status, _, response = post_json(server, '/extract', {'text': 'boom'})
+    assert status == 500
+    assert response == {'error': 'RuntimeError: cannot parse boom'}
+    assert post_json(server, '/extract', {'text': TEXTS[0]})[0] == 200
+
+
+def test_batcher_coalesces_jobs(extract_batch):
+    batcher = MicroBatcher(extract_batch, max_batch_size=4, max_wait=0.01)
+    jobs = [batcher.submit([text]) for text in TEXTS * 2]
+    assert batcher.queued_texts == 6
+
+    batcher.start()
+    for job in jobs:
+        assert job.done.wait(10)
+    batcher.close()
+
+    # A batch takes whole jobs until it holds max_batch_size texts.
+    assert (batcher.batches, batcher.texts, batcher.queued_texts) == (2, 6, 0)
+    assert [job.results for job in jobs] == [extract_batch([text]) for text in TEXTS * 2]
+
+
+def test_submit_refuses_past_max_queue(extract_batch):
+    batcher = MicroBatcher(extract_batch, max_queue=3)
+    batcher.submit(TEXTS[:2])
+
+    with pytest.raises(ServerBusy):
+        batcher.submit(TEXTS[:2])
+
+    batcher.submit(TEXTS[:1])
+    assert (batcher.queued_texts, batcher.rejected) == (3, 1)
@@ -0,0 +1,47 @@
+import spacy
+from spacy.tokens import Doc
+
+from conftest import PARSES
+from posextract.traversal import graph_tokens
+from posextract.triple_extraction import TripleExtraction
+
+NESTED = ('The minister said that the farmers would protest if the landlords raised the rents and refused to repair '
+          'the cottages.')
+
+
+def key(triple):
+    return tuple(getattr(triple, name) for name in TripleExtraction.__slots__)
+
+
+def test_triples_are_found_once(parse):
+    for text in PARSES:
+        triples = [key(triple) for triple in graph_tokens(parse(text))]
+        assert len(triples) == len(set(triples)), text
+
+
+def test_verb_phrases_nested_in_clauses(parse):
+    # said -ccomp-> protest -advcl-> raised -conj-> refused: both the ccomp and the advcl make verb phrases, and
+    # each is visited below a clause that has already been visited.
+    doc = parse(NESTED)
+    triples = graph_tokens(doc)
+    assert [(doc[triple.subject].text, doc[triple.verb].text, doc[triple.object].text) for triple in triples] == [
+        ('landlords', 'raised', 'rents')]
+
+
+def test_deep_tree():
+    # A chain of 600 clauses, each an advcl of the one before. Visiting it recursively took two calls per clause,
+    # past Python's default limit of 1000.
+    depth = 600
+    words, heads, deps, pos = [], [], [], []
+    for k in range(depth):
+        verb = 3 * k + 1
+        words += ['farmers', 'signed', 'petitions']
+        heads += [verb, verb - 3 if k else verb, verb]
+        deps += ['nsubj', 'advcl' if k else 'ROOT', 'dobj']
+        pos += ['NOUN', 'VERB', 'NOUN']
+    doc = Doc(spacy.blank('en').vocab, words=words, heads=heads, deps=deps, pos=pos)
+
+    triples = graph_tokens(doc)
+
+    assert [(triple.subject, triple.verb, triple.object) for triple in triples] == [
+        (3 * k, 3 * k + 1, 3 * k + 2) for k in range(depth)]
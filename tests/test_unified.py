@@ -0,0 +1,100 @@
+import pytest
+
+from conftest import CLAUSE_PARSES, PARSES
+from posextract import adj_noun_pairs, subj_verb_pairs, unified
+from posextract.cache import ParseCache
+from posextract.grammatical_triples import TripleExtractor
+from posextract.instrumentation import ExtractionStats
+from posextract.posrule.parser import EqualityRule, VarEnum
+from posextract.util import TripleExtractorOptions, make_pipeline
+
+QUOTED = 'The angry minister said "the farmers signed the petition"'
+
+# subj_verb_pairs.rule cannot pair a verb that has no subject of its own.
+TEXTS = [text for text in PARSES if text not in CLAUSE_PARSES]
+
+PAIR_MODULES = {unified.ADJ_NOUN: adj_noun_pairs, unified.SUBJ_VERB: subj_verb_pairs}
+
+
+def by_stream(results, count, streams=unified.STREAMS):
+    grouped = {stream: [[] for _ in range(count)] for stream in streams}
+    for i, extractions in results:
+        for extraction in extractions:
+            grouped[extraction.stream][i].append(extraction.extraction)
+    return grouped
+
+
+def standalone(nlp, texts, options=None, filters=None, lemmatize_pairs=False, letter_case='default'):
+    # Each stream as its own extractor gives it: triples per quote-split fragment, pairs per document.
+    parser = make_pipeline(nlp)
+    expected = {unified.TRIPLES: TripleExtractor(options, filters=filters, nlp=nlp).extract_batch(texts)}
+    for stream, module in PAIR_MODULES.items():
+        expected[stream] = [module.rule(parser(text), lemmatize=lemmatize_pairs, letter_case=letter_case)
+                            for text in texts]
+    return expected
+
+
+@pytest.mark.parametrize('options,lemmatize_pairs,letter_case', [
+    (TripleExtractorOptions(), False, 'default'),
+    (TripleExtractorOptions(use_noun_chunks=True, lemmatize=True), True, 'upper'),
+    (TripleExtractorOptions(add_auxiliary=True, max_expansions=1), False, 'lower'),
+])
+def test_streams_match_standalone_extractors(options, lemmatize_pairs, letter_case, nlp):
+    results = unified.extract_iter(TEXTS, options, lemmatize_pairs=lemmatize_pairs, letter_case=letter_case,
+                                   batch_size=4, nlp=nlp)
+
+    assert by_stream(results, len(TEXTS)) == standalone(nlp, TEXTS, options, lemmatize_pairs=lemmatize_pairs,
+                                                        letter_case=letter_case)
+
+
+def test_quoted_document(nlp, tmp_path):
+    # The triples come from the quote-split fragments, the pairs from the whole document, which is parsed again.
+    with ParseCache(str(tmp_path)) as cache:
+        grouped = by_stream(unified.extract_iter([QUOTED], parse_cache=cache, nlp=nlp), 1)
+        assert cache.misses == 3
+
+    assert [str(triple) for triple in grouped[unified.TRIPLES][0]] == ['farmers signed petition']
+    assert [str(pair) for pair in grouped[unified.ADJ_NOUN][0]] == ['  angry minister']
+    assert [str(pair) for pair in grouped[unified.SUBJ_VERB][0]] == ['minister  said', 'farmers  signed']
+    assert grouped == standalone(nlp, [QUOTED])
+
+
+def test_documents_without_quotes_are_parsed_once(nlp, tmp_path):
+    texts = [text for text in TEXTS if text != QUOTED]
+
+    with ParseCache(str(tmp_path)) as cache:
+        list(unified.extract_iter(texts, parse_cache=cache, nlp=nlp))
+        assert cache.misses == len(texts)
+
+
+def test_prefiltered_fragments(nlp):
+    filters = [EqualityRule(VarEnum.SUBJECT, 'farmers')]
+    texts = [QUOTED, 'The soldiers were ill.', 'The poor weavers demanded higher wages.']
+    stats = ExtractionStats()
+
+    grouped = by_stream(unified.extract_iter(texts, filters=filters, stats=stats, nlp=nlp), len(texts))
+
+    # The fragments without "farmers" are not extracted from, but their documents still give pairs.
+    assert stats.counts['sentences_skipped'] == 3
+    assert [[str(triple) for triple in triples] for triples in grouped[unified.TRIPLES]] == [
+        ['farmers signed petition'], [], []]
+    assert grouped == standalone(nlp, texts, filters=filters)
+
+
+@pytest.mark.parametrize('streams', [(unified.TRIPLES, ), (unified.ADJ_NOUN, unified.SUBJ_VERB),
+                                     (unified.SUBJ_VERB, unified.TRIPLES)])
+def test_stream_subsets(streams, nlp):
+    grouped = by_stream(unified.extract_iter(TEXTS, streams=streams, nlp=nlp), len(TEXTS), streams=streams)
+    expected = standalone(nlp, TEXTS)
+    assert grouped == {stream: expected[stream] for stream in streams}
+
+
+def test_extract_groups_by_stream(nlp):
+    output = unified.extract(TEXTS, nlp=nlp)
+    expected = standalone(nlp, TEXTS)
+    assert output == {stream: sum(expected[stream], []) for stream in unified.STREAMS}
+
+
+def test_unknown_stream(nlp):
+    with pytest.raises(ValueError):
+        unified.extract_iter(TEXTS, streams=('triples', 'verbs'), nlp=nlp)
@@ -0,0 +1,200 @@
+import csv
+import os
+
+import pytest
+
+from posextract.triple_extraction import TripleExtractionFlattened
+from posextract.writer import ArrowWriter, CSVWriter, is_resumable, open_writer, record_fields
+
+FIELDS = record_fields(TripleExtractionFlattened)
+
+
+def triple(subject, verb, object):
+    return TripleExtractionFlattened(subject=subject, verb=verb, object=object)
+
+
+ROWS = [
+    (1, [triple('farmers', 'signed', 'petition'), triple('workers', 'signed', 'petition')]),
+    ('a', [triple('soldiers', 'were', 'ill')]),
+    (float('nan'), []),
+    (None, [triple('company', 'bought', 'land')]),
+    (2.0, [triple('I', 'eat', 'pizza'), triple('I', 'eat', 'salad'), triple('I', 'eat', 'smoothies')]),
+]
+
+IDS = ['1', '1', 'a', None, '2.0', '2.0', '2.0']
+
+
+def write_rows(writer, rows=ROWS):
+    for row_id, records in rows:
+        writer.write(records, row_id)
+
+
+def read_csv(path, delimiter=','):
+    with open(path, newline='') as f:
+        return list(csv.reader(f, delimiter=delimiter))
+
+
+def test_record_fields():
+    assert FIELDS[:2] == ['subject_negdet', 'subject']
+    assert 'rule' in FIELDS
+
+
+def test_csv_writer(tmp_path):
+    path = str(tmp_path / 'out.csv')
+    with CSVWriter(path, FIELDS, id_column='id', flush_size=2) as writer:
+        write_rows(writer)
+
+    rows = read_csv(path)
+    assert rows[0] == FIELDS + ['id']
+    assert [(row[1], row[5], row[10]) for row in rows[1:]] == [
+        ('farmers', 'signed', 'petition'), ('workers', 'signed', 'petition'), ('soldiers', 'were', 'ill'),
+        ('company', 'bought', 'land'), ('I', 'eat', 'pizza'), ('I', 'eat', 'salad'), ('I', 'eat', 'smoothies')]
+    assert [row[-1] for row in rows[1:]] == ['1', '1', 'a', '', '2.0', '2.0', '2.0']
+    assert writer.record_count == 7
+
+
+def test_csv_writer_without_id_column(tmp_path):
+    path = str(tmp_path / 'out.tsv')
+    with CSVWriter(path, FIELDS, delimiter='\t') as writer:
+        write_rows(writer)
+
+    rows = read_csv(path, delimiter='\t')
+    assert rows[0] == FIELDS
+    assert len(rows) == 8 and all(len(row) == len(FIELDS) for row in rows)
+
+
+def test_flush_keeps_rows_together(tmp_path):
+    path = str(tmp_path / 'out.csv')
+    writer = CSVWriter(path, FIELDS, id_column='id', flush_size=3)
+
+    write_rows(writer, ROWS[:2])
+    # Three records are buffered, so both rows were written out at once.
+    assert len(read_csv(path)) == 4
+
+    write_rows(writer, ROWS[2:4])
+    assert len(read_csv(path)) == 4
+
+    writer.close()
+    assert len(read_csv(path)) == 5
+
+
+def test_invalid_fsync_policy(tmp_path):
+    with pytest.raises(ValueError):
+        CSVWriter(str(tmp_path / 'out.csv'), FIELDS, fsync='sometimes')
+
+
+@pytest.mark.parametrize('fsync', ['none', 'close', 'flush'])
+def test_sync_returns_written_size(fsync, tmp_path):
+    path = str(tmp_path / 'out.csv')
+    with CSVWriter(path, FIELDS, flush_size=100, fsync=fsync) as writer:
+        write_rows(writer)
+        assert writer.sync() == os.path.getsize(path)
+
+
+def test_csv_writer_resume_at(tmp_path):
+    path = str(tmp_path / 'out.csv')
+
+    with CSVWriter(path, FIELDS, id_column='id') as writer:
+        write_rows(writer, ROWS[:2])
+        size = writer.sync()
+        write_rows(writer, ROWS[2:])
+
+    # Everything after `size` is dropped and the header is not written again.
+    with CSVWriter(path, FIELDS, id_column='id', resume_at=size) as writer:
+        write_rows(writer, ROWS[3:])
+
+    expected = str(tmp_path / 'expected.csv')
+    with CSVWriter(expected, FIELDS, id_column='id') as writer:
+        write_rows(writer, ROWS[:2] + ROWS[3:])
+
+    with open(path) as f, open(expected) as g:
+        assert f.read() == g.read()
+
+
+def test_csv_writer_resume_at_short_file(tmp_path):
+    path = str(tmp_path / 'out.csv')
+
+    with pytest.raises(ValueError):
+        CSVWriter(path, FIELDS, resume_at=0)
+
+    with CSVWriter(path, FIELDS) as writer:
+        write_rows(writer)
+
+    with pytest.raises(ValueError):
+        CSVWriter(path, FIELDS, resume_at=os.path.getsize(path) + 1)
+
+
+@pytest.mark.parametrize('filename,resumable', [
+    ('out.csv', True), ('out.tsv', True), ('out.txt', True), ('out.parquet', False), ('OUT.PQ', False),
+    ('out.arrow', False), ('out.feather', False),
+])
+def test_is_resumable(filename, resumable, tmp_path):
+    assert is_resumable(filename) == resumable
+
+    if not resumable:
+        with pytest.raises(ValueError):
+            open_writer(str(tmp_path / filename), FIELDS, resume_at=0)
+
+
+def test_open_writer_chooses_csv(tmp_path):
+    with open_writer(str(tmp_path / 'out.tsv'), FIELDS, delimiter='\t') as writer:
+        assert isinstance(writer, CSVWriter)
+
+
+def read_table(path, parquet):
+    if parquet:
+        import pyarrow.parquet
+        return pyarrow.parquet.read_table(path)
+
+    import pyarrow.ipc
+    with pyarrow.ipc.open_file(path) as reader:
+        return reader.read_all()
+
+
+@pytest.mark.parametrize('extension', ['.parquet', '.arrow'])
+def test_columnar_writer(extension, tmp_path):
+    pyarrow = pytest.importorskip('pyarrow')
+    path = str(tmp_path / ('out' + extension))
+    parquet = extension == '.parquet'
+
+    # Each flush is one batch, and the first batch's ids are all ints.
+    with open_writer(path, FIELDS, id_column='id', flush_size=2, row_group_size=2) as writer:
+        assert isinstance(writer, ArrowWriter) and writer.parquet == parquet
+        write_rows(writer)
+
+    table = read_table(path, parquet)
+    assert table.schema == pyarrow.schema([(name, pyarrow.string()) for name in FIELDS + ['id']])
+    assert table.column('subject').to_pylist() == ['farmers', 'workers', 'soldiers', 'company', 'I', 'I', 'I']
+    assert table.column('id').to_pylist() == IDS
+
+
+def test_parquet_dictionary_columns(tmp_path):
+    pytest.importorskip('pyarrow')
+    import pyarrow.parquet
+
+    path = str(tmp_path / 'out.parquet')
+    with open_writer(path, FIELDS, id_column='id', flush_size=3) as writer:
+        write_rows(writer)
+
+    metadata = pyarrow.parquet.ParquetFile(path).metadata
+    assert metadata.num_rows == 7
+
+    names = FIELDS + ['id']
+    for group in range(metadata.num_row_groups):
+        row_group = metadata.row_group(group)
+        encodings = {names[i]: row_group.column(i).encodings for i in range(row_group.num_columns)}
+        assert any('DICTIONARY' in encoding for encoding in encodings['subject'])
+        assert not any('DICTIONARY' in encoding for encoding in encodings['id'])
+
+
+@pytest.mark.parametrize('extension', ['.parquet', '.arrow'])
+def test_empty_columnar_output(extension, tmp_path):
+    pytest.importorskip('pyarrow')
+    path = str(tmp_path / ('out' + extension))
+
+    with open_writer(path, FIELDS, id_column='id'):
+        pass
+
+    table = read_table(path, extension == '.parquet')
+    assert table.num_rows == 0
+    assert table.column_names == FIELDS + ['id']